@@ -6,6 +6,7 @@ NEXUS后端服务器 - 主启动文件
 """
 import sys
 import os
+import time
 # 设置标准输出编码为UTF-8，解决Windows PowerShell编码问题
 if sys.platform == 'win32':
     # 使用环境变量设置编码，避免直接替换sys.stdout导致的问题
@@ -13,10 +14,14 @@ if sys.platform == 'win32':
 
 from flask import Flask
 from flask_cors import CORS
-from backend.config import PRIVATE_IP
+from backend.config import PRIVATE_IP, SERVER_CONFIG
 from backend.logger_config import startup_logger, logger
 from backend.service_monitor import ServiceMonitor, AutoRecovery
-from backend.asr_service import initialize_dolphin_model
+from backend.asr_service import start_dolphin_model_loading
+from backend.probe_service import probe_runner
+from backend.progress_buffer import progress_buffer
+from backend.retention import retention_scheduler
+from backend import tracing, lifecycle, json_provider, compression
 from backend.routes import (
     health_routes,
     tts_routes,
@@ -26,16 +31,24 @@ from backend.routes import (
     interaction_routes,
     story_routes,
     admin_user_routes,
-    realtime_routes
+    realtime_routes,
+    metrics_routes,
+    trace_routes,
+    static_routes
 )
 
 # 创建Flask应用
 app = Flask(__name__)
+json_provider.init_app(app)
 CORS(app)
 
 # 初始化服务监控
 service_monitor = ServiceMonitor()
 auto_recovery = AutoRecovery(service_monitor)
+service_monitor.init_app(app)
+tracing.init_app(app)
+lifecycle.init_app(app)
+compression.init_app(app)
 
 # 注册所有路由
 health_routes.register_health_routes(app, service_monitor, auto_recovery)
@@ -47,57 +60,109 @@ interaction_routes.register_interaction_routes(app)
 story_routes.register_story_routes(app)
 admin_user_routes.register_admin_user_routes(app)
 realtime_routes.register_realtime_routes(app)
+metrics_routes.register_metrics_routes(app, service_monitor)
+trace_routes.register_trace_routes(app)
+static_routes.register_static_routes(app)
+
+
+
+def preload_shared_state():
+    """预加载各进程共享的只读数据（gunicorn preload时在fork前执行）"""
+    from database_manager import db_manager
+    start_time = time.time()
+    stories = db_manager.get_all_stories()
+    voices = probe_runner.run_now('tts_voices')
+    voice_count = voices.get('details', {}).get('voice_count', 0)
+    startup_logger.info(
+        f"📦 预加载完成: 故事 {len(stories)} 个, 音色 {voice_count} 个, "
+        f"耗时 {time.time() - start_time:.1f}s"
+    )
+
+
+def start_background_services():
+    """启动后台任务（每个服务进程各执行一次）"""
+    # 后台加载并预热Dolphin ASR模型，加载期间其他接口正常服务
+    start_dolphin_model_loading()
+    startup_logger.info("🎤 语音识别: Dolphin ASR（加载进度见 /api/asr/status）")
 
-if __name__ == '__main__':
-    import socket
-    
-    # 获取本机IP地址
-    def get_local_ip():
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except:
-            return "127.0.0.1"
-    
-    startup_logger.info("🚀 NEXUS后端服务器启动中...")
-    startup_logger.info(f"🌐 地址: http://{PRIVATE_IP}:5000")
-    startup_logger.info(f"📊 管理员面板: http://{PRIVATE_IP}:5000/admin")
-    
-    # 初始化Dolphin ASR模型
-    dolphin_available = initialize_dolphin_model()
-    
-    if dolphin_available:
-        startup_logger.info("🎤 语音识别: Dolphin ASR")
-    else:
-        startup_logger.info("🎤 语音识别: 模拟模式")
-        
     startup_logger.info("🎵 语音合成: edge-tts | 🤖 AI聊天: DeepSeek")
-    
+
+    # 系统资源采样线程（每个服务进程各一个，preload的master进程不启动）
+    service_monitor.system_sampler.start()
+
+    # 启动后台服务探测（TTS/DeepSeek端点握手、ASR模型状态）
+    try:
+        probe_runner.start()
+    except Exception as e:
+        logger.error(f"启动服务探测失败: {e}")
+
+    # 启动阅读进度批量写库线程（并回放上次未写库的本地日志）
+    try:
+        progress_buffer.start()
+    except Exception as e:
+        logger.error(f"启动阅读进度写缓冲失败: {e}")
+
+    # 加载活跃会话并启动会话活跃时间批量写库、空闲到期线程
+    try:
+        from database_manager import db_manager
+        db_manager.session_registry.start()
+    except Exception as e:
+        logger.error(f"启动会话注册表失败: {e}")
+
+    # 低峰时段分批清理过期数据（多进程时只有拿到锁的一个在清理）
+    try:
+        retention_scheduler.start()
+    except Exception as e:
+        logger.error(f"启动过期数据清理失败: {e}")
+
     # 启动自动恢复监控
     try:
         auto_recovery.start()
     except Exception as e:
         logger.error(f"启动自动恢复监控失败: {e}")
-    
+
+
+def stop_auto_recovery():
+    try:
+        auto_recovery.stop()
+    except Exception as e:
+        logger.error(f"停止自动恢复监控失败: {e}")
+
+
+def stop_session_registry():
+    from database_manager import db_manager
+    db_manager.session_registry.stop()
+
+
+# 关闭时按顺序执行（在请求排空之后）
+lifecycle.register_shutdown_hook('auto_recovery', stop_auto_recovery)
+lifecycle.register_shutdown_hook('probe_runner', probe_runner.stop)
+lifecycle.register_shutdown_hook('system_sampler', service_monitor.system_sampler.stop)
+# 请求排空后写入缓冲中剩余的阅读进度
+lifecycle.register_shutdown_hook('progress_buffer', progress_buffer.stop)
+lifecycle.register_shutdown_hook('session_registry', stop_session_registry)
+lifecycle.register_shutdown_hook('retention_scheduler', retention_scheduler.stop)
+
+
+if __name__ == '__main__':
+    # 开发服务器；生产环境使用 python serve.py
+    port = SERVER_CONFIG['port']
+    startup_logger.info("🚀 NEXUS后端服务器启动中（开发服务器）...")
+    startup_logger.info(f"🌐 地址: http://{PRIVATE_IP}:{port}")
+    startup_logger.info(f"📊 管理员面板: http://{PRIVATE_IP}:{port}/admin")
+
+    start_background_services()
+
     startup_logger.info("✅ 服务器已启动，等待请求...")
-    
+
     # 禁用Flask的请求日志输出
-    import werkzeug
     import logging
     werkzeug_logger = logging.getLogger('werkzeug')
     werkzeug_logger.setLevel(logging.ERROR)
-    
+
     try:
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host=SERVER_CONFIG['host'], port=port, debug=False)
     except KeyboardInterrupt:
         startup_logger.info("⏹️ 正在关闭服务...")
     finally:
-        # 停止自动恢复监控
-        try:
-            auto_recovery.stop()
-        except Exception as e:
-            logger.error(f"停止自动恢复监控失败: {e}")
-
+        lifecycle.run_shutdown_hooks()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NEXUS后端ASGI入口 - 流式聊天、TTS、故事接口走异步路由，其余接口转交Flask应用
+
+启动:
+    python serve.py --backend uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+from backend.config import ASGI_CONFIG, SERVER_CONFIG
+from backend.logger_config import startup_logger
+from backend import lifecycle
+from backend.routes import async_routes
+from app import app as flask_app, service_monitor, preload_shared_state, start_background_services
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    if SERVER_CONFIG['preload']:
+        await asyncio.get_running_loop().run_in_executor(None, preload_shared_state)
+    start_background_services()
+    await async_routes.startup()
+    startup_logger.info("✅ ASGI服务已启动，等待请求...")
+    yield
+    await async_routes.shutdown()
+    lifecycle.run_shutdown_hooks()
+
+
+def _wsgi_app():
+    try:
+        return WSGIMiddleware(flask_app, workers=ASGI_CONFIG['wsgi_threads'])
+    except TypeError:
+        # starlette自带的WSGIMiddleware不支持workers参数
+        return WSGIMiddleware(flask_app)
+
+
+app = Starlette(
+    routes=async_routes.create_async_routes(service_monitor) + [Mount('/', app=_wsgi_app())],
+    lifespan=lifespan
+)
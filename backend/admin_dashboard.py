@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+管理后台聚合数据模块 - 一次请求返回概览、用户、阅读进度、AI使用进度和统计面板
+
+- 各面板在线程池中并行查询，每个面板使用自己的数据库连接
+- 结果按参数缓存 ttl 秒；过期后 stale_ttl 秒内直接返回旧结果，同时在后台刷新（stale-while-revalidate）
+- 同一参数同时只有一个线程在计算，其他请求等待其结果，多个管理员同时刷新只计算一次
+- 管理员修改阅读记录后调用 invalidate，下次请求重新计算
+"""
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import ADMIN_DASHBOARD_CONFIG
+from backend.logger_config import logger
+
+
+class StaleWhileRevalidateCache:
+    """短TTL缓存，过期后的一段时间内返回旧值并在后台刷新（线程安全）"""
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # 键 -> (计算完成时间, 值)
+        self.loader_locks = {}         # 键 -> 计算锁（同一键同时只有一个线程计算）
+        self.refreshing = set()        # 正在后台刷新的键
+        self.lock = threading.Lock()
+        self.generation = 0            # 每次失效加一，计算期间发生失效时不写入缓存
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _lookup(self, key, now: float):
+        """返回 (值, 已缓存秒数, 状态)，状态为 fresh/stale/missing（调用方持有锁）"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, None, 'missing'
+        age = now - entry[0]
+        if age < self.ttl:
+            return entry[1], age, 'fresh'
+        if age < self.ttl + self.stale_ttl:
+            return entry[1], age, 'stale'
+        del self.entries[key]
+        return None, None, 'missing'
+
+    def _loader_lock(self, key) -> threading.Lock:
+        with self.lock:
+            return self.loader_locks.setdefault(key, threading.Lock())
+
+    def _compute(self, key, loader):
+        with self.lock:
+            generation = self.generation
+        value = loader()
+        with self.lock:
+            if generation == self.generation and value is not None:
+                self.entries[key] = (time.monotonic(), value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    evicted, _ = self.entries.popitem(last=False)
+                    self.loader_locks.pop(evicted, None)
+        return value
+
+    def get(self, key, loader):
+        """返回 (值, 已缓存秒数, 是否为旧值)；loader返回None表示计算失败，不缓存"""
+        with self.lock:
+            value, age, state = self._lookup(key, time.monotonic())
+            if state == 'fresh':
+                self.stats['hits'] += 1
+                return value, age, False
+            if state == 'stale':
+                self.stats['stale_hits'] += 1
+                refresh = key not in self.refreshing
+                if refresh:
+                    self.refreshing.add(key)
+        if state == 'stale':
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, loader),
+                                 name='admin-dashboard-refresh', daemon=True).start()
+            return value, age, True
+
+        with self._loader_lock(key):
+            # 等锁期间其他线程可能已经算好
+            with self.lock:
+                value, age, state = self._lookup(key, time.monotonic())
+                if state == 'fresh':
+                    self.stats['hits'] += 1
+                    return value, age, False
+                self.stats['misses'] += 1
+            return self._compute(key, loader), 0.0, False
+
+    def _refresh(self, key, loader):
+        try:
+            with self._loader_lock(key):
+                with self.lock:
+                    self.stats['refreshes'] += 1
+                self._compute(key, loader)
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            logger.error(f"❌ 管理后台数据后台刷新失败: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+
+class AdminDashboard:
+    """管理后台聚合数据"""
+
+    def __init__(self, config: dict = None):
+        self.config = config or ADMIN_DASHBOARD_CONFIG
+        self.cache = StaleWhileRevalidateCache(self.config['ttl'], self.config['stale_ttl'],
+                                               self.config['max_entries'])
+        self.executor = ThreadPoolExecutor(max_workers=self.config['db_workers'],
+                                           thread_name_prefix='admin-dashboard')
+
+    def _panels(self, users_limit: int, progress_limit: int, progress_offset: int, days: int, hours: int) -> dict:
+        from database_manager import db_manager
+        return {
+            'overview': db_manager.get_admin_overview,
+            'users': lambda: db_manager.get_users_with_reading_counts(users_limit, 0),
+            'reading_progress': lambda: db_manager.get_all_users_reading_progress(progress_limit, progress_offset),
+            'interaction_progress': lambda: db_manager.get_all_users_interaction_progress(progress_limit, 0),
+            'interaction_stats': lambda: db_manager.get_interaction_stats(None, days) or None,
+            'tts_stats': lambda: db_manager.get_tts_stats(None, days) or None,
+            'active_users': lambda: db_manager.get_active_users(hours)
+        }
+
+    def compute(self, users_limit: int, progress_limit: int, progress_offset: int, days: int, hours: int):
+        """并行查询各面板，全部失败时返回None（不缓存）"""
+        start_time = time.perf_counter()
+        panels = self._panels(users_limit, progress_limit, progress_offset, days, hours)
+        futures = {name: self.executor.submit(loader) for name, loader in panels.items()}
+        data, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                data[name] = future.result()
+            except Exception as e:
+                data[name] = None
+                errors[name] = str(e)
+            if data[name] is None and name not in errors:
+                errors[name] = '查询失败'
+        if len(errors) == len(panels):
+            logger.error(f"❌ 管理后台数据全部查询失败: {errors}")
+            return None
+        return {
+            'data': data,
+            'errors': errors,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'compute_ms': round((time.perf_counter() - start_time) * 1000, 1)
+        }
+
+    def get(self, users_limit: int = 1000, progress_limit: int = 20, progress_offset: int = 0,
+            days: int = None, hours: int = None):
+        """返回 (结果, 已缓存秒数, 是否为旧值)，结果为None表示计算失败"""
+        days = days or self.config['stats_days']
+        hours = hours or self.config['active_hours']
+        key = (users_limit, progress_limit, progress_offset, days, hours)
+        return self.cache.get(key, lambda: self.compute(*key))
+
+    def invalidate(self):
+        """管理员修改数据后调用"""
+        self.cache.invalidate()
+
+    def get_stats(self) -> dict:
+        with self.cache.lock:
+            stats = dict(self.cache.stats)
+            stats['entries'] = len(self.cache.entries)
+        return stats
+
+
+# 全局实例
+admin_dashboard = AdminDashboard()
@@ -2,10 +2,13 @@
 """
 AI服务模块 - DeepSeek API集成
 """
-import json
+import time
 import requests
 from backend.logger_config import logger
 from backend.config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL
+from backend.prometheus_metrics import UPSTREAM_REQUEST_DURATION
+from backend.tracing import span
+from backend.json_provider import encode_sse, loads as json_loads
 
 
 SYSTEM_PROMPT = """你是一个贴心的AI助手，名字叫小美。请用温暖、耐心、易懂的方式回答用户的问题。
@@ -74,12 +77,23 @@ def chat_with_deepseek(message: str, conversation_history: list = None) -> str:
             "temperature": 0.7
         }
 
-        response = requests.post(
-            f"{DEEPSEEK_BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30,
-            proxies={'http': None, 'https': None}  # 禁用代理
+        start_time = time.perf_counter()
+        try:
+            with span('upstream.deepseek', operation='chat'):
+                response = requests.post(
+                    f"{DEEPSEEK_BASE_URL}/chat/completions",
+                    headers=headers,
+                    json=data,
+                    timeout=30,
+                    proxies={'http': None, 'https': None}  # 禁用代理
+                )
+        except Exception:
+            UPSTREAM_REQUEST_DURATION.labels('deepseek', 'chat', 'error').observe(
+                time.perf_counter() - start_time
+            )
+            raise
+        UPSTREAM_REQUEST_DURATION.labels('deepseek', 'chat', response.status_code).observe(
+            time.perf_counter() - start_time
         )
 
         if response.status_code == 200:
@@ -251,3 +265,177 @@ def validate_messages(messages: list) -> list:
 
     return valid_messages
 
+
+
+# ==================== 流式聊天（Flask与ASGI共用） ====================
+
+WEB_SEARCH_KEYWORDS = [
+    '今天', '明天', '后天', '天气', '日期', '星期',
+    '几号', '几月', '几号了', '现在几点', '现在几点了',
+    '今天是', '现在', '当前', '实时', '最新'
+]
+
+CHAT_COMPLETIONS_URL = f"{DEEPSEEK_BASE_URL}/chat/completions"
+
+
+def deepseek_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+
+def needs_web_search(message: str) -> bool:
+    """检测是否需要联网搜索（目前仅用于日志，DeepSeek的tools参数会导致400错误）"""
+    message_lower = message.lower()
+    return any(keyword in message_lower for keyword in WEB_SEARCH_KEYWORDS)
+
+
+def build_stream_request(message: str, conversation_history: list = None, is_refresh: bool = False) -> dict:
+    """构建DeepSeek流式请求体，没有有效消息时抛出ValueError"""
+    logger.info(
+        f"📝 构建消息列表: message_len={len(message)}, "
+        f"history_len={len(conversation_history) if conversation_history else 0}"
+    )
+    messages = validate_messages(build_chat_messages(message, conversation_history))
+    if not messages:
+        raise ValueError('没有有效的消息')
+    logger.info(f"✅ 验证后有效消息数: {len(messages)}")
+
+    # 刷新请求使用更高的temperature以增加回答的变化程度
+    temperature = 0.9 if is_refresh else 0.7
+    request_data = {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "max_tokens": 500,
+        "temperature": temperature,
+        "stream": True
+    }
+    logger.info(
+        f"📤 发送DeepSeek API请求: model={request_data['model']}, "
+        f"messages_count={len(messages)}, temperature={temperature}, "
+        f"is_refresh={is_refresh}, tools={'已启用' if needs_web_search(message) else '未启用'}"
+    )
+    return request_data
+
+
+def log_stream_request_error(status_code: int, error_text: str, request_data: dict):
+    """记录DeepSeek流式接口的错误响应及请求摘要"""
+    logger.error(f"❌ DeepSeek流式API错误: {status_code}")
+    logger.error(f"❌ 错误详情: {error_text[:500]}")
+    logger.error(f"❌ 请求模型: {request_data.get('model')}")
+    logger.error(f"❌ 消息数量: {len(request_data.get('messages', []))}")
+    # 打印前3条消息的详细内容
+    for i, msg in enumerate(request_data.get('messages', [])[:3]):
+        content = str(msg.get('content', ''))
+        content_preview = content[:500] + '...' if len(content) > 500 else content
+        logger.error(
+            f"❌ 消息{i}: role={msg.get('role')}, "
+            f"content_len={len(content)}, content_preview={content_preview}"
+        )
+
+
+def sse_event(chunk: dict) -> bytes:
+    """编码为一条SSE事件"""
+    return encode_sse(chunk)
+
+
+def error_event(message: str) -> bytes:
+    return encode_sse({'type': 'error', 'message': message})
+
+
+class ChatStreamParser:
+    """逐行解析DeepSeek流式响应，产生推送给客户端的事件"""
+
+    def __init__(self):
+        self.full_text = ""
+        self.sentence_count = 0
+        self.done = False
+
+    def feed(self, line: str) -> list:
+        """处理一行上游数据，返回需要推送的事件列表"""
+        if not line.startswith('data: '):
+            return []
+        data_str = line[6:]
+        if data_str.strip() == '[DONE]':
+            self.done = True
+            return []
+
+        try:
+            chunk_data = json_loads(data_str)
+        except ValueError as e:
+            logger.warning(f"⚠️ 解析流式数据失败: {e}")
+            return []
+        if not chunk_data.get('choices'):
+            return []
+
+        events = []
+        delta = chunk_data['choices'][0].get('delta') or {}
+        # 处理tool_calls（联网搜索）
+        if delta.get('tool_calls'):
+            logger.info("🔍 检测到联网搜索请求")
+            events.append({'type': 'search_status', 'message': '正在搜索最新信息...'})
+
+        # 处理文本内容
+        if 'content' in delta:
+            content = delta['content'] or ''
+            self.full_text += content
+            # 检查是否完成一个句子
+            if any(punct in content for punct in ['。', '！', '？', '；']):
+                self.sentence_count += 1
+            events.append({
+                'type': 'text_update',
+                'content': content,
+                'full_text': self.full_text,
+                'sentence_count': self.sentence_count
+            })
+        return events
+
+    def complete_event(self, session_id: str) -> dict:
+        return {
+            'type': 'complete',
+            'text': self.full_text,
+            'sentence_count': self.sentence_count,
+            'session_id': session_id
+        }
+
+
+def resolve_chat_session(user_id: str, session_id: str):
+    """验证用户并确定会话，返回(session_id, 错误响应)，错误响应为(payload, status)或None"""
+    from database_manager import db_manager
+
+    if user_id == 'anonymous' or not db_manager.user_exists(user_id):
+        logger.warning(f"⚠️ 无效的用户ID: {user_id}")
+        return None, ({'error': '需要有效的用户身份验证，请先登录'}, 401)
+
+    if not session_id or session_id.strip() == '':
+        session_id = db_manager.create_session(user_id)
+        if not session_id:
+            return None, ({'error': '无法创建session'}, 500)
+        logger.info(f"ℹ️ [新历史对话] 创建新session: {session_id}")
+    else:
+        logger.info(f"ℹ️ [继续历史对话] 使用session: {session_id}")
+    return session_id, None
+
+
+def record_chat_interaction(user_id: str, message: str, response_text: str, session_id: str,
+                            success: bool = True, error_message: str = None) -> str:
+    """流式对话结束后记录交互，返回实际使用的session_id"""
+    from database_manager import db_manager
+
+    try:
+        logged, actual_session_id = db_manager.log_interaction(
+            user_id=user_id,
+            interaction_type='text',
+            content=message,
+            response=response_text,
+            session_id=session_id,
+            success=success,
+            error_message=error_message
+        )
+        if logged:
+            logger.info(f"✅ 交互记录成功: {user_id}, session_id: {actual_session_id}")
+            return actual_session_id
+    except Exception as db_error:
+        logger.warning(f"⚠️ 记录交互到数据库失败: {db_error}")
+    return session_id
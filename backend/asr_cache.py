@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+ASR结果缓存模块 - 按音频内容哈希缓存识别结果（内存LRU + 可选磁盘层）
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.logger_config import logger
+from backend.config import ASR_CACHE_CONFIG
+
+# 优先使用xxhash，未安装时回退到标准库blake2b
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+
+def _digest(*parts: bytes) -> str:
+    """计算快速内容哈希"""
+    if XXHASH_AVAILABLE:
+        hasher = xxhash.xxh3_128()
+    else:
+        hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+class ASRResultCache:
+    """ASR识别结果缓存（线程安全）"""
+
+    def __init__(self, config: dict = None):
+        self.config = config or ASR_CACHE_CONFIG
+        self.max_entries = self.config['max_entries']
+        self.entries = OrderedDict()      # PCM内容键 -> 识别文本
+        self.raw_index = OrderedDict()    # 原始上传字节键 -> PCM内容键
+        self.lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0,
+            'raw_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'disk_writes': 0,
+            'disk_errors': 0,
+            'hit_time_total': 0.0
+        }
+        self.disk_dir = None
+        if self.config.get('disk_enabled'):
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            self.disk_dir = os.path.join(os.path.dirname(current_dir), self.config['disk_dir'])
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+    def make_key(self, waveform, model_params: str) -> str:
+        """根据解码后的PCM波形和模型参数生成缓存键"""
+        pcm = np.ascontiguousarray(waveform, dtype=np.float32)
+        return _digest(model_params.encode('utf-8'), b'|pcm|', pcm.tobytes())
+
+    def make_raw_key(self, audio_bytes: bytes, model_params: str) -> str:
+        """根据原始上传字节生成键，命中时可跳过音频解码"""
+        return _digest(model_params.encode('utf-8'), b'|raw|', audio_bytes)
+
+    def _record_hit(self, kind: str, start: float):
+        self.stats[kind] += 1
+        self.stats['hit_time_total'] += time.perf_counter() - start
+
+    def _remember(self, key: str, text: str):
+        """写入内存层并按LRU淘汰（调用方持有锁）"""
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str):
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f).get('text')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.stats['disk_errors'] += 1
+            logger.warning(f"⚠️ 读取ASR磁盘缓存失败: {e}")
+            return None
+
+    def _write_disk(self, key: str, text: str):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'text': text, 'created_at': time.time()}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            self.stats['disk_writes'] += 1
+        except Exception as e:
+            self.stats['disk_errors'] += 1
+            logger.warning(f"⚠️ 写入ASR磁盘缓存失败: {e}")
+
+    def get(self, key: str):
+        """按PCM内容键查询，未命中返回None"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        with self.lock:
+            text = self.entries.get(key)
+            if text is not None:
+                self.entries.move_to_end(key)
+                self._record_hit('memory_hits', start)
+                return text
+
+        if self.disk_dir:
+            text = self._read_disk(key)
+            if text is not None:
+                with self.lock:
+                    self._remember(key, text)
+                    self._record_hit('disk_hits', start)
+                return text
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def get_raw(self, raw_key: str):
+        """按原始上传字节键查询（只查内存层）"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        with self.lock:
+            key = self.raw_index.get(raw_key)
+            text = self.entries.get(key) if key else None
+            if text is None:
+                return None
+            self.raw_index.move_to_end(raw_key)
+            self.entries.move_to_end(key)
+            self._record_hit('raw_hits', start)
+            return text
+
+    def _link(self, raw_key: str, key: str):
+        """记录原始字节键到PCM内容键的映射（调用方持有锁）"""
+        self.raw_index[raw_key] = key
+        self.raw_index.move_to_end(raw_key)
+        while len(self.raw_index) > self.max_entries:
+            self.raw_index.popitem(last=False)
+
+    def link_raw(self, raw_key: str, key: str):
+        """关联原始上传字节键，下次相同上传可跳过解码"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self._link(raw_key, key)
+
+    def put(self, key: str, text: str, raw_key: str = None):
+        """写入识别结果"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self._remember(key, text)
+            if raw_key:
+                self._link(raw_key, key)
+            self.stats['stores'] += 1
+        if self.disk_dir:
+            self._write_disk(key, text)
+
+    def clear(self) -> int:
+        """清空内存层（磁盘层保留）"""
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            self.raw_index.clear()
+        logger.info(f"🧹 清理ASR结果缓存，删除 {count} 项")
+        return count
+
+    def get_stats(self) -> dict:
+        """获取缓存指标"""
+        with self.lock:
+            stats = dict(self.stats)
+            size = len(self.entries)
+        hits = stats['memory_hits'] + stats['raw_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        hit_time_total = stats.pop('hit_time_total')
+        stats.update({
+            'enabled': self.enabled,
+            'hasher': 'xxh3_128' if XXHASH_AVAILABLE else 'blake2b',
+            'size': size,
+            'max_entries': self.max_entries,
+            'disk_enabled': self.disk_dir is not None,
+            'hit_rate': hits / lookups * 100 if lookups else 0,
+            'avg_hit_time_us': hit_time_total / hits * 1e6 if hits else 0
+        })
+        return stats
+
+
+# 全局ASR结果缓存
+asr_result_cache = ASRResultCache()
@@ -3,18 +3,18 @@
 ASR服务模块
 """
 import os
+import re
+import time
+import threading
+import numpy as np
 from backend.logger_config import logger
-from backend.config import DOLPHIN_MODEL_PATH
-
-# 导入Dolphin ASR
-try:
-    import dolphin
-    DOLPHIN_AVAILABLE = True
-    logger.info("✅ Dolphin ASR模块导入成功")
-except ImportError as e:
-    DOLPHIN_AVAILABLE = False
-    logger.warning(f"⚠️ Dolphin ASR模块导入失败: {e}")
-    logger.warning("将使用模拟ASR结果")
+from backend.config import DOLPHIN_MODEL_PATH, DOLPHIN_OPTIMIZE_CONFIG, ASR_WARMUP_CONFIG
+from backend.asr_cache import asr_result_cache
+from backend.tracing import span
+
+# Dolphin模块（依赖torch，导入耗时较长）由import_dolphin延迟导入
+dolphin = None
+DOLPHIN_AVAILABLE = False
 
 DOLPHIN_MODEL = None
 
@@ -26,41 +26,173 @@ asr_processing_status = {
     'progress': 0
 }
 
+# 推理优化状态（由initialize_dolphin_model填充）
+dolphin_optimization_status = {
+    'enabled': False,
+    'applied': []
+}
+
+# 模型就绪状态：not_started -> loading -> warming_up -> ready / unavailable / failed
+ASR_MODEL_STATES = ('not_started', 'loading', 'warming_up', 'ready', 'unavailable', 'failed')
+dolphin_model_state = {
+    'state': 'not_started',
+    'started_at': None,
+    'ready_at': None,
+    'load_seconds': None,
+    'warmup_seconds': None,
+    'error': None
+}
+dolphin_ready_event = threading.Event()
+
+
+def import_dolphin() -> bool:
+    """导入Dolphin ASR模块，返回是否可用"""
+    global dolphin, DOLPHIN_AVAILABLE
+
+    if dolphin is not None:
+        return True
+    try:
+        import dolphin as dolphin_module
+        dolphin = dolphin_module
+        DOLPHIN_AVAILABLE = True
+        logger.info("✅ Dolphin ASR模块导入成功")
+    except ImportError as e:
+        DOLPHIN_AVAILABLE = False
+        logger.warning(f"⚠️ Dolphin ASR模块导入失败: {e}")
+        logger.warning("将使用模拟ASR结果")
+    return DOLPHIN_AVAILABLE
+
+
+def get_dolphin_model_path():
+    """获取Dolphin模型目录的绝对路径"""
+    # 获取项目根目录的绝对路径
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    # 从backend目录回到项目根目录
+    project_root = os.path.dirname(current_dir)
+    # 使用相对路径配置
+    return os.path.join(project_root, DOLPHIN_MODEL_PATH)
+
+
+def _find_torch_modules(model):
+    """找出模型对象上挂载的torch子模块（Dolphin模型本身是包装类）"""
+    import torch
+    if isinstance(model, torch.nn.Module):
+        return [(None, model)]
+    return [
+        (name, value) for name, value in vars(model).items()
+        if isinstance(value, torch.nn.Module)
+    ]
+
+
+def optimize_dolphin_model(model, options: dict = None) -> tuple:
+    """
+    对已加载的Dolphin模型应用CPU推理优化，返回(优化后的模型, 实际生效的优化项列表)
+    每一项优化失败都会回退，不影响模型可用性
+    """
+    import torch
+    options = options or DOLPHIN_OPTIMIZE_CONFIG
+    applied = []
+
+    # 线程数调优
+    if options.get('num_threads'):
+        torch.set_num_threads(int(options['num_threads']))
+        applied.append(f"threads={torch.get_num_threads()}")
+    if options.get('num_interop_threads'):
+        try:
+            torch.set_num_interop_threads(int(options['num_interop_threads']))
+            applied.append(f"interop_threads={options['num_interop_threads']}")
+        except RuntimeError as e:
+            # interop线程数只能在首次并行任务前设置
+            logger.warning(f"⚠️ 设置interop线程数失败: {e}")
+
+    for name, module in _find_torch_modules(model):
+        module.eval()
+        optimized = module
+
+        # 线性层动态int8量化
+        if options.get('quantize_int8'):
+            try:
+                optimized = torch.ao.quantization.quantize_dynamic(
+                    optimized, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                applied.append(f"int8_dynamic({name or 'model'})")
+            except Exception as e:
+                logger.warning(f"⚠️ 动态量化失败，保留fp32: {e}")
+
+        # 图优化（TorchScript或torch.compile）
+        graph_mode = options.get('graph_mode')
+        if graph_mode == 'torchscript':
+            try:
+                optimized = torch.jit.script(optimized)
+                applied.append(f"torchscript({name or 'model'})")
+            except Exception as e:
+                logger.warning(f"⚠️ TorchScript编译失败，跳过: {e}")
+        elif graph_mode == 'compile' and hasattr(torch, 'compile'):
+            try:
+                optimized = torch.compile(optimized)
+                applied.append(f"torch_compile({name or 'model'})")
+            except Exception as e:
+                logger.warning(f"⚠️ torch.compile失败，跳过: {e}")
+
+        if name is None:
+            model = optimized
+        elif optimized is not module:
+            setattr(model, name, optimized)
+
+    if options.get('inference_mode'):
+        applied.append("inference_mode")
+    return model, applied
+
+
+def load_dolphin_model(optimize: bool = None):
+    """加载Dolphin模型，optimize为None时按DOLPHIN_OPTIMIZE_CONFIG决定是否优化"""
+    dolphin_model_path = get_dolphin_model_path()
+
+    # 检查模型目录是否存在
+    if not os.path.exists(dolphin_model_path):
+        logger.error(f"❌ Dolphin模型路径不存在: {dolphin_model_path}")
+        return None, []
+
+    # 检查模型文件是否存在（small.pt）
+    model_file = os.path.join(dolphin_model_path, "small.pt")
+    if not os.path.exists(model_file):
+        logger.error(f"❌ Dolphin模型文件不存在: {model_file}")
+        return None, []
+
+    logger.info(f"🎤 使用模型路径: {dolphin_model_path}")
+    logger.info(f"🎤 模型文件: {model_file}")
+
+    # 加载模型 - 使用small模型
+    model = dolphin.load_model("small", dolphin_model_path, "cpu")
+
+    if optimize is None:
+        optimize = DOLPHIN_OPTIMIZE_CONFIG['enabled']
+    if not optimize:
+        return model, []
+
+    model, applied = optimize_dolphin_model(model)
+    logger.info(f"⚡ Dolphin优化推理模式已启用: {', '.join(applied) or '无'}")
+    return model, applied
+
 
 def initialize_dolphin_model():
     """初始化Dolphin ASR模型"""
     global DOLPHIN_MODEL
 
-    if not DOLPHIN_AVAILABLE:
+    if not import_dolphin():
         logger.warning("Dolphin不可用，跳过模型初始化")
         return False
 
     try:
         logger.info("🔄 正在初始化Dolphin ASR模型...")
 
-        # 获取项目根目录的绝对路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # 从backend目录回到项目根目录
-        project_root = os.path.dirname(current_dir)
-        # 使用相对路径配置
-        dolphin_model_path = os.path.join(project_root, DOLPHIN_MODEL_PATH)
-
-        # 检查模型目录是否存在
-        if not os.path.exists(dolphin_model_path):
-            logger.error(f"❌ Dolphin模型路径不存在: {dolphin_model_path}")
-            return False
-
-        # 检查模型文件是否存在（small.pt）
-        model_file = os.path.join(dolphin_model_path, "small.pt")
-        if not os.path.exists(model_file):
-            logger.error(f"❌ Dolphin模型文件不存在: {model_file}")
+        model, applied = load_dolphin_model()
+        if model is None:
             return False
 
-        logger.info(f"🎤 使用模型路径: {dolphin_model_path}")
-        logger.info(f"🎤 模型文件: {model_file}")
-
-        # 加载模型 - 使用small模型
-        DOLPHIN_MODEL = dolphin.load_model("small", dolphin_model_path, "cpu")
+        DOLPHIN_MODEL = model
+        dolphin_optimization_status['enabled'] = bool(applied)
+        dolphin_optimization_status['applied'] = applied
         logger.info("✅ Dolphin ASR模型初始化成功")
         return True
 
@@ -72,8 +204,188 @@ def initialize_dolphin_model():
         return False
 
 
-def transcribe_with_dolphin(audio_file_path: str) -> str:
-    """使用Dolphin进行语音识别"""
+def warm_up_dolphin_model():
+    """用合成音频跑一次推理，提前完成内存分配和算子初始化，避免首个真实请求冷启动"""
+    sample_rate = 16000
+    seconds = ASR_WARMUP_CONFIG['warmup_seconds']
+    t = np.arange(int(sample_rate * seconds), dtype=np.float32) / sample_rate
+    # 带轻微噪声的正弦波，避免全静音被模型直接跳过
+    rng = np.random.default_rng(0)
+    waveform = (0.1 * np.sin(2 * np.pi * 220 * t) +
+                0.01 * rng.standard_normal(t.shape)).astype(np.float32)
+    try:
+        transcribe_waveform(waveform)
+    except Exception as e:
+        # 合成音频识别失败不影响模型可用
+        logger.warning(f"⚠️ Dolphin预热推理失败: {e}")
+
+
+def _load_and_warm_up():
+    """后台线程：导入模块、加载模型并预热"""
+    start_time = time.time()
+    try:
+        if not initialize_dolphin_model():
+            dolphin_model_state['state'] = 'unavailable'
+            logger.info("🎤 语音识别: 模拟模式")
+            return
+
+        dolphin_model_state['load_seconds'] = round(time.time() - start_time, 2)
+        if ASR_WARMUP_CONFIG['warmup_seconds'] > 0:
+            dolphin_model_state['state'] = 'warming_up'
+            warmup_start = time.time()
+            warm_up_dolphin_model()
+            dolphin_model_state['warmup_seconds'] = round(time.time() - warmup_start, 2)
+
+        dolphin_model_state['state'] = 'ready'
+        dolphin_model_state['ready_at'] = time.time()
+        logger.info(
+            f"✅ Dolphin ASR就绪（加载 {dolphin_model_state['load_seconds']}s，"
+            f"预热 {dolphin_model_state['warmup_seconds'] or 0}s）"
+        )
+    except Exception as e:
+        dolphin_model_state['state'] = 'failed'
+        dolphin_model_state['error'] = str(e)
+        logger.error(f"❌ Dolphin后台加载失败: {e}")
+    finally:
+        dolphin_ready_event.set()
+
+
+def start_dolphin_model_loading(background: bool = None) -> bool:
+    """启动模型加载；background为None时按ASR_WARMUP_CONFIG决定是否后台加载"""
+    if dolphin_model_state['state'] != 'not_started':
+        return False
+    if background is None:
+        background = ASR_WARMUP_CONFIG['background_load']
+
+    dolphin_model_state['state'] = 'loading'
+    dolphin_model_state['started_at'] = time.time()
+    if background:
+        threading.Thread(target=_load_and_warm_up, name='dolphin-loader', daemon=True).start()
+    else:
+        _load_and_warm_up()
+    return True
+
+
+def is_asr_ready() -> bool:
+    """ASR是否可以处理请求（模型就绪，或已确定只能使用模拟模式）"""
+    return dolphin_model_state['state'] in ('ready', 'unavailable', 'failed', 'not_started')
+
+
+def wait_for_asr_ready(timeout: float) -> bool:
+    """等待模型加载完成，超时返回False"""
+    if is_asr_ready():
+        return True
+    if timeout > 0:
+        dolphin_ready_event.wait(timeout)
+    return is_asr_ready()
+
+
+def get_asr_readiness() -> dict:
+    """获取模型就绪状态"""
+    readiness = dict(dolphin_model_state)
+    readiness['ready'] = is_asr_ready()
+    readiness['model_loaded'] = DOLPHIN_MODEL is not None
+    if readiness['state'] in ('loading', 'warming_up') and readiness['started_at']:
+        readiness['elapsed_seconds'] = round(time.time() - readiness['started_at'], 2)
+    return readiness
+
+
+def clean_dolphin_text(text: str) -> str:
+    """提取纯文本识别结果（去除语言、区域和时间标记）"""
+    if text.startswith("<zh><CN><asr>"):
+        # 移除语言和区域标记
+        text = text.replace("<zh><CN><asr>", "")
+        # 移除时间标记
+        text = re.sub(r'<[0-9.]+>', '', text)
+        text = text.strip()
+    return text
+
+
+def load_waveform(audio_file_path: str):
+    """加载音频文件为单声道numpy波形 - 优先使用torchaudio，失败时尝试ffmpeg"""
+    waveform = None
+    import logging
+
+    # 临时抑制 dolphin 库内部的错误输出
+    dolphin_logger = logging.getLogger('dolphin')
+    original_level = dolphin_logger.level
+    dolphin_logger.setLevel(logging.ERROR)
+
+    try:
+        # 优先使用torchaudio（更稳定，不依赖ffmpeg）
+        try:
+            import torchaudio
+            logger.debug("🔄 尝试使用torchaudio加载音频...")
+
+            # 使用torchaudio加载音频
+            waveform_tensor, sample_rate = torchaudio.load(audio_file_path)
+
+            # 转换为numpy数组并处理格式
+            import torch
+            if waveform_tensor.dim() > 1:
+                # 如果是多声道，转换为单声道
+                waveform_tensor = torch.mean(waveform_tensor, dim=0)
+
+            # 转换为numpy
+            waveform = waveform_tensor.numpy()
+
+            # 确保是1D数组
+            if waveform.ndim > 1:
+                waveform = waveform.flatten()
+
+            logger.debug(f"🎤 使用torchaudio加载音频成功，形状: {waveform.shape}, 采样率: {sample_rate}")
+        except Exception as torch_error:
+            logger.debug(f"⚠️ torchaudio加载音频失败，尝试ffmpeg: {torch_error}")
+
+            # 如果torchaudio失败，尝试使用ffmpeg（dolphin的默认方法）
+            try:
+                waveform = dolphin.load_audio(audio_file_path)
+                logger.debug(f"🎤 使用ffmpeg加载音频成功，形状: {waveform.shape}")
+            except Exception as ffmpeg_error:
+                # 两个方法都失败
+                error_msg = str(ffmpeg_error)
+                logger.warning(f"⚠️ 音频加载失败（torchaudio和ffmpeg都失败）: {error_msg}")
+                raise RuntimeError(f"无法加载音频文件，torchaudio和ffmpeg都失败")
+    finally:
+        # 恢复原始日志级别
+        dolphin_logger.setLevel(original_level)
+
+    if waveform is None:
+        raise RuntimeError("音频加载失败，waveform为None")
+    return waveform
+
+
+def transcribe_waveform(waveform, model=None, inference_mode: bool = None) -> str:
+    """
+    对16kHz单声道波形进行识别，返回处理后的文本（可能为空字符串）
+    model为None时使用全局模型；inference_mode为None时跟随全局优化状态
+    """
+    if model is None:
+        model = DOLPHIN_MODEL
+        if inference_mode is None:
+            inference_mode = dolphin_optimization_status['enabled'] and DOLPHIN_OPTIMIZE_CONFIG['inference_mode']
+    if not DOLPHIN_AVAILABLE or model is None:
+        return "这是模拟的语音识别结果"
+
+    with span('inference.dolphin', audio_seconds=round(len(waveform) / 16000, 2)):
+        if inference_mode:
+            import torch
+            with torch.inference_mode():
+                result = model(waveform, lang_sym="zh", region_sym="CN")
+        else:
+            result = model(waveform, lang_sym="zh", region_sym="CN")
+    logger.info(f"🎤 原始识别结果: {result.text}")
+    return clean_dolphin_text(result.text)
+
+
+def get_model_params() -> str:
+    """当前模型参数签名，作为识别结果缓存键的一部分"""
+    applied = ",".join(dolphin_optimization_status['applied'])
+    return f"dolphin-small|zh|CN|{applied}"
+
+
+def transcribe_with_dolphin(audio_file_path: str, raw_key: str = None) -> str:
+    """使用Dolphin进行语音识别，raw_key为原始上传字节的缓存键（可选）"""
     try:
         logger.info(f"🎤 开始Dolphin语音识别，文件: {audio_file_path}")
 
@@ -87,70 +399,22 @@ def transcribe_with_dolphin(audio_file_path: str) -> str:
 
         logger.info(f"🎤 使用Dolphin进行语音识别: {audio_file_path}")
 
-        # 加载音频 - 优先使用torchaudio（更稳定），失败时尝试ffmpeg
-        waveform = None
-        import logging
-        
-        # 临时抑制 dolphin 库内部的错误输出
-        dolphin_logger = logging.getLogger('dolphin')
-        original_level = dolphin_logger.level
-        dolphin_logger.setLevel(logging.ERROR)
-        
-        try:
-            # 优先使用torchaudio（更稳定，不依赖ffmpeg）
-            try:
-                import torchaudio
-                logger.debug("🔄 尝试使用torchaudio加载音频...")
-                
-                # 使用torchaudio加载音频
-                waveform_tensor, sample_rate = torchaudio.load(audio_file_path)
-                
-                # 转换为numpy数组并处理格式
-                import torch
-                if waveform_tensor.dim() > 1:
-                    # 如果是多声道，转换为单声道
-                    waveform_tensor = torch.mean(waveform_tensor, dim=0)
-                
-                # 转换为numpy
-                waveform = waveform_tensor.numpy()
-                
-                # 确保是1D数组
-                if waveform.ndim > 1:
-                    waveform = waveform.flatten()
-                
-                logger.debug(f"🎤 使用torchaudio加载音频成功，形状: {waveform.shape}, 采样率: {sample_rate}")
-            except Exception as torch_error:
-                logger.debug(f"⚠️ torchaudio加载音频失败，尝试ffmpeg: {torch_error}")
-                
-                # 如果torchaudio失败，尝试使用ffmpeg（dolphin的默认方法）
-                try:
-                    waveform = dolphin.load_audio(audio_file_path)
-                    logger.debug(f"🎤 使用ffmpeg加载音频成功，形状: {waveform.shape}")
-                except Exception as ffmpeg_error:
-                    # 两个方法都失败
-                    error_msg = str(ffmpeg_error)
-                    logger.warning(f"⚠️ 音频加载失败（torchaudio和ffmpeg都失败）: {error_msg}")
-                    raise RuntimeError(f"无法加载音频文件，torchaudio和ffmpeg都失败")
-        finally:
-            # 恢复原始日志级别
-            dolphin_logger.setLevel(original_level)
-        
-        if waveform is None:
-            raise RuntimeError("音频加载失败，waveform为None")
+        # 加载音频
+        with span('inference.load_audio'):
+            waveform = load_waveform(audio_file_path)
+
+        # 相同音频内容直接返回缓存结果
+        cache_key = asr_result_cache.make_key(waveform, get_model_params())
+        cached_text = asr_result_cache.get(cache_key)
+        if cached_text is not None:
+            logger.info(f"🎯 ASR缓存命中: {cached_text}")
+            if raw_key:
+                asr_result_cache.link_raw(raw_key, cache_key)
+            return cached_text if cached_text else "识别结果为空"
 
         # 进行识别
-        result = DOLPHIN_MODEL(waveform, lang_sym="zh", region_sym="CN")
-        logger.info(f"🎤 原始识别结果: {result.text}")
-
-        # 提取纯文本结果（去除特殊标记）
-        text = result.text
-        if text.startswith("<zh><CN><asr>"):
-            # 移除语言和区域标记
-            text = text.replace("<zh><CN><asr>", "")
-            # 移除时间标记
-            import re
-            text = re.sub(r'<[0-9.]+>', '', text)
-            text = text.strip()
+        text = transcribe_waveform(waveform)
+        asr_result_cache.put(cache_key, text, raw_key=raw_key)
 
         logger.info(f"🎤 处理后识别结果: {text}")
         return text if text else "识别结果为空"
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+流式ASR服务模块 - 增量接收PCM音频，滑动窗口识别并返回部分结果
+"""
+import time
+import uuid
+import threading
+import numpy as np
+from backend.logger_config import logger
+from backend.config import ASR_STREAM_CONFIG
+from backend.asr_service import transcribe_waveform
+
+# 流式识别会话注册表
+asr_stream_sessions = {}
+asr_stream_lock = threading.Lock()
+
+
+def _common_prefix(a: str, b: str) -> str:
+    """返回两个字符串的公共前缀"""
+    length = min(len(a), len(b))
+    i = 0
+    while i < length and a[i] == b[i]:
+        i += 1
+    return a[:i]
+
+
+class StreamingRecognizer:
+    """单个流式识别会话：累积PCM，按步长重识别未提交音频，静音或超长时提交分段"""
+
+    def __init__(self, stream_id: str, config: dict = None):
+        self.stream_id = stream_id
+        self.config = config or ASR_STREAM_CONFIG
+        self.sample_rate = self.config['sample_rate']
+        self.pending = bytearray()       # 未提交分段的PCM16数据
+        self.leftover = b""              # 上次分片留下的奇数字节
+        self.committed = []              # 已提交分段的识别文本
+        self.hypothesis = ""             # 当前分段的最新识别结果
+        self.stable_text = ""            # 当前分段中连续两次识别一致的前缀
+        self.samples_since_decode = 0
+        self.total_samples = 0
+        self.decode_count = 0
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def _pending_samples(self) -> int:
+        return len(self.pending) // 2
+
+    def _pending_waveform(self):
+        return np.frombuffer(bytes(self.pending), dtype=np.int16).astype(np.float32) / 32768.0
+
+    def _decode(self, waveform) -> str:
+        """识别一段波形，太短或识别失败时返回空字符串"""
+        if len(waveform) < self.config['min_segment_seconds'] * self.sample_rate:
+            return ""
+        self.decode_count += 1
+        try:
+            return transcribe_waveform(waveform)
+        except Exception as e:
+            error_msg = str(e)
+            if "too short" in error_msg.lower() or "TooShortUttError" in error_msg:
+                return ""
+            logger.warning(f"⚠️ 流式识别失败 [ID: {self.stream_id}]: {e}")
+            return ""
+
+    def _trailing_silence(self) -> bool:
+        """判断未提交音频的尾部是否为静音"""
+        silence_samples = int(self.config['silence_seconds'] * self.sample_rate)
+        if self._pending_samples() <= silence_samples:
+            return False
+        tail = np.frombuffer(bytes(self.pending[-silence_samples * 2:]), dtype=np.int16)
+        rms = float(np.sqrt(np.mean((tail.astype(np.float32) / 32768.0) ** 2)))
+        return rms < self.config['silence_rms']
+
+    def _has_speech(self) -> bool:
+        """未提交音频中是否有语音（任一20ms帧的RMS达到静音阈值）"""
+        frame = max(1, int(0.02 * self.sample_rate))
+        samples = np.frombuffer(bytes(self.pending), dtype=np.int16).astype(np.float32) / 32768.0
+        usable = len(samples) - len(samples) % frame
+        if usable == 0:
+            return False
+        frames = samples[:usable].reshape(-1, frame)
+        return bool((np.sqrt(np.mean(frames ** 2, axis=1)) >= self.config['silence_rms']).any())
+
+    def _commit(self, text: str):
+        """提交当前分段"""
+        if text:
+            self.committed.append(text)
+        self.pending = bytearray()
+        self.hypothesis = ""
+        self.stable_text = ""
+        self.samples_since_decode = 0
+
+    def _partial_event(self) -> dict:
+        committed_text = "".join(self.committed)
+        return {
+            'type': 'partial',
+            'stream_id': self.stream_id,
+            'stable_text': committed_text + self.stable_text,
+            'partial_text': self.hypothesis[len(self.stable_text):],
+            'text': committed_text + self.hypothesis,
+            'audio_seconds': round(self.total_samples / self.sample_rate, 2)
+        }
+
+    def feed(self, pcm_bytes: bytes):
+        """追加PCM16数据，需要重新识别时返回部分结果事件，否则返回None"""
+        with self.lock:
+            if self.finished:
+                raise RuntimeError("流式会话已结束")
+            self.last_active = time.time()
+
+            data = self.leftover + pcm_bytes
+            if len(data) % 2:
+                self.leftover = data[-1:]
+                data = data[:-1]
+            else:
+                self.leftover = b""
+            if not data:
+                return None
+
+            self.pending.extend(data)
+            self.samples_since_decode += len(data) // 2
+            self.total_samples += len(data) // 2
+
+            # 一句话结束（尾部静音）或分段过长：识别并提交分段
+            if self._trailing_silence() or (
+                    self._pending_samples() >= self.config['window_seconds'] * self.sample_rate):
+                if not self._has_speech():
+                    # 整段都是静音（用户停顿中）：直接丢弃，不识别，避免每个静音周期都跑一次模型
+                    self._commit("")
+                    return None
+                self._commit(self._decode(self._pending_waveform()))
+                return self._partial_event()
+
+            # 新增音频不足一个步长，不重新识别
+            if self.samples_since_decode < self.config['decode_step_seconds'] * self.sample_rate:
+                return None
+
+            self.samples_since_decode = 0
+            hypothesis = self._decode(self._pending_waveform())
+            # 连续两次识别结果的公共前缀视为稳定
+            self.stable_text = _common_prefix(self.hypothesis, hypothesis)
+            self.hypothesis = hypothesis
+            return self._partial_event()
+
+    def finish(self) -> dict:
+        """结束会话，只识别尚未提交的尾部音频，返回最终结果"""
+        with self.lock:
+            start_time = time.time()
+            if not self.finished:
+                self.finished = True
+                self._commit(self._decode(self._pending_waveform()) if self._has_speech() else "")
+            return {
+                'type': 'final',
+                'stream_id': self.stream_id,
+                'text': "".join(self.committed),
+                'audio_seconds': round(self.total_samples / self.sample_rate, 2),
+                'decode_count': self.decode_count,
+                'tail_processing_time': time.time() - start_time
+            }
+
+
+def cleanup_expired_streams():
+    """清理空闲超时的流式会话"""
+    now = time.time()
+    with asr_stream_lock:
+        expired = [
+            stream_id for stream_id, recognizer in asr_stream_sessions.items()
+            if now - recognizer.last_active > ASR_STREAM_CONFIG['session_ttl']
+        ]
+        for stream_id in expired:
+            del asr_stream_sessions[stream_id]
+    if expired:
+        logger.info(f"🧹 清理超时流式ASR会话 {len(expired)} 个")
+
+
+def create_stream():
+    """创建流式识别会话，超过并发上限时返回None"""
+    cleanup_expired_streams()
+    with asr_stream_lock:
+        if len(asr_stream_sessions) >= ASR_STREAM_CONFIG['max_sessions']:
+            return None
+        recognizer = StreamingRecognizer(str(uuid.uuid4()))
+        asr_stream_sessions[recognizer.stream_id] = recognizer
+    return recognizer
+
+
+def get_stream(stream_id: str):
+    """获取流式识别会话"""
+    with asr_stream_lock:
+        return asr_stream_sessions.get(stream_id)
+
+
+def close_stream(stream_id: str):
+    """移除流式识别会话"""
+    with asr_stream_lock:
+        return asr_stream_sessions.pop(stream_id, None)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩模块 - 按Accept-Encoding协商gzip/brotli/zstd
+
+- 普通响应：超过min_size才压缩，级别按路由类别（api/admin）取 COMPRESSION_CONFIG['levels']
+- 流式响应（SSE、流式聊天）：每个事件压缩后立即刷新，客户端无需等待缓冲区填满
+- 静态文件（admin_panel.html）：启动后首次访问时按最高级别预压缩各编码版本并缓存在内存，文件修改后自动重新生成
+- brotli、zstandard为可选依赖，未安装时只协商gzip
+"""
+import os
+import gzip
+import zlib
+import hashlib
+import threading
+from backend.config import COMPRESSION_CONFIG
+from backend.logger_config import logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def available_encodings() -> list:
+    """按优先级返回当前可用的编码"""
+    installed = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [name for name in COMPRESSION_CONFIG['preference'] if installed.get(name)]
+
+
+AVAILABLE_ENCODINGS = available_encodings()
+
+
+def negotiate(accept_encoding: str):
+    """根据Accept-Encoding选择编码，q值相同时按服务端优先级；不接受任何可用编码时返回None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in AVAILABLE_ENCODINGS:
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def route_class(path: str) -> str:
+    """按路径前缀确定路由类别"""
+    for prefix, name in COMPRESSION_CONFIG['route_classes'].items():
+        if path.startswith(prefix):
+            return name
+    return 'api'
+
+
+def level_for(route_class_name: str, encoding: str) -> int:
+    return COMPRESSION_CONFIG['levels'][route_class_name][encoding]
+
+
+def is_compressible(content_type: str) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSION_CONFIG['mimetypes'])
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """一次性压缩完整响应体"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"不支持的编码: {encoding}")
+
+
+class StreamCompressor:
+    """流式压缩器：每次compress()的输出都已刷新，可以单独发送给客户端解压"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            # wbits=31 输出gzip头尾
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"不支持的编码: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'gzip':
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'gzip':
+            return self._compressor.flush(zlib.Z_FINISH)
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, encoding: str, level: int):
+    """逐块压缩可迭代的响应体，关闭时同时关闭原始迭代器"""
+    compressor = StreamCompressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class StaticAsset:
+    """内存中缓存的静态文件及其预压缩版本"""
+
+    def __init__(self, path: str, content_type: str):
+        self.path = path
+        self.content_type = content_type
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._variants = {}
+        self.etag = None
+
+    def _load_if_changed(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            variants = {None: data}
+            for encoding in AVAILABLE_ENCODINGS:
+                variants[encoding] = compress(data, encoding, level_for('static', encoding))
+            self._variants = variants
+            self.etag = hashlib.sha1(data).hexdigest()[:16]
+            self._mtime = mtime
+            sizes = ', '.join(f"{name}={len(body)}" for name, body in variants.items() if name)
+            logger.info(f"📦 静态文件已预压缩: {os.path.basename(self.path)} 原始{len(data)}字节 ({sizes})")
+
+    def select(self, accept_encoding: str):
+        """返回 (编码, 响应体, etag)，编码为None表示不压缩"""
+        self._load_if_changed()
+        encoding = negotiate(accept_encoding)
+        variants = self._variants
+        if encoding not in variants:
+            encoding = None
+        etag = self.etag if encoding is None else f"{self.etag}-{encoding}"
+        return encoding, variants[encoding], etag
+
+
+def _should_compress(response, method: str) -> bool:
+    if method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return is_compressible(response.mimetype)
+
+
+def init_app(app):
+    """注册Flask响应压缩钩子"""
+    if not COMPRESSION_CONFIG['enabled']:
+        return
+    from flask import request
+
+    @app.after_request
+    def _compress_response(response):
+        if not _should_compress(response, request.method):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            # 流式响应长度未知，不做大小判断
+            response.response = compress_stream(response.response, encoding, level_for('stream', encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < COMPRESSION_CONFIG['min_size']:
+                return response
+            response.set_data(compress(data, encoding, level_for(route_class(request.path), encoding)))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class CompressionMiddleware:
+    """ASGI压缩中间件（用于asgi.py中的异步路由，其余Flask接口由init_app处理）"""
+
+    def __init__(self, app, route_class_name: str = 'api'):
+        self.app = app
+        self.route_class_name = route_class_name
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not COMPRESSION_CONFIG['enabled'] or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ''
+        for key, value in scope['headers']:
+            if key == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+        encoding = negotiate(accept_encoding)
+
+        state = {'start': None, 'compressor': None, 'passthrough': False}
+
+        async def compressing_send(message):
+            if message['type'] == 'http.response.start':
+                headers = {key.lower(): value for key, value in message['headers']}
+                content_type = headers.get(b'content-type', b'').decode('latin-1')
+                status = message['status']
+                if (b'content-encoding' in headers or not is_compressible(content_type)
+                        or status < 200 or status in (204, 304)):
+                    state['passthrough'] = True
+                    await send(message)
+                    return
+                # 第一个body消息到达后才能判断是否为流式响应
+                state['start'] = message
+                return
+
+            if message['type'] != 'http.response.body' or state['passthrough']:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            start = state['start']
+            if start is not None:
+                state['start'] = None
+                headers = [(k, v) for k, v in start['headers'] if k.lower() != b'content-length']
+                headers.append((b'vary', b'Accept-Encoding'))
+                if encoding is None or (not more_body and len(body) < COMPRESSION_CONFIG['min_size']):
+                    state['passthrough'] = True
+                    if not more_body:
+                        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                    await send({**start, 'headers': headers})
+                    await send(message)
+                    return
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+                if not more_body:
+                    body = compress(body, encoding, level_for(self.route_class_name, encoding))
+                    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                    await send({**start, 'headers': headers})
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                state['compressor'] = StreamCompressor(encoding, level_for('stream', encoding))
+                await send({**start, 'headers': headers})
+
+            compressor = state['compressor']
+            data = compressor.compress(body) if body else b''
+            if not more_body:
+                data += compressor.finish()
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, compressing_send)
@@ -38,6 +38,48 @@ DOUBAO_TTS_SPEAKER = "zh_female_vv_jupiter_bigtts"  # vv音色，活泼灵动的
 DOLPHIN_MODEL_PATH = "model"
 DOLPHIN_MODEL = None
 
+# Dolphin CPU优化推理模式（默认关闭，需先用 compare_asr_modes.py 确认准确率损失可接受）
+DOLPHIN_OPTIMIZE_CONFIG = {
+    'enabled': os.environ.get('DOLPHIN_OPTIMIZED', '0') == '1',
+    'quantize_int8': True,         # 线性层动态int8量化
+    'inference_mode': True,        # 使用torch.inference_mode推理
+    'graph_mode': None,            # 图优化：None / 'torchscript' / 'compile'
+    'num_threads': None,           # intra-op线程数，None表示使用torch默认值
+    'num_interop_threads': 1       # inter-op线程数
+}
+
+# ASR对比测试语料目录（wav文件 + transcripts.json参考文本）
+ASR_CORPUS_DIR = "asr_corpus"
+
+# 流式ASR配置（分片上传PCM，滑动窗口增量识别）
+ASR_STREAM_CONFIG = {
+    'sample_rate': 16000,          # 仅接受16kHz单声道PCM16小端数据
+    'decode_step_seconds': 1.0,    # 新增音频达到该时长才重新识别一次
+    'window_seconds': 20.0,        # 未提交音频超过该时长时强制提交分段
+    'silence_seconds': 0.6,        # 尾部静音达到该时长视为一句话结束，提交分段
+    'silence_rms': 0.01,           # 静音判定的RMS阈值（归一化幅度）
+    'min_segment_seconds': 0.3,    # 短于该时长的分段不做识别
+    'session_ttl': 120,            # 会话空闲超时时间（秒）
+    'max_sessions': 16,            # 同时存在的流式会话上限
+    'read_chunk_bytes': 6400       # 分块上传时每次读取的字节数（0.2秒音频）
+}
+
+# ASR模型加载与预热配置
+ASR_WARMUP_CONFIG = {
+    'background_load': os.environ.get('ASR_BACKGROUND_LOAD', '1') == '1',  # 后台线程加载，不阻塞服务启动
+    'warmup_seconds': 2.0,         # 预热用合成音频时长（0表示不预热）
+    'ready_wait_seconds': float(os.environ.get('ASR_READY_WAIT', '0')),  # 未就绪时请求最多排队等待的秒数，0为立即返回503
+    'retry_after': 5               # 503响应的Retry-After秒数
+}
+
+# ASR结果缓存配置（按解码后PCM内容+模型参数哈希，重复音频直接返回缓存结果）
+ASR_CACHE_CONFIG = {
+    'enabled': os.environ.get('ASR_CACHE_ENABLED', '1') == '1',
+    'max_entries': 1024,           # 内存LRU最大条目数
+    'disk_enabled': os.environ.get('ASR_CACHE_DISK', '0') == '1',
+    'disk_dir': "asr_cache"        # 磁盘缓存目录（相对项目根目录）
+}
+
 # TTS配置
 TTS_CONFIG = {
     'max_retries': 2,
@@ -56,6 +98,181 @@ TTS_CONFIG = {
     'chunk_size': 1024
 }
 
+# 系统资源后台采样配置（健康检查直接读取最新快照，不再阻塞请求线程）
+SYSTEM_SAMPLER_CONFIG = {
+    'interval': float(os.environ.get('SYSTEM_SAMPLE_INTERVAL', '5')),  # 采样间隔（秒）
+    'disk_path': '/'               # 统计磁盘使用率的路径
+}
+
+# 延迟直方图配置（按服务和接口统计滑动窗口分位数）
+LATENCY_METRICS_CONFIG = {
+    'slot_seconds': 10,            # 时间片粒度（秒），窗口边界误差不超过一个时间片
+    'windows': {'1m': 60, '5m': 300, '1h': 3600},
+    'histogram_min': 0.0001,       # 最小分桶边界（秒）
+    'histogram_max': 600,          # 超过该值的耗时计入最后一个桶（秒）
+    'histogram_growth': 1.08       # 相邻桶边界倍数，分位数相对误差约4%
+}
+
+# 请求链路追踪配置
+TRACING_CONFIG = {
+    'enabled': os.environ.get('TRACING_ENABLED', '1') == '1',
+    'server_timing': True,         # 在响应中写入Server-Timing头
+    'slow_threshold_ms': float(os.environ.get('TRACE_SLOW_MS', '1000')),  # 超过该耗时的请求进入慢请求缓冲区
+    'ring_size': 200,              # 慢请求环形缓冲区容量
+    'max_spans': 500,              # 单个请求最多记录的阶段数
+    'otlp_file': os.environ.get('TRACE_OTLP_FILE'),  # 设置后以OTLP JSON逐行追加导出
+    'otlp_export_all': False,      # True时导出全部请求，否则只导出慢请求
+    'service_name': 'nexus-backend'
+}
+
+# 服务探测配置（后台定时轻量探测，健康检查只读取结果）
+PROBE_CONFIG = {
+    'tts_host': 'speech.platform.bing.com',   # edge-tts服务端点
+    'tts_port': 443,
+    'tts_interval': 60,            # TTS端点TLS握手探测间隔（秒）
+    'tts_voices_interval': 3600,   # 音色列表刷新间隔（秒）
+    'deepseek_interval': 60,       # DeepSeek端点TLS握手探测间隔（秒）
+    'asr_interval': 30,            # ASR模型状态探测间隔（秒）
+    'timeout': 5,                  # 单次探测超时（秒）
+    'synthesis_cache_seconds': 600  # 诊断接口实际合成测试结果的缓存时间（秒）
+}
+
+# 生产服务配置（serve.py）
+SERVER_CONFIG = {
+    'host': os.environ.get('SERVER_HOST', '0.0.0.0'),
+    'port': int(os.environ.get('SERVER_PORT', '5000')),
+    'backend': os.environ.get('SERVER_BACKEND', 'auto'),  # auto / waitress / gunicorn（不支持Windows） / uvicorn（ASGI）
+    'workers': int(os.environ.get('SERVER_WORKERS', '1')),  # 进程数；每个进程各自加载ASR模型和内存缓存
+    'threads': int(os.environ.get('SERVER_THREADS', '32')),  # 每个进程的处理线程数，SSE流和TTS长请求各占一个线程
+    'connection_limit': int(os.environ.get('SERVER_CONNECTION_LIMIT', '200')),
+    'channel_timeout': 120,  # 空闲连接超时（秒）
+    'request_timeout': 120,  # gunicorn worker无响应超时（秒）
+    'drain_seconds': float(os.environ.get('SERVER_DRAIN_SECONDS', '30')),  # 关闭时等待进行中请求/流结束的最长时间
+    'preload': os.environ.get('SERVER_PRELOAD', '1') == '1'  # 启动前预加载故事目录和音色列表
+}
+
+# ASGI服务配置（asgi.py，python serve.py --backend uvicorn）
+ASGI_CONFIG = {
+    'db_threads': int(os.environ.get('ASGI_DB_THREADS', '32')),  # 执行同步数据库调用的线程数
+    'wsgi_threads': int(os.environ.get('ASGI_WSGI_THREADS', '32')),  # 其余Flask接口使用的线程数
+    'upstream_connections': 1000,  # DeepSeek连接池上限
+    'upstream_connect_timeout': 10,  # 秒
+    'upstream_read_timeout': 60,  # 两次读取之间的最长等待（秒）
+    'limit_concurrency': int(os.environ.get('ASGI_LIMIT_CONCURRENCY', '5000'))  # 超过后返回503
+}
+
+# JSON序列化配置
+JSON_CONFIG = {
+    'backend': os.environ.get('JSON_BACKEND', 'auto')  # auto（有orjson时使用orjson） / orjson / stdlib
+}
+
+# 响应压缩配置（按Accept-Encoding协商，优先级 zstd > br > gzip，未安装brotli/zstandard时只用gzip）
+COMPRESSION_CONFIG = {
+    'enabled': os.environ.get('COMPRESSION_ENABLED', '1') == '1',
+    'min_size': int(os.environ.get('COMPRESSION_MIN_SIZE', '1024')),  # 小于该字节数的响应不压缩
+    'preference': ['zstd', 'br', 'gzip'],
+    # 各类路由的压缩级别：stream为SSE/流式响应（逐事件刷新，级别低以减少延迟），static为预压缩的静态文件
+    'levels': {
+        'api': {'gzip': 6, 'br': 5, 'zstd': 3},
+        'admin': {'gzip': 6, 'br': 6, 'zstd': 6},
+        'stream': {'gzip': 4, 'br': 4, 'zstd': 3},
+        'static': {'gzip': 9, 'br': 11, 'zstd': 19}
+    },
+    'route_classes': {'/api/admin': 'admin'},  # 路径前缀 -> 路由类别，未匹配的为api
+    'mimetypes': [
+        'application/json', 'application/javascript', 'application/xml',
+        'application/openmetrics-text', 'image/svg+xml', 'text/'
+    ]  # 以这些前缀开头的Content-Type才压缩（音频等已压缩格式不处理）
+}
+
+# 用户目录缓存配置（user_exists/get_user_by_id，创建用户、重置密码、禁用用户时失效）
+USER_CACHE_CONFIG = {
+    'enabled': os.environ.get('USER_CACHE_ENABLED', '1') == '1',
+    'positive_ttl': float(os.environ.get('USER_CACHE_TTL', '300')),  # 已存在用户的缓存时间（秒）
+    'negative_ttl': float(os.environ.get('USER_CACHE_NEGATIVE_TTL', '30')),  # 不存在的用户ID的缓存时间（秒）
+    'max_entries': 10000,
+    'load_timeout': 15             # 并发未命中时等待其他线程查库的最长时间（秒）
+}
+
+# 阅读进度写缓冲配置（同一用户同一故事只保留最新位置，定期批量写库）
+READING_PROGRESS_BUFFER_CONFIG = {
+    'enabled': os.environ.get('PROGRESS_BUFFER_ENABLED', '1') == '1',
+    'flush_interval': float(os.environ.get('PROGRESS_FLUSH_INTERVAL', '5')),  # 批量写库间隔（秒）
+    'max_pending': 20000,          # 待写入条目超过该数量时立即写库
+    'batch_size': 500,             # 每条批量语句最多写入的行数
+    'journal_dir': os.environ.get('PROGRESS_JOURNAL_DIR', 'journal'),  # 未写库数据的本地日志目录（相对项目根目录），为空时不记录
+    'journal_fsync': os.environ.get('PROGRESS_JOURNAL_FSYNC', '0') == '1',  # 每条日志都fsync（防断电，默认只防进程崩溃）
+    'completion_ttl': 300          # 完成状态缓存时间（秒）
+}
+
+# 会话注册表配置（活跃会话常驻内存，活跃时间批量写入sessions表）
+SESSION_REGISTRY_CONFIG = {
+    'idle_timeout': float(os.environ.get('SESSION_IDLE_TIMEOUT', '1800')),  # 无活动超过该时间的会话标记结束（秒）
+    'flush_interval': float(os.environ.get('SESSION_FLUSH_INTERVAL', '5')),  # 批量写入活跃时间和到期检查的间隔（秒）
+    'batch_size': 500,             # 每条批量语句最多写入的行数
+    'wheel_tick': 10,              # 时间轮每格的时长（秒），到期检查最多延迟一格
+    'wheel_slots': 360             # 时间轮格数（一圈 wheel_tick * wheel_slots 秒）
+}
+
+# 对话列表缓存配置（按用户缓存会话汇总，该用户产生新交互时失效）
+CONVERSATION_CACHE_CONFIG = {
+    'enabled': os.environ.get('CONVERSATION_CACHE_ENABLED', '1') == '1',
+    'ttl': float(os.environ.get('CONVERSATION_CACHE_TTL', '300')),  # 多进程部署时其他进程写入的交互最多延迟这么久可见（秒）
+    'max_users': 5000,
+    'preview_length': 100          # 最后一条消息预览的字符数
+}
+
+# 列表分页配置（游标分页的总数统计）
+PAGINATION_CONFIG = {
+    'default_total': os.environ.get('PAGINATION_DEFAULT_TOTAL', 'exact'),  # 未指定total参数时的总数方式：exact/approx/none
+    'count_cache_ttl': float(os.environ.get('PAGINATION_COUNT_CACHE_TTL', '60'))  # 总数缓存时间（秒）
+}
+
+# 管理后台聚合接口配置（/api/admin/dashboard）
+ADMIN_DASHBOARD_CONFIG = {
+    'ttl': float(os.environ.get('ADMIN_DASHBOARD_TTL', '10')),  # 结果新鲜期（秒），期内直接返回缓存
+    'stale_ttl': float(os.environ.get('ADMIN_DASHBOARD_STALE_TTL', '60')),  # 过期后仍可返回旧结果的时间（秒），同时后台刷新
+    'db_workers': int(os.environ.get('ADMIN_DASHBOARD_DB_WORKERS', '6')),  # 各面板并行查询的线程数
+    'max_entries': 64,  # 不同参数组合的缓存条目上限
+    'stats_days': 30,  # 统计面板默认天数
+    'active_hours': 24  # 活跃用户面板默认小时数
+}
+
+# 管理员批量操作配置（同一连接上按块执行多行语句，每块一个事务）
+ADMIN_BULK_CONFIG = {
+    'chunk_size': int(os.environ.get('ADMIN_BULK_CHUNK_SIZE', '500')),  # 每块的操作/记录数
+    'max_items': int(os.environ.get('ADMIN_BULK_MAX_ITEMS', '10000'))  # 单次请求的上限
+}
+
+# 过期数据清理配置（按主键分批删除，每批一个小事务，中断后从水位继续）
+RETENTION_CONFIG = {
+    'enabled': os.environ.get('RETENTION_ENABLED', '1') == '1',
+    # 表名 -> 时间列、保留天数、时间与主键是否同序（同序的表从水位继续，否则每次从头扫描）
+    'policies': {
+        'interactions': {
+            'time_column': 'timestamp',
+            'days': int(os.environ.get('RETENTION_INTERACTIONS_DAYS', '90')),
+            'monotonic': True
+        },
+        'system_logs': {
+            'time_column': 'timestamp',
+            'days': int(os.environ.get('RETENTION_SYSTEM_LOGS_DAYS', '90')),
+            'monotonic': True
+        },
+        'sessions': {
+            'time_column': 'ended_at',
+            'days': int(os.environ.get('RETENTION_SESSIONS_DAYS', '90')),
+            'monotonic': False
+        }
+    },
+    'batch_size': int(os.environ.get('RETENTION_BATCH_SIZE', '1000')),  # 每批删除行数
+    'sleep_seconds': float(os.environ.get('RETENTION_SLEEP_SECONDS', '0.2')),  # 批次之间的间隔，给业务写入和主从复制让路
+    'archive_dir': os.environ.get('RETENTION_ARCHIVE_DIR', ''),  # 删除前归档为 .jsonl.gz 的目录，为空则不归档
+    'window_start': os.environ.get('RETENTION_WINDOW_START', '03:00'),  # 低峰时段开始时间（本地时间）
+    'window_hours': float(os.environ.get('RETENTION_WINDOW_HOURS', '2')),  # 低峰时段长度，超出后暂停，下个时段继续
+    'lock_name': 'nexus_data_retention'  # 多进程/多实例只有一个在清理
+}
+
 # 允许登录的用户白名单（已移除限制，允许所有数据库中的激活用户登录）
 # 如果需要限制特定用户，可以在这里添加
 ALLOWED_USERS = None  # None 表示不限制，允许所有激活用户登录
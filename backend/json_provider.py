@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+JSON序列化模块 - 安装了orjson时使用orjson，否则回退到标准库json
+
+- 直接处理pymysql返回的datetime/date（ISO 8601格式）和Decimal（转为float），无需在查询结果上逐行转换
+- FastJSONProvider注册为Flask的JSON provider，jsonify直接生成UTF-8字节
+- encode_sse 复用预分配的字节前后缀生成SSE事件帧
+"""
+import json
+import decimal
+from datetime import date, datetime, time as dt_time
+from flask.json.provider import DefaultJSONProvider
+from backend.config import JSON_CONFIG
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+USE_ORJSON = ORJSON_AVAILABLE and JSON_CONFIG['backend'] in ('auto', 'orjson')
+
+# SSE事件帧的固定前后缀
+SSE_DATA_PREFIX = b"data: "
+SSE_EVENT_SUFFIX = b"\n\n"
+
+
+def _default(obj):
+    """两种后端共用的类型转换：orjson原生处理datetime/date，其余类型在这里转换"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, dt_time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    # numpy标量等带item()的类型
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if USE_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    _stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps_bytes(obj) -> bytes:
+        return _stdlib_encoder.encode(obj).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
+
+
+def dumps(obj) -> str:
+    return dumps_bytes(obj).decode('utf-8')
+
+
+def encode_sse(chunk) -> bytes:
+    """编码为一条SSE事件：data: <json>\\n\\n"""
+    return b"".join((SSE_DATA_PREFIX, dumps_bytes(chunk), SSE_EVENT_SUFFIX))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider，jsonify/get_json使用上面的序列化实现"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        # 显式传入参数（如indent）时交给标准库，保持原有行为
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('ensure_ascii', False)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def init_app(app):
+    """注册为Flask应用的JSON provider"""
+    app.json = FastJSONProvider(app)
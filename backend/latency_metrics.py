@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+延迟指标模块 - 线程安全、固定内存的对数分桶延迟直方图，支持滑动时间窗口统计
+"""
+import math
+import time
+import threading
+from backend.config import LATENCY_METRICS_CONFIG
+
+
+class _Slot:
+    """一个时间片内的直方图和计数"""
+    __slots__ = ('slot_id', 'buckets', 'count', 'total', 'max', 'failures', 'error_types')
+
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        self.buckets = {}         # 桶序号 -> 次数（稀疏存储）
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.failures = 0
+        self.error_types = {}
+
+    def add(self, bucket: int, value: float, success: bool, error_type: str):
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if not success:
+            self.failures += 1
+        if error_type:
+            self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+
+    def merge(self, other: '_Slot'):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.failures += other.failures
+        for error_type, count in other.error_types.items():
+            self.error_types[error_type] = self.error_types.get(error_type, 0) + count
+
+
+class WindowedLatencyHistogram:
+    """
+    对数分桶延迟直方图：相邻桶边界按growth倍数增长，分位数相对误差不超过(growth-1)/2
+    按slot_seconds划分时间片组成环形缓冲，查询时合并窗口内的时间片
+    """
+
+    def __init__(self, config: dict = None):
+        config = config or LATENCY_METRICS_CONFIG
+        self.slot_seconds = config['slot_seconds']
+        self.min_value = config['histogram_min']
+        self.log_growth = math.log(config['histogram_growth'])
+        self.max_bucket = int(math.log(config['histogram_max'] / self.min_value) / self.log_growth) + 1
+        self.num_slots = int(max(config['windows'].values()) // self.slot_seconds) + 1
+        self.slots = [None] * self.num_slots
+        self.lifetime = _Slot(0)
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(int(math.log(value / self.min_value) / self.log_growth) + 1, self.max_bucket)
+
+    def _bucket_value(self, bucket: int) -> float:
+        """桶内代表值（上下边界的几何中点）"""
+        if bucket == 0:
+            return self.min_value
+        return self.min_value * math.exp((bucket - 0.5) * self.log_growth)
+
+    def record(self, value: float, success: bool = True, error_type: str = None, now: float = None):
+        """记录一次请求耗时（秒）"""
+        now = time.time() if now is None else now
+        slot_id = int(now // self.slot_seconds)
+        bucket = self._bucket(value)
+        with self.lock:
+            index = slot_id % self.num_slots
+            slot = self.slots[index]
+            if slot is None or slot.slot_id != slot_id:
+                slot = _Slot(slot_id)
+                self.slots[index] = slot
+            slot.add(bucket, value, success, error_type)
+            self.lifetime.add(bucket, value, success, error_type)
+
+    def _merged(self, window: float, now: float) -> _Slot:
+        current = int(now // self.slot_seconds)
+        oldest = current - int(math.ceil(window / self.slot_seconds)) + 1
+        merged = _Slot(current)
+        with self.lock:
+            for slot in self.slots:
+                if slot is not None and oldest <= slot.slot_id <= current:
+                    merged.merge(slot)
+        return merged
+
+    def _quantiles(self, slot: _Slot, quantiles: tuple) -> list:
+        results = []
+        ordered = sorted(slot.buckets.items())
+        for quantile in quantiles:
+            rank = max(1, math.ceil(quantile * slot.count))
+            seen = 0
+            for bucket, count in ordered:
+                seen += count
+                if seen >= rank:
+                    results.append(min(self._bucket_value(bucket), slot.max))
+                    break
+        return results
+
+    def _summarize(self, slot: _Slot, seconds: float) -> dict:
+        summary = {
+            'count': slot.count,
+            'throughput_rps': slot.count / seconds if seconds > 0 else 0,
+            'failures': slot.failures,
+            'error_rate': slot.failures / slot.count * 100 if slot.count else 0,
+            'error_types': dict(slot.error_types),
+            'mean_ms': slot.total / slot.count * 1000 if slot.count else 0,
+            'p50_ms': 0,
+            'p90_ms': 0,
+            'p99_ms': 0,
+            'max_ms': slot.max * 1000
+        }
+        if slot.count:
+            p50, p90, p99 = self._quantiles(slot, (0.5, 0.9, 0.99))
+            summary.update({'p50_ms': p50 * 1000, 'p90_ms': p90 * 1000, 'p99_ms': p99 * 1000})
+        return summary
+
+    def window_stats(self, window: float, now: float = None) -> dict:
+        """统计最近window秒的延迟分位数、吞吐和错误率"""
+        now = time.time() if now is None else now
+        # 启动不足一个窗口时按实际运行时间计算吞吐
+        covered = min(window, max(now - self.created_at, self.slot_seconds))
+        return self._summarize(self._merged(window, now), covered)
+
+    def lifetime_stats(self) -> dict:
+        """统计启动以来的全部请求"""
+        with self.lock:
+            lifetime = _Slot(0)
+            lifetime.merge(self.lifetime)
+        return self._summarize(lifetime, time.time() - self.created_at)
+
+
+class LatencyRecorder:
+    """按名称（服务或接口）维护多个延迟直方图"""
+
+    def __init__(self, config: dict = None):
+        self.config = config or LATENCY_METRICS_CONFIG
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def get(self, name: str) -> WindowedLatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = WindowedLatencyHistogram(self.config)
+                    self.histograms[name] = histogram
+        return histogram
+
+    def record(self, name: str, value: float, success: bool = True, error_type: str = None):
+        self.get(name).record(value, success, error_type)
+
+    def names(self) -> list:
+        with self.lock:
+            return sorted(self.histograms)
+
+    def stats(self, name: str) -> dict:
+        """返回各时间窗口和累计统计"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            return None
+        now = time.time()
+        result = {
+            label: histogram.window_stats(seconds, now)
+            for label, seconds in self.config['windows'].items()
+        }
+        result['lifetime'] = histogram.lifetime_stats()
+        return result
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+服务生命周期模块 - 统计进行中的请求（含SSE流），支持优雅关闭
+
+关闭流程：进入排空状态（新请求返回503，负载均衡据此摘除节点）→ 等待进行中的请求和
+流式响应结束（最长drain_seconds）→ 依次执行注册的关闭钩子（停止后台线程、刷新待写入数据）。
+"""
+import time
+import threading
+from backend.logger_config import logger
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+_inflight_idle = threading.Condition(_inflight_lock)
+_draining = threading.Event()
+_shutdown_hooks = []
+_shutdown_done = False
+
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+
+def inflight_count() -> int:
+    return _inflight
+
+
+def register_shutdown_hook(name: str, func):
+    """注册关闭钩子，按注册顺序执行"""
+    _shutdown_hooks.append((name, func))
+
+
+def request_started():
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+
+
+def request_finished():
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+        if _inflight <= 0:
+            _inflight_idle.notify_all()
+
+
+def wait_for_idle(timeout: float) -> int:
+    """等待进行中的请求结束，返回超时后仍未结束的请求数"""
+    deadline = time.monotonic() + timeout
+    with _inflight_lock:
+        while _inflight > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _inflight_idle.wait(remaining)
+        return _inflight
+
+
+def run_shutdown_hooks():
+    """执行全部关闭钩子（只执行一次），单个钩子失败不影响其他钩子"""
+    global _shutdown_done
+    if _shutdown_done:
+        return
+    _shutdown_done = True
+    for name, func in _shutdown_hooks:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"❌ 关闭钩子 {name} 执行失败: {e}")
+
+
+def graceful_shutdown(drain_seconds: float) -> int:
+    """排空请求并执行关闭钩子，返回被强制中断的请求数"""
+    _draining.set()
+    logger.info(f"⏳ 开始排空请求，进行中: {_inflight}，最长等待 {drain_seconds:.0f}s")
+    start = time.monotonic()
+    remaining = wait_for_idle(drain_seconds)
+    if remaining:
+        logger.warning(f"⚠️ 排空超时，仍有 {remaining} 个请求未结束")
+    else:
+        logger.info(f"✅ 请求已排空，耗时 {time.monotonic() - start:.1f}s")
+    run_shutdown_hooks()
+    return remaining
+
+
+def init_app(app):
+    """注册请求钩子：统计进行中的请求，排空期间拒绝新请求"""
+    from flask import request, jsonify
+
+    @app.before_request
+    def _track_request():
+        if _draining.is_set():
+            response = jsonify({'error': '服务正在关闭，请稍后重试', 'error_code': 'SERVER_DRAINING'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        request_started()
+        request.environ['nexus.inflight'] = True
+
+    @app.after_request
+    def _release_request(response):
+        if request.environ.pop('nexus.inflight', False):
+            # 流式响应在发送完毕后才关闭
+            response.call_on_close(request_finished)
+        return response
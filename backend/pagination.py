@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+游标分页模块 - 按索引列做keyset分页，翻到多深每页都只扫描 limit 行
+
+- 游标是上一页最后一行排序键的base64编码，对客户端不透明，只能原样传回
+- 不传cursor时仍按offset分页（兼容旧客户端），返回的next_cursor可以切换到游标分页
+- 总数可选：exact为缓存的COUNT(*)，approx为information_schema中的估算行数，none不统计
+"""
+import json
+import time
+import base64
+import binascii
+import threading
+from backend.config import PAGINATION_CONFIG
+
+# 各列表的排序键（最后一列唯一，保证顺序稳定）
+KEYSETS = {
+    'reading_progress': ('last_read_time', 'id'),
+    'interaction_progress': ('user_id', 'usage_date'),
+    'user_interactions': ('timestamp', 'id'),
+    'session_interactions': ('timestamp', 'id'),
+    'users': ('created_at', 'id'),
+}
+
+TOTAL_MODES = ('exact', 'approx', 'none')
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或不属于当前列表"""
+
+
+def encode_cursor(kind: str, values) -> str:
+    payload = {'k': kind, 'v': [value if value is None or isinstance(value, (int, float)) else str(value)
+                                for value in values]}
+    data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(kind: str, token: str) -> list:
+    """返回排序键的值列表（时间类型为字符串，直接作为SQL参数）"""
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(data.decode('utf-8'))
+        values = payload['v']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise InvalidCursor('无效的分页游标')
+    if payload.get('k') != kind or not isinstance(values, list) or len(values) != len(KEYSETS[kind]):
+        raise InvalidCursor('分页游标与当前列表不匹配')
+    return values
+
+
+def next_cursor(kind: str, rows: list, limit: int):
+    """本页取满时返回下一页游标，否则返回None"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(kind, [last[column] for column in KEYSETS[kind]])
+
+
+def keyset_condition(columns, values, descending: bool, nullable_first: bool = False):
+    """
+    生成"排在游标之后"的WHERE条件，返回 (sql, params)
+    展开成 a < x OR (a = x AND b < y) 的形式，MySQL可以直接转换为索引范围扫描；
+    nullable_first 表示第一列可能为NULL（MySQL中NULL降序排在最后、升序排在最前）
+    """
+    op = '<' if descending else '>'
+
+    def expand(cols, vals):
+        parts, params = [], []
+        for i, column in enumerate(cols):
+            equals = [f"{c} = %s" for c in cols[:i]]
+            parts.append('(' + ' AND '.join(equals + [f"{column} {op} %s"]) + ')')
+            params.extend(vals[:i] + [vals[i]])
+        return '(' + ' OR '.join(parts) + ')', params
+
+    columns, values = list(columns), list(values)
+    if not nullable_first:
+        return expand(columns, values)
+
+    first, rest_columns, rest_values = columns[0], columns[1:], values[1:]
+    rest_sql, rest_params = expand(rest_columns, rest_values)
+    if values[0] is None:
+        if descending:
+            return f"({first} IS NULL AND {rest_sql})", rest_params
+        return f"({first} IS NOT NULL OR ({first} IS NULL AND {rest_sql}))", rest_params
+    sql, params = expand(columns, values)
+    if descending:
+        return f"({sql} OR {first} IS NULL)", params
+    return sql, params
+
+
+def page_args(args, default_limit: int):
+    """从查询参数读取 (limit, offset, cursor, total)"""
+    limit = int(args.get('limit', default_limit))
+    offset = int(args.get('offset', 0))
+    if limit < 1 or offset < 0:
+        raise ValueError('limit必须大于0，offset不能为负数')
+    cursor = args.get('cursor') or None
+    total = args.get('total', PAGINATION_CONFIG['default_total'])
+    if total not in TOTAL_MODES:
+        raise ValueError(f"total只能是 {'/'.join(TOTAL_MODES)}")
+    return limit, offset, cursor, total
+
+
+class CountCache:
+    """表行数缓存（线程安全），避免每次翻页都执行COUNT(*)全表扫描"""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = PAGINATION_CONFIG['count_cache_ttl'] if ttl is None else ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        value = loader()
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+服务探测模块 - 在后台线程中按各自周期做轻量可用性探测，健康检查接口只读取最新结果
+
+TTS和DeepSeek只做到上游服务器的TCP+TLS握手（不合成语音、不调用模型），
+edge-tts音色列表按较长周期刷新一次作为更深一层的探测。
+"""
+import ssl
+import time
+import socket
+import asyncio
+import threading
+from urllib.parse import urlparse
+from backend.logger_config import logger
+from backend.config import PROBE_CONFIG, DEEPSEEK_BASE_URL
+
+
+def tls_handshake(host: str, port: int = 443, timeout: float = None) -> dict:
+    """建立TCP连接并完成TLS握手，返回各阶段耗时"""
+    timeout = timeout or PROBE_CONFIG['timeout']
+    start = time.perf_counter()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        connected = time.perf_counter()
+        context = ssl.create_default_context()
+        with context.wrap_socket(sock, server_hostname=host):
+            handshake_done = time.perf_counter()
+    return {
+        'host': host,
+        'connect_ms': round((connected - start) * 1000, 1),
+        'tls_ms': round((handshake_done - connected) * 1000, 1)
+    }
+
+
+def probe_tts_endpoint() -> dict:
+    """edge-tts服务端点可达性"""
+    return tls_handshake(PROBE_CONFIG['tts_host'], PROBE_CONFIG['tts_port'])
+
+
+def probe_tts_voices() -> dict:
+    """拉取edge-tts音色列表（结果缓存到下一次探测）"""
+    import edge_tts
+    # 与TLS探测使用相同的超时：探测在单个后台线程中依次执行，音色列表卡住会拖住其他探测
+    timeout = PROBE_CONFIG['timeout']
+    try:
+        voices = asyncio.run(asyncio.wait_for(edge_tts.list_voices(), timeout))
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"拉取音色列表超时（{timeout}s）")
+    chinese_voices = [voice['ShortName'] for voice in voices if voice.get('Locale', '').startswith('zh-')]
+    if not chinese_voices:
+        raise RuntimeError("音色列表中没有中文音色")
+    return {'voice_count': len(voices), 'chinese_voices': chinese_voices}
+
+
+def probe_deepseek() -> dict:
+    """DeepSeek API端点可达性"""
+    parsed = urlparse(DEEPSEEK_BASE_URL)
+    return tls_handshake(parsed.hostname, parsed.port or 443)
+
+
+def probe_asr() -> dict:
+    """本地ASR模型就绪状态"""
+    from backend.asr_service import get_asr_readiness
+    readiness = get_asr_readiness()
+    if readiness['state'] == 'failed':
+        raise RuntimeError(f"ASR模型加载失败: {readiness['error']}")
+    return {'state': readiness['state'], 'model_loaded': readiness['model_loaded']}
+
+
+class ProbeRunner:
+    """探测调度器：单个后台线程按各探测的周期依次执行"""
+
+    def __init__(self):
+        self.probes = {}
+        self.results = {}
+        self.next_run = {}
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def register(self, name: str, func, interval: float):
+        self.probes[name] = (func, interval)
+        self.next_run[name] = 0
+
+    def run_now(self, name: str) -> dict:
+        """立即执行一次探测并更新结果"""
+        func, interval = self.probes[name]
+        previous = self.results.get(name) or {}
+        start = time.perf_counter()
+        result = {'name': name, 'checked_at': time.time()}
+        try:
+            result['details'] = func()
+            result['healthy'] = True
+            result['consecutive_failures'] = 0
+        except Exception as e:
+            result['healthy'] = False
+            result['error'] = str(e)
+            result['consecutive_failures'] = previous.get('consecutive_failures', 0) + 1
+            if previous.get('healthy', True):
+                logger.warning(f"⚠️ 探测 {name} 失败: {e}")
+        if result['healthy'] and previous.get('healthy') is False:
+            logger.info(f"✅ 探测 {name} 恢复正常")
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        with self.lock:
+            self.results[name] = result
+            self.next_run[name] = time.time() + interval
+        return result
+
+    def get(self, name: str):
+        """最新探测结果，尚未探测时返回None"""
+        return self.results.get(name)
+
+    def get_all(self) -> dict:
+        with self.lock:
+            return dict(self.results)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            now = time.time()
+            for name in list(self.probes):
+                if self._stop_event.is_set():
+                    break
+                if now >= self.next_run.get(name, 0):
+                    self.run_now(name)
+            self._stop_event.wait(1)
+
+    def start(self):
+        """启动后台探测线程（重复调用无副作用）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='service-prober', daemon=True)
+        self._thread.start()
+        logger.info("🔍 服务探测已启动")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=PROBE_CONFIG['timeout'] + 1)
+
+
+def is_probe_healthy(name: str, default: bool = True) -> bool:
+    """读取探测结果判断是否健康，尚未探测时返回default"""
+    result = probe_runner.get(name)
+    return default if result is None else result['healthy']
+
+
+# 全局探测调度器
+probe_runner = ProbeRunner()
+probe_runner.register('tts', probe_tts_endpoint, PROBE_CONFIG['tts_interval'])
+probe_runner.register('tts_voices', probe_tts_voices, PROBE_CONFIG['tts_voices_interval'])
+probe_runner.register('deepseek', probe_deepseek, PROBE_CONFIG['deepseek_interval'])
+probe_runner.register('asr', probe_asr, PROBE_CONFIG['asr_interval'])
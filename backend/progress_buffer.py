@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+阅读进度写缓冲模块 - 滚动时频繁上报的阅读进度先写入内存，定期批量写库
+
+- 按 (user_id, story_id) 合并，只保留最新位置；每 flush_interval 秒一次批量写入
+- 每次更新同时追加到本进程的本地日志文件，进程崩溃后由下次启动的进程回放未写库的数据
+- 完成阅读前先写入该故事的待写入进度，保证完成时的进度计算使用最新位置
+- 后台线程未启动时（脚本、测试等）直接写库，行为与原来一致
+"""
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+import psutil
+import pymysql
+from backend.config import READING_PROGRESS_BUFFER_CONFIG
+from backend.logger_config import logger
+from database_manager import db_manager
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOURNAL_PATTERN = re.compile(r'^reading_progress\.(\d+)\.jsonl')
+
+
+def normalize_progress(current_position, total_length) -> tuple:
+    """把阅读位置和总长度转换为非负整数，无效时抛出ValueError（进入缓冲前校验，避免坏数据拖累整批写库）"""
+    try:
+        current_position = int(current_position)
+        total_length = int(total_length)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('current_position和total_length必须为整数')
+    if current_position < 0 or total_length < 0:
+        raise ValueError('current_position和total_length不能为负数')
+    return current_position, total_length
+
+
+def is_data_error(error: Exception) -> bool:
+    """是否为数据本身导致的写库失败（重试也不会成功），其他错误（连接断开、锁等待超时等）稍后重试"""
+    return isinstance(error, (pymysql.err.DataError, pymysql.err.IntegrityError,
+                              ValueError, TypeError, ArithmeticError, KeyError))
+
+
+class ReadingProgressBuffer:
+    """阅读进度写缓冲（线程安全）"""
+
+    def __init__(self, config: dict = None):
+        self.config = config or READING_PROGRESS_BUFFER_CONFIG
+        self.pending = {}                 # (user_id, story_id) -> 最新进度
+        self.lock = threading.Lock()      # 保护pending和日志文件
+        self.flush_lock = threading.Lock()  # 保证批量写库按顺序执行
+        self.journal_dir = None
+        if self.config.get('journal_dir'):
+            self.journal_dir = os.path.join(PROJECT_ROOT, self.config['journal_dir'])
+        self.journal_path = None
+        self._journal = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self.stats = {
+            'updates': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'flush_errors': 0,
+            'dropped': 0,
+            'recovered': 0,
+            'last_flush_ms': 0.0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---------- 写入 ----------
+
+    def add(self, user_id: str, story_id: str, story_title: str, current_position: int,
+            total_length: int, username: str, device_info: str = None) -> bool:
+        """记录一次进度更新；缓冲未启用或后台线程未运行时直接写库；位置/长度无效时抛出ValueError"""
+        current_position, total_length = normalize_progress(current_position, total_length)
+        story_title = '' if story_title is None else str(story_title)
+        if not self.enabled or not self.running:
+            return db_manager.update_reading_progress(
+                user_id=user_id,
+                story_id=story_id,
+                story_title=story_title,
+                current_position=current_position,
+                total_length=total_length,
+                device_info=device_info,
+                username=username
+            )
+
+        entry = {
+            'user_id': user_id,
+            'username': username,
+            'story_id': story_id,
+            'story_title': story_title,
+            'current_position': current_position,
+            'total_length': total_length,
+            'timestamp': time.time()
+        }
+        with self.lock:
+            key = (user_id, story_id)
+            if key in self.pending:
+                self.stats['coalesced'] += 1
+            self.pending[key] = entry
+            self.stats['updates'] += 1
+            self._append_journal(entry)
+            pending_count = len(self.pending)
+        if pending_count >= self.config['max_pending']:
+            self._wakeup.set()
+        return True
+
+    def get_pending(self, user_id: str, story_id: str = None) -> list:
+        """返回该用户尚未写库的进度（用于读取时覆盖数据库中的旧位置）"""
+        with self.lock:
+            if story_id is not None:
+                entry = self.pending.get((user_id, story_id))
+                return [dict(entry)] if entry else []
+            return [dict(entry) for (uid, _), entry in self.pending.items() if uid == user_id]
+
+    # ---------- 写库 ----------
+
+    def flush(self, keys=None) -> int:
+        """写入待写入进度；keys为None时写入全部并轮换日志文件，返回写入行数"""
+        with self.flush_lock:
+            with self.lock:
+                if keys is None:
+                    batch, self.pending = self.pending, {}
+                    flushing_path = self._rotate_journal() if batch else None
+                else:
+                    batch = {key: self.pending.pop(key) for key in keys if key in self.pending}
+                    flushing_path = None
+            if not batch:
+                return 0
+
+            start_time = time.perf_counter()
+            rows = [dict(entry, last_read_time=datetime.fromtimestamp(entry['timestamp']))
+                    for entry in batch.values()]
+            written = 0
+            failed = {}
+            batch_size = self.config['batch_size']
+            for offset in range(0, len(rows), batch_size):
+                written += self._write_rows(rows[offset:offset + batch_size], batch, failed)
+
+            with self.lock:
+                # 写库失败的条目放回缓冲（期间有更新的以新数据为准），并重新写入当前日志
+                for key, entry in failed.items():
+                    if key not in self.pending:
+                        self.pending[key] = entry
+                        self._append_journal(entry)
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += written
+                self.stats['last_flush_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+            if flushing_path:
+                self._remove_file(flushing_path)
+            return written
+
+    def _write_rows(self, rows: list, batch: dict, failed: dict) -> int:
+        """
+        写入一批进度，返回写入行数
+        数据导致的失败逐条重试，有问题的行丢弃；连接等其他错误放入failed，稍后放回缓冲重试
+        """
+        try:
+            return db_manager.bulk_update_reading_progress(rows)
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            if not is_data_error(e):
+                logger.error(f"❌ 批量写入阅读进度失败（{len(rows)}条，稍后重试）: {e}")
+                for row in rows:
+                    key = (row['user_id'], row['story_id'])
+                    failed[key] = batch[key]
+                return 0
+            if len(rows) == 1:
+                self._drop(rows[0], e)
+                return 0
+            logger.warning(f"⚠️ 批量写入阅读进度失败（{len(rows)}条），逐条重试: {e}")
+        return sum(self._write_rows([row], batch, failed) for row in rows)
+
+    def _drop(self, row: dict, error: Exception):
+        """丢弃无法写库的进度（不再放回缓冲）"""
+        self.stats['dropped'] += 1
+        logger.error(f"❌ 阅读进度数据无法写库，已丢弃: user_id={row['user_id']}, story_id={row['story_id']}, "
+                     f"current_position={row['current_position']!r}, total_length={row['total_length']!r}: {error}")
+
+    def flush_story(self, user_id: str, story_id: str) -> int:
+        """立即写入某个故事的待写入进度"""
+        return self.flush([(user_id, story_id)])
+
+    # ---------- 本地日志 ----------
+
+    def _open_journal(self):
+        if not self.journal_dir:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.journal_path = os.path.join(self.journal_dir, f"reading_progress.{os.getpid()}.jsonl")
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _append_journal(self, entry: dict):
+        """追加一条日志（调用方持有锁）"""
+        if self._journal is None:
+            return
+        try:
+            self._journal.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._journal.flush()
+            if self.config.get('journal_fsync'):
+                os.fsync(self._journal.fileno())
+        except OSError as e:
+            logger.error(f"❌ 写入阅读进度日志失败: {e}")
+
+    def _rotate_journal(self):
+        """把当前日志改名为.flushing并打开新日志，写库成功后删除旧日志（调用方持有锁）"""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        flushing_path = self.journal_path + '.flushing'
+        try:
+            os.replace(self.journal_path, flushing_path)
+        except OSError as e:
+            logger.error(f"❌ 轮换阅读进度日志失败: {e}")
+            flushing_path = None
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        return flushing_path
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"❌ 删除阅读进度日志失败: {e}")
+
+    def _recover_journals(self) -> list:
+        """读取已退出进程遗留的日志放入缓冲（跳过仍在运行的进程的日志），返回已认领的日志文件"""
+        if not self.journal_dir or not os.path.isdir(self.journal_dir):
+            return []
+        my_pid = os.getpid()
+        claimed = []
+        for name in os.listdir(self.journal_dir):
+            match = JOURNAL_PATTERN.match(name)
+            if not match:
+                continue
+            pid = int(match.group(1))
+            if pid != my_pid and psutil.pid_exists(pid):
+                continue
+            path = os.path.join(self.journal_dir, name)
+            claimed_path = f"{path}.recovering.{my_pid}"
+            try:
+                # 改名成功即认领，避免多个进程重复回放
+                os.rename(path, claimed_path)
+            except OSError:
+                continue
+            claimed.append(claimed_path)
+        if not claimed:
+            return []
+
+        recovered = {}
+        for path in sorted(claimed, key=os.path.getmtime):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entry['current_position'], entry['total_length'] = normalize_progress(
+                            entry['current_position'], entry['total_length'])
+                    except (ValueError, TypeError, KeyError):
+                        # 崩溃时最后一行可能不完整；旧版本写入的无效进度直接跳过
+                        continue
+                    key = (entry['user_id'], entry['story_id'])
+                    current = recovered.get(key)
+                    if current is None or current['timestamp'] <= entry['timestamp']:
+                        recovered[key] = entry
+
+        with self.lock:
+            for key, entry in recovered.items():
+                current = self.pending.get(key)
+                if current is None or current['timestamp'] < entry['timestamp']:
+                    self.pending[key] = entry
+            self.stats['recovered'] += len(recovered)
+        logger.info(f"♻️ 从本地日志恢复未写库的阅读进度 {len(recovered)} 条")
+        return claimed
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """启动后台写库线程（每个服务进程各一个）"""
+        if not self.enabled or self.running:
+            return
+        self._stop_event.clear()
+        claimed = []
+        try:
+            claimed = self._recover_journals()
+        except Exception as e:
+            logger.error(f"❌ 回放阅读进度日志失败: {e}")
+        with self.lock:
+            if self._journal is None:
+                self._open_journal()
+                # 恢复的条目写入本进程日志后才删除旧日志
+                for entry in self.pending.values():
+                    self._append_journal(entry)
+        for path in claimed:
+            self._remove_file(path)
+        self._thread = threading.Thread(target=self._run, name='progress-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.config['flush_interval'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ 阅读进度写库线程异常: {e}")
+
+    def stop(self):
+        """停止后台线程并写入剩余进度（关闭钩子）"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        remaining = len(self.pending)
+        self.flush()
+        with self.lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                # 全部写库成功时删除空日志，失败的条目保留在日志中等待下次启动回放
+                if not self.pending and self.journal_path:
+                    self._remove_file(self.journal_path)
+        if remaining:
+            logger.info(f"💾 关闭前写入阅读进度 {remaining} 条")
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self.pending)
+        stats['running'] = self.running
+        return stats
+
+
+# 全局阅读进度写缓冲
+progress_buffer = ReadingProgressBuffer()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus指标模块 - 轻量级计数器/仪表/直方图，按OpenMetrics文本格式导出
+
+热路径上只做一次元组查表和一次加锁自增：标签值按位置传入（不构造字典），
+每组标签的子指标在首次使用时创建并缓存，锁按子指标分片，减少线程间争用。
+"""
+import math
+import threading
+from bisect import bisect_left
+from backend.logger_config import logger
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 分片锁：子指标按创建顺序轮流分配
+_LOCK_STRIPES = [threading.Lock() for _ in range(32)]
+_stripe_counter = 0
+
+
+def _next_stripe():
+    global _stripe_counter
+    _stripe_counter += 1
+    return _LOCK_STRIPES[_stripe_counter % len(_LOCK_STRIPES)]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labelnames: tuple, labelvalues: tuple, extra: str = None) -> str:
+    """渲染标签部分，如 {method="GET",route="/api/health"}"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock', 'label_text')
+
+    def __init__(self, label_text: str):
+        self.value = 0
+        self.lock = _next_stripe()
+        self.label_text = label_text
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'lock', 'labelvalues')
+
+    def __init__(self, bounds: tuple, labelvalues: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最后一个为+Inf桶，非累计存储
+        self.sum = 0.0
+        self.lock = _next_stripe()
+        self.labelvalues = labelvalues
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    """带标签的指标族基类"""
+    metric_type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._create_lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self, labelvalues: tuple):
+        raise NotImplementedError
+
+    def labels(self, *labelvalues):
+        """按位置传入标签值，返回缓存的子指标"""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            with self._create_lock:
+                child = self._children.get(labelvalues)
+                if child is None:
+                    child = self._new_child(labelvalues)
+                    self._children[labelvalues] = child
+        return child
+
+    def _header(self) -> list:
+        return [
+            f"# TYPE {self.name} {self.metric_type}",
+            f"# HELP {self.name} {_escape(self.documentation)}"
+        ]
+
+    def render(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器，导出为 <name>_total"""
+    metric_type = 'counter'
+
+    def _new_child(self, labelvalues):
+        return _CounterChild(_label_text(self.labelnames, labelvalues))
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self) -> list:
+        lines = self._header()
+        for child in list(self._children.values()):
+            lines.append(f"{self.name}_total{child.label_text} {_format_value(child.value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """可增可减的仪表"""
+    metric_type = 'gauge'
+
+    def _new_child(self, labelvalues):
+        return _GaugeChild(_label_text(self.labelnames, labelvalues))
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def render(self) -> list:
+        lines = self._header()
+        for child in list(self._children.values()):
+            lines.append(f"{self.name}{child.label_text} {_format_value(child.value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """固定分桶直方图"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        self._bound_texts = [repr(float(b)) for b in self.bounds] + ['+Inf']
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self, labelvalues):
+        return _HistogramChild(self.bounds, labelvalues)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list:
+        lines = self._header()
+        for child in list(self._children.values()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound_text, count in zip(self._bound_texts, counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, child.labelvalues, f'le="{bound_text}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, child.labelvalues)
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """抓取时通过回调取值的仪表，回调返回数值或[(标签值元组, 数值)]"""
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=(), metric_type='gauge', registry=None):
+        self.callback = callback
+        self.metric_type = metric_type
+        super().__init__(name, documentation, labelnames, registry)
+
+    def render(self) -> list:
+        value = self.callback()
+        if value is None:
+            return []
+        samples = value if isinstance(value, list) else [((), value)]
+        suffix = '_total' if self.metric_type == 'counter' else ''
+        lines = self._header()
+        for labelvalues, sample in samples:
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(sample)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self.lock:
+            self.metrics[metric.name] = metric
+
+    def unregister(self, name: str):
+        with self.lock:
+            self.metrics.pop(name, None)
+
+    def render(self) -> str:
+        """渲染全部指标为OpenMetrics文本"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # OpenMetrics不允许自由格式的注释行，采集失败的指标整组跳过
+                logger.warning(f"⚠️ 指标 {metric.name} 采集失败，本次跳过: {e}")
+                METRICS_COLLECT_ERRORS.labels(metric.name).inc()
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# 指标采集失败（回调出错的指标在该次抓取中被跳过）
+METRICS_COLLECT_ERRORS = Counter(
+    'nexus_metrics_collect_errors', '指标采集失败次数', ('metric',)
+)
+
+# HTTP请求
+HTTP_REQUESTS = Counter(
+    'nexus_http_requests', 'HTTP请求数', ('method', 'route', 'status')
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'nexus_http_request_duration_seconds', 'HTTP请求耗时（到响应头返回）', ('method', 'route')
+)
+
+# 上游服务（DeepSeek等）
+UPSTREAM_REQUEST_DURATION = Histogram(
+    'nexus_upstream_request_duration_seconds', '上游服务请求耗时',
+    ('upstream', 'operation', 'status')
+)
+
+# 数据库连接
+DB_CONNECTIONS_OPENED = Counter(
+    'nexus_db_connections_opened', '新建数据库连接次数', ('outcome',)
+)
+DB_CONNECT_DURATION = Histogram(
+    'nexus_db_connect_duration_seconds', '建立数据库连接耗时', (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 10.0)
+)
+
+# ASR队列
+ASR_INFLIGHT_REQUESTS = Gauge(
+    'nexus_asr_inflight_requests', '正在处理的ASR请求数'
+)
+ASR_REJECTED_REQUESTS = Counter(
+    'nexus_asr_rejected_requests', '被拒绝的ASR请求数', ('reason',)
+)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+interactions热点查询的SQL - database_manager.py执行、check_query_plans.py对同一份SQL做EXPLAIN检查
+
+修改这里的查询后运行 python check_query_plans.py，确认仍然走预期的索引
+"""
+from backend.pagination import keyset_condition
+
+# 用户当天的成功交互：参数 (user_id, 当天0点, 次日0点)
+# 用半开区间代替DATE(timestamp) = 今天，才能走 (user_id, timestamp) 索引
+DAILY_INTERACTIONS_SQL = """
+SELECT
+    interaction_type,
+    timestamp,
+    session_id,
+    duration_seconds
+FROM interactions
+WHERE user_id = %s
+    AND timestamp >= %s AND timestamp < %s
+    AND interaction_type IN ('text', 'voice_home', 'voice_call', 'tts_play')
+    AND success = 1
+ORDER BY timestamp ASC
+"""
+
+# 对话列表：参数 (预览长度, 预览长度, user_id, limit, offset)
+# 内层按会话分组走 (user_id, session_id, timestamp) 索引，外层按主键取每个会话的最后一条交互
+USER_CONVERSATIONS_SQL = """
+SELECT s.session_id, s.interaction_count,
+       s.first_interaction_time, s.last_interaction_time,
+       i.id AS last_interaction_id, i.interaction_type AS last_interaction_type,
+       LEFT(i.content, %s) AS last_content, LEFT(i.response, %s) AS last_response,
+       i.timestamp AS last_timestamp
+FROM (
+    SELECT session_id, COUNT(*) AS interaction_count,
+           MIN(timestamp) AS first_interaction_time,
+           MAX(timestamp) AS last_interaction_time,
+           MAX(id) AS last_id
+    FROM interactions
+    WHERE user_id = %s AND session_id IS NOT NULL
+    GROUP BY session_id
+    ORDER BY last_id DESC
+    LIMIT %s OFFSET %s
+) s
+JOIN interactions i ON i.id = s.last_id
+ORDER BY s.last_id DESC
+"""
+
+INTERACTION_STATS_BY_TYPE_SQL = """
+SELECT
+    interaction_type,
+    SUM(interaction_count) as count,
+    SUM(duration_total) / NULLIF(SUM(duration_count), 0) as avg_duration,
+    SUM(success_count) as success_count,
+    SUM(failure_count) as failure_count
+FROM interaction_daily_rollup
+{where}
+GROUP BY interaction_type
+"""
+
+INTERACTION_STATS_TOTAL_SQL = """
+SELECT
+    COALESCE(SUM(interaction_count), 0) as total_interactions,
+    SUM(duration_total) / NULLIF(SUM(duration_count), 0) as avg_duration,
+    COALESCE(SUM(success_count), 0) as total_success,
+    COALESCE(SUM(failure_count), 0) as total_failure
+FROM interaction_daily_rollup
+{where}
+"""
+
+
+def user_interactions_query(user_id: str, limit: int, offset: int, after: list = None):
+    """
+    用户交互记录（新的在前），返回 (sql, params)
+    按 (timestamp, id) 倒序，直接走 (user_id, timestamp) 索引；after为游标解码后的 [timestamp, id]（忽略offset）
+    """
+    params = [user_id]
+    where = "user_id = %s"
+    if after is not None:
+        condition, condition_params = keyset_condition(['timestamp', 'id'], after, True, nullable_first=True)
+        where += f" AND {condition}"
+        params += condition_params
+        offset = 0
+    sql = f"""
+    SELECT * FROM interactions
+    WHERE {where}
+    ORDER BY timestamp DESC, id DESC
+    LIMIT %s OFFSET %s
+    """
+    return sql, params + [limit, offset]
+
+
+def session_interactions_query(session_id: str, limit: int, offset: int, after: list = None):
+    """会话交互记录（按时间正序，走 (session_id, timestamp) 索引），返回 (sql, params)"""
+    params = [session_id]
+    where = "session_id = %s"
+    if after is not None:
+        condition, condition_params = keyset_condition(['timestamp', 'id'], after, False, nullable_first=True)
+        where += f" AND {condition}"
+        params += condition_params
+        offset = 0
+    sql = f"""
+    SELECT * FROM interactions
+    WHERE {where}
+    ORDER BY timestamp ASC, id ASC
+    LIMIT %s OFFSET %s
+    """
+    return sql, params + [limit, offset]
+
+
+def interaction_stats_queries(user_id: str = None, days: int = 30):
+    """交互统计（读每日汇总表，最近days个自然日含今天），返回 (按类型SQL, 总计SQL, params)"""
+    where = "WHERE stat_date > CURDATE() - INTERVAL %s DAY"
+    params = [days]
+    if user_id:
+        where = "WHERE user_id = %s AND stat_date > CURDATE() - INTERVAL %s DAY"
+        params = [user_id, days]
+    return (INTERACTION_STATS_BY_TYPE_SQL.format(where=where),
+            INTERACTION_STATS_TOTAL_SQL.format(where=where), params)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+过期数据清理模块 - 按主键顺序分批删除，替代一次性的大DELETE
+
+- 每批先按主键范围取出一批行，再按主键删除其中过期的行；连接为autocommit，每批一个小事务，
+  不会长时间持有大量行锁，也不会产生巨大的undo和复制延迟；批次之间sleep让路给业务写入
+- 时间与主键同序的表（interactions、system_logs）记录水位（retention_state表），
+  下次从水位继续，中断（超出低峰时段、服务关闭、出错）后不会从头扫描
+- 配置了archive_dir时，删除前把整行写入 .jsonl.gz 并fsync；归档后删除前中断的批次
+  下次会再归档一次（归档可能有重复行，不会丢行）
+- 后台线程只在低峰时段运行，用MySQL GET_LOCK保证多个进程/实例只有一个在清理
+"""
+import os
+import json
+import gzip
+import time
+import threading
+from datetime import datetime, timedelta
+from backend.config import RETENTION_CONFIG
+from backend.logger_config import logger
+
+# 每隔多少批输出一次进度日志
+PROGRESS_LOG_BATCHES = 50
+
+
+def _default_connect():
+    """独立连接（autocommit），不占用共享连接的锁"""
+    from database_manager import db_manager
+    return db_manager._get_fresh_connection()
+
+
+def _invalidate_caches(report: dict):
+    """删除了交互记录时清空对话列表缓存"""
+    if report.get('interactions', {}).get('deleted'):
+        from database_manager import db_manager
+        db_manager._invalidate_conversations()
+
+
+class ArchiveWriter:
+    """把删除前的行追加写入 <archive_dir>/<表名>/<表名>_<时间>.jsonl.gz，每批写完fsync"""
+
+    def __init__(self, archive_dir: str, table: str):
+        directory = os.path.join(archive_dir, table)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz")
+        self.file = None
+        self.gzip = None
+
+    def write(self, rows: list):
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+            self.gzip = gzip.GzipFile(fileobj=self.file, mode='ab')
+        for row in rows:
+            self.gzip.write((json.dumps(row, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+        # 归档落盘后才删除
+        self.gzip.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.gzip.close()
+            self.file.close()
+
+
+class RetentionEngine:
+    """分批、限速、可续跑的过期数据清理"""
+
+    def __init__(self, connect=None, config: dict = None, on_complete=None):
+        """connect返回DictCursor、autocommit的新连接；on_complete在每次清理后收到报告"""
+        self.connect = connect or _default_connect
+        self.config = config or RETENTION_CONFIG
+        self.on_complete = on_complete
+        self.last_report = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            'runs': 0,
+            'skipped': 0,
+            'batches': 0,
+            'rows_deleted': 0,
+            'rows_archived': 0,
+            'errors': 0,
+            'rows_per_sec': 0.0
+        }
+
+    def run(self, tables=None, days: int = None, deadline: float = None, stop_event: threading.Event = None,
+            dry_run: bool = False):
+        """
+        清理各表过期数据，返回 {表名: 报告}；其他进程正在清理时返回None
+        days覆盖配置中的保留天数，deadline（time.time()时间戳）之后暂停，dry_run只统计过期行数
+        """
+        policies = self.config['policies']
+        names = list(policies) if tables is None else list(tables)
+        for name in names:
+            if name not in policies:
+                raise ValueError(f"未配置清理策略的表: {name}")
+
+        connection = self.connect()
+        report = {}
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (self.config['lock_name'],))
+                if not cursor.fetchone()['locked']:
+                    self.stats['skipped'] += 1
+                    logger.info("⏭️ 其他进程正在清理过期数据，跳过本次")
+                    return None
+            try:
+                for name in names:
+                    policy = dict(policies[name])
+                    if days is not None:
+                        policy['days'] = days
+                    try:
+                        report[name] = self._run_table(connection, name, policy, deadline, stop_event, dry_run)
+                    except Exception as e:
+                        self.stats['errors'] += 1
+                        logger.error(f"❌ 清理 {name} 过期数据失败: {e}")
+                        report[name] = {'status': 'error', 'error': str(e)}
+                        break
+                    if report[name]['status'] == 'paused':
+                        break
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (self.config['lock_name'],))
+        finally:
+            connection.close()
+
+        if not dry_run:
+            self.stats['runs'] += 1
+            self.last_report = report
+            if self.on_complete:
+                try:
+                    self.on_complete(report)
+                except Exception as e:
+                    logger.error(f"❌ 清理完成回调失败: {e}")
+        return report
+
+    def _run_table(self, connection, table: str, policy: dict, deadline, stop_event, dry_run) -> dict:
+        time_column = policy['time_column']
+        monotonic = policy['monotonic']
+        batch_size = self.config['batch_size']
+        sleep_seconds = self.config['sleep_seconds']
+
+        with connection.cursor() as cursor:
+            # 截止时间取数据库时间，与时间列的时区一致
+            cursor.execute("SELECT NOW() - INTERVAL %s DAY AS cutoff", (policy['days'],))
+            cutoff = cursor.fetchone()['cutoff']
+            if dry_run:
+                cursor.execute(f"SELECT COUNT(*) AS count FROM {table} WHERE {time_column} < %s", (cutoff,))
+                return {'status': 'dry_run', 'cutoff': cutoff, 'expired': cursor.fetchone()['count']}
+
+            start = self._load_watermark(cursor, table) if monotonic else 0
+            upper = self._upper_bound(cursor, table, time_column, cutoff, monotonic)
+
+        archive = ArchiveWriter(self.config['archive_dir'], table) if self.config['archive_dir'] else None
+        columns = '*' if archive else f"id, {time_column}"
+        # 同序的表范围内几乎都是过期行，不加时间条件，才能看到被跳过的行、确定水位
+        time_filter = '' if monotonic else f" AND {time_column} < %s"
+
+        position = watermark = start
+        blocked = False
+        deleted = archived = batches = 0
+        status = 'done'
+        started = time.monotonic()
+        logger.info(f"🧹 开始清理 {table}: 截止 {cutoff}，主键范围 ({start}, {upper})")
+        try:
+            while True:
+                if (stop_event is not None and stop_event.is_set()) or (deadline is not None and time.time() >= deadline):
+                    status = 'paused'
+                    break
+                params = [position, upper] + ([] if monotonic else [cutoff]) + [batch_size]
+                with connection.cursor() as cursor:
+                    cursor.execute(f"""
+                    SELECT {columns} FROM {table}
+                    WHERE id > %s AND id < %s{time_filter}
+                    ORDER BY id
+                    LIMIT %s
+                    """, params)
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+
+                    expired = []
+                    for row in rows:
+                        value = row[time_column]
+                        if value is not None and value < cutoff:
+                            expired.append(row)
+                        elif value is not None and not blocked:
+                            # 以后会过期的行，水位停在它之前，下次从这里重新扫描
+                            blocked = True
+                            watermark = row['id'] - 1
+
+                    batch_deleted = batch_archived = 0
+                    if expired:
+                        if archive:
+                            archive.write(expired)
+                            batch_archived = len(expired)
+                            archived += batch_archived
+                        ids = [row['id'] for row in expired]
+                        cursor.execute(
+                            f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+                        )
+                        batch_deleted = cursor.rowcount
+                        deleted += batch_deleted
+
+                    position = rows[-1]['id']
+                    if not blocked:
+                        watermark = position
+                    self._save_state(cursor, table, watermark, batch_deleted, cutoff, 'running')
+
+                batches += 1
+                with self.lock:
+                    self.stats['batches'] += 1
+                    self.stats['rows_deleted'] += batch_deleted
+                    self.stats['rows_archived'] += batch_archived
+                if batches % PROGRESS_LOG_BATCHES == 0:
+                    elapsed = time.monotonic() - started
+                    logger.info(f"🧹 {table} 已删除 {deleted} 行（{deleted / elapsed:.0f} 行/秒）")
+                if len(rows) < batch_size:
+                    break
+                if sleep_seconds > 0:
+                    if stop_event is not None:
+                        stop_event.wait(sleep_seconds)
+                    else:
+                        time.sleep(sleep_seconds)
+        except Exception:
+            self._finish_state(connection, table, 'error')
+            raise
+        finally:
+            if archive:
+                archive.close()
+
+        self._finish_state(connection, table, status)
+        elapsed = time.monotonic() - started
+        rows_per_sec = deleted / elapsed if elapsed > 0 else 0.0
+        self.stats['rows_per_sec'] = rows_per_sec
+        report = {
+            'status': status,
+            'cutoff': cutoff,
+            'deleted': deleted,
+            'archived': archived,
+            'batches': batches,
+            'seconds': round(elapsed, 2),
+            'rows_per_sec': round(rows_per_sec, 1),
+            'watermark': watermark
+        }
+        if archive and archived:
+            report['archive_file'] = archive.path
+        icon = '✅' if status == 'done' else '⏸️'
+        logger.info(f"{icon} {table} 清理{'完成' if status == 'done' else '暂停（下次从水位继续）'}: "
+                    f"删除 {deleted} 行，{batches} 批，{elapsed:.1f}s，{rows_per_sec:.0f} 行/秒")
+        return report
+
+    @staticmethod
+    def _load_watermark(cursor, table: str) -> int:
+        cursor.execute("SELECT watermark FROM retention_state WHERE table_name = %s", (table,))
+        row = cursor.fetchone()
+        return row['watermark'] if row else 0
+
+    @staticmethod
+    def _upper_bound(cursor, table: str, time_column: str, cutoff, monotonic: bool) -> int:
+        """扫描的主键上界（不含）：同序的表为第一条未过期行的主键（走时间列索引），否则为当前最大主键+1"""
+        if monotonic:
+            cursor.execute(f"""
+            SELECT id FROM {table}
+            WHERE {time_column} >= %s
+            ORDER BY {time_column}
+            LIMIT 1
+            """, (cutoff,))
+            row = cursor.fetchone()
+            if row:
+                return row['id']
+        cursor.execute(f"SELECT MAX(id) AS max_id FROM {table}")
+        return (cursor.fetchone()['max_id'] or 0) + 1
+
+    @staticmethod
+    def _save_state(cursor, table: str, watermark: int, deleted: int, cutoff, status: str):
+        cursor.execute("""
+        INSERT INTO retention_state (table_name, watermark, rows_deleted, last_cutoff, last_status, last_run_at)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            watermark = VALUES(watermark),
+            rows_deleted = rows_deleted + VALUES(rows_deleted),
+            last_cutoff = VALUES(last_cutoff),
+            last_status = VALUES(last_status),
+            last_run_at = VALUES(last_run_at)
+        """, (table, watermark, deleted, cutoff, status))
+
+    @staticmethod
+    def _finish_state(connection, table: str, status: str):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE retention_state SET last_status = %s WHERE table_name = %s", (status, table))
+        except Exception as e:
+            logger.error(f"❌ 更新 {table} 清理状态失败: {e}")
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+
+class RetentionScheduler:
+    """每天低峰时段在后台线程中清理一次，超出时段暂停，下个时段从水位继续"""
+
+    def __init__(self, engine: RetentionEngine, config: dict = None):
+        self.engine = engine
+        self.config = config or RETENTION_CONFIG
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def window(self, now: datetime):
+        """返回当前所在或下一个低峰时段的 (开始, 结束)"""
+        hour, minute = (int(part) for part in self.config['window_start'].split(':'))
+        length = timedelta(hours=self.config['window_hours'])
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # 时段可能跨零点，先看前一天开始的时段
+        for candidate in (start - timedelta(days=1), start):
+            if candidate <= now < candidate + length:
+                return candidate, candidate + length
+        if start <= now:
+            start += timedelta(days=1)
+        return start, start + length
+
+    def start(self):
+        if self.running or not self.config['enabled']:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='data-retention', daemon=True)
+        self._thread.start()
+        start, _ = self.window(datetime.now())
+        logger.info(f"🧹 过期数据清理已启用，下次清理时间: {start.strftime('%Y-%m-%d %H:%M')}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            start, end = self.window(datetime.now())
+            wait = (start - datetime.now()).total_seconds()
+            if wait > 0 and self._stop_event.wait(wait):
+                break
+            try:
+                self.engine.run(deadline=end.timestamp(), stop_event=self._stop_event)
+            except Exception as e:
+                logger.error(f"❌ 过期数据清理失败: {e}")
+            # 本时段已经执行过，等时段结束后再安排下一次
+            remaining = (end - datetime.now()).total_seconds()
+            if remaining > 0 and self._stop_event.wait(remaining):
+                break
+
+    def stop(self):
+        """停止后台线程（关闭钩子），进行中的批次完成后退出"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+
+# 全局实例
+retention_engine = RetentionEngine(on_complete=_invalidate_caches)
+retention_scheduler = RetentionScheduler(retention_engine)
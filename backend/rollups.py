@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+每日汇总表模块 - 管理后台的统计读汇总表，不再对 interactions/reading_progress 原始行做GROUP BY
+
+- interaction_daily_rollup：每个用户每天每种交互的次数、成功/失败数、时长合计
+- reading_daily_rollup：每个用户每天每个故事的进度写入次数、完成次数
+- 写入交互/阅读进度时在同一事务中累加当天的汇总行（ON DUPLICATE KEY UPDATE）
+- 上线前的历史数据用 backfill_rollups.py 按天回填；回填取原始数据与已有汇总的较大值，
+  可以重复执行，也不会覆盖回填期间新累加的计数
+"""
+import time
+from datetime import date, timedelta
+from backend.logger_config import logger
+
+# 记录一次交互：参数 (user_id, interaction_type, 成功数, 失败数, 时长, 时长样本数)
+INTERACTION_ROLLUP_SQL = """
+INSERT INTO interaction_daily_rollup
+    (user_id, stat_date, interaction_type, interaction_count, success_count, failure_count,
+     duration_total, duration_count)
+VALUES (%s, CURDATE(), %s, 1, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    interaction_count = interaction_count + 1,
+    success_count = success_count + VALUES(success_count),
+    failure_count = failure_count + VALUES(failure_count),
+    duration_total = duration_total + VALUES(duration_total),
+    duration_count = duration_count + VALUES(duration_count)
+"""
+
+# 记录阅读进度写入/完成：参数 (user_id, stat_date, story_id, 进度写入次数, 完成次数)
+READING_ROLLUP_SQL = """
+INSERT INTO reading_daily_rollup (user_id, stat_date, story_id, progress_updates, completions)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    progress_updates = progress_updates + VALUES(progress_updates),
+    completions = completions + VALUES(completions)
+"""
+
+
+def interaction_rollup_params(user_id: str, interaction_type: str, success: bool, duration_seconds) -> tuple:
+    return (
+        user_id, interaction_type, 1 if success else 0, 0 if success else 1,
+        duration_seconds or 0, 0 if duration_seconds is None else 1
+    )
+
+
+def backfill_interactions(connection, day: date) -> int:
+    """从interactions回填某一天的交互汇总，返回写入的汇总行数"""
+    start = day
+    end = day + timedelta(days=1)
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        INSERT INTO interaction_daily_rollup
+            (user_id, stat_date, interaction_type, interaction_count, success_count, failure_count,
+             duration_total, duration_count)
+        SELECT user_id, %s, interaction_type, COUNT(*),
+               SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END),
+               COALESCE(SUM(duration_seconds), 0), COUNT(duration_seconds)
+        FROM interactions
+        WHERE timestamp >= %s AND timestamp < %s
+        GROUP BY user_id, interaction_type
+        ON DUPLICATE KEY UPDATE
+            interaction_count = GREATEST(interaction_count, VALUES(interaction_count)),
+            success_count = GREATEST(success_count, VALUES(success_count)),
+            failure_count = GREATEST(failure_count, VALUES(failure_count)),
+            duration_total = GREATEST(duration_total, VALUES(duration_total)),
+            duration_count = GREATEST(duration_count, VALUES(duration_count))
+        """, (start, start, end))
+        return cursor.rowcount
+
+
+def backfill_reading(connection) -> int:
+    """
+    从reading_progress回填阅读汇总，返回影响的行数
+    reading_progress每个故事只保留最新状态，只能按最后阅读日计一次进度写入、按完成日计一次完成
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        INSERT INTO reading_daily_rollup (user_id, stat_date, story_id, progress_updates, completions)
+        SELECT user_id, DATE(last_read_time), story_id, 1, 0
+        FROM reading_progress
+        WHERE last_read_time IS NOT NULL
+        ON DUPLICATE KEY UPDATE progress_updates = GREATEST(progress_updates, 1)
+        """)
+        affected = cursor.rowcount
+        cursor.execute("""
+        INSERT INTO reading_daily_rollup (user_id, stat_date, story_id, progress_updates, completions)
+        SELECT user_id, DATE(completion_time), story_id, 0, 1
+        FROM reading_progress
+        WHERE is_completed = TRUE AND completion_time IS NOT NULL
+        ON DUPLICATE KEY UPDATE completions = GREATEST(completions, 1)
+        """)
+        return affected + cursor.rowcount
+
+
+def interaction_date_range(connection):
+    """interactions中最早和最晚的日期，表为空时返回 (None, None)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT DATE(MIN(timestamp)) AS first_day, DATE(MAX(timestamp)) AS last_day FROM interactions")
+        row = cursor.fetchone()
+    return row['first_day'], row['last_day']
+
+
+def backfill(connection, since: date = None, until: date = None, sleep_seconds: float = 0.0,
+             progress=None) -> dict:
+    """
+    按天回填交互汇总（每天一条语句、一个小事务），再回填阅读汇总
+    since/until默认为interactions中最早/最晚的日期；progress(day, rows)在每天完成后调用
+    """
+    first_day, last_day = interaction_date_range(connection)
+    since = since or first_day
+    until = until or last_day
+    result = {'days': 0, 'interaction_rows': 0, 'reading_rows': 0}
+    start_time = time.time()
+    if since and until:
+        day = since
+        while day <= until:
+            rows = backfill_interactions(connection, day)
+            result['days'] += 1
+            result['interaction_rows'] += rows
+            if progress:
+                progress(day, rows)
+            if sleep_seconds > 0:
+                time.sleep(sleep_seconds)
+            day += timedelta(days=1)
+    result['reading_rows'] = backfill_reading(connection)
+    result['seconds'] = round(time.time() - start_time, 1)
+    logger.info(f"✅ 汇总表回填完成: {result['days']} 天，交互汇总 {result['interaction_rows']} 行，"
+                f"阅读汇总 {result['reading_rows']} 行，耗时 {result['seconds']}s")
+    return result
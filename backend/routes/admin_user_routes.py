@@ -3,22 +3,63 @@
 管理员用户路由模块
 """
 from flask import request, jsonify
-import time
-import pymysql
 from backend.logger_config import logger
+from backend.pagination import page_args, InvalidCursor
+from backend.admin_dashboard import admin_dashboard
+from backend.config import ADMIN_BULK_CONFIG
 from database_manager import db_manager
 
 
 def register_admin_user_routes(app):
     """注册管理员用户相关路由"""
 
+    @app.route('/api/admin/dashboard', methods=['GET'])
+    def admin_get_dashboard():
+        """管理后台聚合数据（概览、用户、阅读进度、AI使用进度、统计），短时间缓存"""
+        try:
+            admin_user_id = request.args.get('admin_user_id')
+            try:
+                users_limit = int(request.args.get('users_limit', 1000))
+                progress_limit = int(request.args.get('progress_limit', 20))
+                progress_offset = int(request.args.get('progress_offset', 0))
+                days = int(request.args.get('days', 0)) or None
+                hours = int(request.args.get('hours', 0)) or None
+            except ValueError:
+                return jsonify({'error': '参数必须为整数'}), 400
+            if users_limit < 1 or progress_limit < 1 or progress_offset < 0:
+                return jsonify({'error': 'limit必须大于0，offset不能为负数'}), 400
+            
+            if not admin_user_id:
+                return jsonify({'error': '缺少管理员用户ID'}), 400
+            
+            # 验证管理员身份
+            if not db_manager.user_exists(admin_user_id):
+                return jsonify({'error': '管理员身份验证失败'}), 401
+            
+            result, age, stale = admin_dashboard.get(users_limit, progress_limit, progress_offset, days, hours)
+            if result is None:
+                return jsonify({'error': '获取管理后台数据失败'}), 500
+            
+            return jsonify({
+                'success': True,
+                **result,
+                'cache_age_seconds': round(age, 1),
+                'stale': stale
+            })
+            
+        except Exception as e:
+            logger.error(f"❌ 管理员获取后台数据失败: {e}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/admin/users/reading-progress', methods=['GET'])
     def admin_get_all_reading_progress():
         """管理员获取所有用户阅读进度"""
         try:
             admin_user_id = request.args.get('admin_user_id')
-            limit = int(request.args.get('limit', 100))
-            offset = int(request.args.get('offset', 0))
+            try:
+                limit, offset, cursor, total = page_args(request.args, 100)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
             if not admin_user_id:
                 return jsonify({'error': '缺少管理员用户ID'}), 400
@@ -27,8 +68,11 @@ def register_admin_user_routes(app):
             if not db_manager.user_exists(admin_user_id):
                 return jsonify({'error': '管理员身份验证失败'}), 401
             
-            # 获取所有用户阅读进度
-            result = db_manager.get_all_users_reading_progress(limit, offset)
+            # 获取所有用户阅读进度（传cursor时按游标分页）
+            try:
+                result = db_manager.get_all_users_reading_progress(limit, offset, cursor=cursor, total=total)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
             
             if result is None:
                 return jsonify({'error': '获取阅读进度失败'}), 500
@@ -47,8 +91,10 @@ def register_admin_user_routes(app):
         """管理员获取所有用户AI使用进度"""
         try:
             admin_user_id = request.args.get('admin_user_id')
-            limit = int(request.args.get('limit', 100))
-            offset = int(request.args.get('offset', 0))
+            try:
+                limit, offset, cursor, total = page_args(request.args, 100)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
             if not admin_user_id:
                 return jsonify({'error': '缺少管理员用户ID'}), 400
@@ -57,8 +103,11 @@ def register_admin_user_routes(app):
             if not db_manager.user_exists(admin_user_id):
                 return jsonify({'error': '管理员身份验证失败'}), 401
             
-            # 获取所有用户AI使用进度
-            result = db_manager.get_all_users_interaction_progress(limit, offset)
+            # 获取所有用户AI使用进度（传cursor时按游标分页）
+            try:
+                result = db_manager.get_all_users_interaction_progress(limit, offset, cursor=cursor, total=total)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
             
             if result is None:
                 return jsonify({'error': '获取AI使用进度失败'}), 500
@@ -165,6 +214,7 @@ def register_admin_user_routes(app):
             
             if not success:
                 return jsonify({'error': message}), 400
+            admin_dashboard.invalidate()
             
             return jsonify({
                 'success': True,
@@ -213,6 +263,7 @@ def register_admin_user_routes(app):
             )
             
             if success:
+                admin_dashboard.invalidate()
                 # 记录管理员操作
                 db_manager.log_admin_operation(
                     admin_user_id, user_id, story_id, 'update_progress'
@@ -244,74 +295,19 @@ def register_admin_user_routes(app):
             if not db_manager.user_exists(admin_user_id):
                 return jsonify({'error': '管理员身份验证失败'}), 401
             
-            results = []
-            success_count = 0
+            if not isinstance(operations, list):
+                return jsonify({'error': 'operations必须为列表'}), 400
+            if len(operations) > ADMIN_BULK_CONFIG['max_items']:
+                return jsonify({'error': f"单次最多 {ADMIN_BULK_CONFIG['max_items']} 项操作"}), 400
             
-            for operation in operations:
-                op_type = operation.get('type')
-                user_id = operation.get('user_id')
-                story_id = operation.get('story_id')
-                
-                try:
-                    if op_type == 'mark_completed':
-                        success, message = (
-                            db_manager.admin_update_reading_completion(
-                                user_id, story_id, True, admin_user_id
-                            )
-                        )
-                    elif op_type == 'mark_incomplete':
-                        success, message = (
-                            db_manager.admin_update_reading_completion(
-                                user_id, story_id, False, admin_user_id
-                            )
-                        )
-                    elif op_type == 'update_progress':
-                        progress = operation.get('progress', 0)
-                        current_position = operation.get('current_position', 0)
-                        total_length = operation.get('total_length', 100)
-                        
-                        # 获取用户名
-                        user_info = db_manager.get_user_by_id(user_id)
-                        username = (
-                            user_info.get('username', '')
-                            if user_info else ''
-                        )
-                        
-                        success = db_manager.update_reading_progress(
-                            user_id=user_id,
-                            story_id=story_id,
-                            story_title="管理员批量操作",
-                            current_position=current_position,
-                            total_length=total_length,
-                            device_info="admin_bulk_operation",
-                            username=username
-                        )
-                        message = (
-                            f'更新进度为 {progress}%' if success else '更新失败'
-                        )
-                    else:
-                        success = False
-                        message = '未知操作类型'
-                    
-                    if success:
-                        success_count += 1
-                    
-                    results.append({
-                        'user_id': user_id,
-                        'story_id': story_id,
-                        'type': op_type,
-                        'success': success,
-                        'message': message
-                    })
-                    
-                except Exception as e:
-                    results.append({
-                        'user_id': user_id,
-                        'story_id': story_id,
-                        'type': op_type,
-                        'success': False,
-                        'error': str(e)
-                    })
+            # 同一连接按块执行多行语句，每块一个事务
+            results = db_manager.bulk_admin_reading_operations(operations)
+            success_count = sum(1 for result in results if result['success'])
+            logger.info(f"📋 管理员批量操作阅读进度: admin={admin_user_id}, "
+                        f"成功 {success_count}/{len(operations)} 项")
+            
+            if success_count:
+                admin_dashboard.invalidate()
             
             return jsonify({
                 'success': True,
@@ -344,6 +340,7 @@ def register_admin_user_routes(app):
             success = db_manager.delete_reading_record(record_id)
             
             if success:
+                admin_dashboard.invalidate()
                 # 记录管理员操作
                 db_manager.log_admin_operation(
                     admin_user_id, None, None, 'delete_reading_record'
@@ -375,20 +372,20 @@ def register_admin_user_routes(app):
             if not db_manager.user_exists(admin_user_id):
                 return jsonify({'error': '管理员身份验证失败'}), 401
             
-            # 批量删除阅读记录
-            success_count = 0
-            failed_count = 0
+            if not isinstance(record_ids, list):
+                return jsonify({'error': 'record_ids必须为列表'}), 400
+            if len(record_ids) > ADMIN_BULK_CONFIG['max_items']:
+                return jsonify({'error': f"单次最多删除 {ADMIN_BULK_CONFIG['max_items']} 条记录"}), 400
             
-            for record_id in record_ids:
-                if db_manager.delete_reading_record(record_id):
-                    success_count += 1
-                else:
-                    failed_count += 1
+            # 批量删除阅读记录（每块一条 DELETE ... WHERE id IN (...)）
+            results = db_manager.bulk_delete_reading_records(record_ids)
+            success_count = sum(1 for result in results if result['success'])
+            failed_count = len(results) - success_count
             
-            # 记录管理员操作
-            db_manager.log_admin_operation(
-                admin_user_id, None, None, 'bulk_delete_reading_records'
-            )
+            if success_count:
+                admin_dashboard.invalidate()
+            logger.info(f"📋 管理员批量删除阅读记录: admin={admin_user_id}, "
+                        f"成功 {success_count} 条，失败 {failed_count} 条")
             
             return jsonify({
                 'success': True,
@@ -397,7 +394,8 @@ def register_admin_user_routes(app):
                     f'失败 {failed_count} 条'
                 ),
                 'success_count': success_count,
-                'failed_count': failed_count
+                'failed_count': failed_count,
+                'results': results
             })
             
         except Exception as e:
@@ -409,8 +407,10 @@ def register_admin_user_routes(app):
         """管理员获取所有用户列表"""
         try:
             admin_user_id = request.args.get('admin_user_id')
-            limit = int(request.args.get('limit', 50))
-            offset = int(request.args.get('offset', 0))
+            try:
+                limit, offset, cursor, total = page_args(request.args, 50)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
             if not admin_user_id:
                 return jsonify({'error': '缺少管理员用户ID'}), 400
@@ -419,52 +419,16 @@ def register_admin_user_routes(app):
             if not db_manager.user_exists(admin_user_id):
                 return jsonify({'error': '管理员身份验证失败'}), 401
             
-            # 获取所有用户
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    if (not db_manager.connection or
-                            not db_manager.connection.open):
-                        db_manager.reconnect()
-                    
-                    with db_manager.connection.cursor(
-                            pymysql.cursors.DictCursor) as cursor:
-                        # 获取用户列表
-                        sql = """
-                        SELECT u.user_id, u.username, u.created_at,
-                               u.last_login_at, u.is_active,
-                               COUNT(rp.id) as total_stories,
-                               SUM(CASE WHEN rp.is_completed = 1
-                                   THEN 1 ELSE 0 END) as completed_stories
-                        FROM users u
-                        LEFT JOIN reading_progress rp ON u.user_id = rp.user_id
-                        GROUP BY u.user_id, u.username, u.created_at,
-                                 u.last_login_at, u.is_active
-                        ORDER BY u.created_at DESC
-                        LIMIT %s OFFSET %s
-                        """
-                        cursor.execute(sql, (limit, offset))
-                        users = cursor.fetchall()
-                        
-                        # 获取总数
-                        count_sql = "SELECT COUNT(*) as count FROM users"
-                        cursor.execute(count_sql)
-                        total_count = cursor.fetchone()['count']
-                        
-                        return jsonify({
-                            'success': True,
-                            'users': users,
-                            'total_count': total_count,
-                            'limit': limit,
-                            'offset': offset
-                        })
-                        
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        db_manager.reconnect()
-                        time.sleep(1)
-                    else:
-                        raise e
+            # 获取所有用户（传cursor时按游标分页）
+            try:
+                result = db_manager.get_users_with_reading_counts(limit, offset, cursor=cursor, total=total)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            
+            if result is None:
+                return jsonify({'error': '获取用户列表失败'}), 500
+            
+            return jsonify({'success': True, **result})
             
         except Exception as e:
             logger.error(f"❌ 管理员获取用户列表失败: {e}")
@@ -505,6 +469,34 @@ def register_admin_user_routes(app):
             logger.error(f"❌ 管理员重置用户密码失败: {e}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/admin/users/<user_id>/status', methods=['POST'])
+    def admin_set_user_status(user_id):
+        """管理员启用/禁用用户"""
+        try:
+            data = request.get_json() or {}
+            admin_user_id = data.get('admin_user_id')
+            is_active = data.get('is_active')
+
+            if not admin_user_id or not user_id or is_active is None:
+                return jsonify({'error': '缺少必要参数'}), 400
+
+            # 验证管理员身份
+            if not db_manager.user_exists(admin_user_id):
+                return jsonify({'error': '管理员身份验证失败'}), 401
+
+            if not db_manager.set_user_active(user_id, bool(is_active)):
+                return jsonify({'error': '用户不存在或更新失败'}), 404
+            admin_dashboard.invalidate()
+
+            return jsonify({
+                'success': True,
+                'message': '用户已启用' if is_active else '用户已禁用'
+            })
+
+        except Exception as e:
+            logger.error(f"❌ 管理员更新用户状态失败: {e}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/admin/users/<user_id>/password', methods=['GET'])
     def admin_get_user_password_info(user_id):
         """管理员获取用户密码信息"""
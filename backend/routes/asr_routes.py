@@ -6,13 +6,26 @@ import os
 import time
 import uuid
 import tempfile
-from flask import request, jsonify
+from flask import request, jsonify, stream_with_context
 from backend.logger_config import logger
 from backend.asr_service import (
     transcribe_with_dolphin,
     asr_processing_status,
-    initialize_dolphin_model
+    dolphin_optimization_status,
+    get_model_params,
+    wait_for_asr_ready,
+    get_asr_readiness
 )
+from backend.asr_cache import asr_result_cache
+from backend.json_provider import encode_sse
+from backend.prometheus_metrics import ASR_INFLIGHT_REQUESTS, ASR_REJECTED_REQUESTS
+from backend.asr_stream_service import (
+    create_stream,
+    get_stream,
+    close_stream,
+    asr_stream_sessions
+)
+from backend.config import ASR_STREAM_CONFIG, ASR_WARMUP_CONFIG
 from backend.service_monitor import ServiceMonitor
 from datetime import datetime
 
@@ -20,6 +33,22 @@ from datetime import datetime
 def register_asr_routes(app, monitor: ServiceMonitor):
     """注册ASR相关路由"""
 
+    def asr_not_ready_response():
+        """模型加载中时在配置的时间内排队等待，仍未就绪返回503，就绪返回None"""
+        if wait_for_asr_ready(ASR_WARMUP_CONFIG['ready_wait_seconds']):
+            return None
+        readiness = get_asr_readiness()
+        logger.info(f"⏳ ASR模型尚未就绪（{readiness['state']}），拒绝请求")
+        ASR_REJECTED_REQUESTS.labels('model_not_ready').inc()
+        response = jsonify({
+            'success': False,
+            'error': '语音识别模型正在加载，请稍后重试',
+            'readiness': readiness
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(ASR_WARMUP_CONFIG['retry_after'])
+        return response
+
     @app.route('/transcribe', methods=['POST'])
     def transcribe_legacy():
         """兼容性端点 - 重定向到API版本"""
@@ -28,11 +57,16 @@ def register_asr_routes(app, monitor: ServiceMonitor):
     @app.route('/api/transcribe', methods=['POST'])
     def transcribe_audio():
         """语音识别API - 带监控和状态反馈"""
+        not_ready = asr_not_ready_response()
+        if not_ready is not None:
+            return not_ready
+
         start_time = time.time()
         success = False
         error_type = None
         request_id = str(uuid.uuid4())
 
+        ASR_INFLIGHT_REQUESTS.inc()
         try:
             logger.info(f"🎤 收到语音识别请求 [ID: {request_id}]")
 
@@ -62,9 +96,27 @@ def register_asr_routes(app, monitor: ServiceMonitor):
             logger.info(f"🎤 收到音频文件: {audio_file.filename}")
             asr_processing_status['progress'] = 30
 
+            # 完全相同的上传内容直接命中缓存，跳过解码和识别
+            audio_bytes = audio_file.read()
+            raw_key = asr_result_cache.make_raw_key(audio_bytes, get_model_params())
+            cached_text = asr_result_cache.get_raw(raw_key)
+            if cached_text is not None:
+                transcription = cached_text if cached_text else "识别结果为空"
+                logger.info(f"🎯 ASR缓存命中 [ID: {request_id}]: {transcription}")
+                success = True
+                return jsonify({
+                    'success': True,
+                    'text': transcription,
+                    'transcription': transcription,
+                    'processing_time': time.time() - start_time,
+                    'duration': time.time() - start_time,
+                    'request_id': request_id,
+                    'cached': True
+                })
+
             # 保存临时文件
             with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-                audio_file.save(temp_file.name)
+                temp_file.write(audio_bytes)
                 temp_path = temp_file.name
                 logger.info(f"🎤 音频文件保存到: {temp_path}")
 
@@ -74,7 +126,7 @@ def register_asr_routes(app, monitor: ServiceMonitor):
                 # 使用Dolphin进行真正的语音识别
                 logger.info("🎤 开始语音识别处理...")
                 asr_processing_status['progress'] = 70
-                transcription = transcribe_with_dolphin(temp_path)
+                transcription = transcribe_with_dolphin(temp_path, raw_key=raw_key)
                 asr_processing_status['progress'] = 90
 
                 logger.info(f"🎤 语音识别完成: {transcription}")
@@ -101,6 +153,7 @@ def register_asr_routes(app, monitor: ServiceMonitor):
             return jsonify({'error': str(e)}), 500
 
         finally:
+            ASR_INFLIGHT_REQUESTS.dec()
             # 重置处理状态
             asr_processing_status['is_processing'] = False
             asr_processing_status['current_request_id'] = None
@@ -147,9 +200,181 @@ def register_asr_routes(app, monitor: ServiceMonitor):
                     'processing_time': processing_time,
                     'start_time': asr_processing_status['start_time']
                 },
+                'readiness': get_asr_readiness(),
+                'optimization': dolphin_optimization_status,
+                'cache': asr_result_cache.get_stats(),
                 'last_update': datetime.now().isoformat()
             })
         except Exception as e:
             logger.error(f"❌ ASR状态查询失败: {e}")
             return jsonify({'error': str(e)}), 500
 
+
+    @app.route('/api/asr/stream/start', methods=['POST'])
+    def asr_stream_start():
+        """创建流式识别会话"""
+        not_ready = asr_not_ready_response()
+        if not_ready is not None:
+            return not_ready
+
+        try:
+            recognizer = create_stream()
+            if recognizer is None:
+                ASR_REJECTED_REQUESTS.labels('stream_limit').inc()
+                return jsonify({
+                    'success': False,
+                    'error': '流式识别会话已达上限，请稍后重试'
+                }), 503
+
+            logger.info(f"🎤 创建流式识别会话 [ID: {recognizer.stream_id}]")
+            return jsonify({
+                'success': True,
+                'stream_id': recognizer.stream_id,
+                'sample_rate': ASR_STREAM_CONFIG['sample_rate'],
+                'format': 'pcm_s16le',
+                'channels': 1
+            })
+        except Exception as e:
+            logger.error(f"❌ 创建流式识别会话失败: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/asr/stream/<stream_id>/chunk', methods=['POST'])
+    def asr_stream_chunk(stream_id):
+        """上传一段PCM音频，达到识别步长时返回部分结果"""
+        try:
+            recognizer = get_stream(stream_id)
+            if recognizer is None:
+                return jsonify({'success': False, 'error': '流式识别会话不存在或已过期'}), 404
+
+            if 'audio' in request.files:
+                pcm_bytes = request.files['audio'].read()
+            else:
+                pcm_bytes = request.get_data()
+
+            partial = recognizer.feed(pcm_bytes)
+            return jsonify({
+                'success': True,
+                'stream_id': stream_id,
+                'partial': partial
+            })
+        except Exception as e:
+            logger.error(f"❌ 流式识别分片处理失败 [ID: {stream_id}]: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/asr/stream/<stream_id>/end', methods=['POST'])
+    def asr_stream_end(stream_id):
+        """结束流式识别会话并返回最终结果"""
+        start_time = time.time()
+        success = False
+        error_type = None
+        try:
+            recognizer = close_stream(stream_id)
+            if recognizer is None:
+                error_type = "stream_not_found"
+                return jsonify({'success': False, 'error': '流式识别会话不存在或已过期'}), 404
+
+            # 允许在结束请求中携带最后一段音频
+            pcm_bytes = request.get_data()
+            if pcm_bytes:
+                recognizer.feed(pcm_bytes)
+
+            final = recognizer.finish()
+            success = True
+            logger.info(f"🎤 流式识别完成 [ID: {stream_id}]: {final['text']}")
+            return jsonify({
+                'success': True,
+                'text': final['text'],
+                'transcription': final['text'],
+                'final': final,
+                'request_id': stream_id
+            })
+        except Exception as e:
+            logger.error(f"❌ 结束流式识别失败 [ID: {stream_id}]: {e}")
+            error_type = "exception"
+            return jsonify({'error': str(e)}), 500
+        finally:
+            monitor.update_service_stats(
+                'asr', success=success, response_time=time.time() - start_time,
+                error_type=error_type
+            )
+
+    @app.route('/api/asr/stream', methods=['POST'])
+    def asr_stream_chunked():
+        """分块传输上传PCM音频，边接收边以SSE返回部分结果，上传结束后返回最终结果"""
+        not_ready = asr_not_ready_response()
+        if not_ready is not None:
+            return not_ready
+
+        recognizer = create_stream()
+        if recognizer is None:
+            ASR_REJECTED_REQUESTS.labels('stream_limit').inc()
+            return jsonify({
+                'success': False,
+                'error': '流式识别会话已达上限，请稍后重试'
+            }), 503
+
+        stream_id = recognizer.stream_id
+        read_size = ASR_STREAM_CONFIG['read_chunk_bytes']
+        logger.info(f"🎤 收到分块流式识别请求 [ID: {stream_id}]")
+
+        def generate_stream_events():
+            start_time = time.time()
+            success = False
+            try:
+                while True:
+                    chunk = request.stream.read(read_size)
+                    if not chunk:
+                        break
+                    partial = recognizer.feed(chunk)
+                    if partial:
+                        yield encode_sse(partial)
+
+                final = recognizer.finish()
+                success = True
+                yield encode_sse(final)
+            except Exception as e:
+                logger.error(f"❌ 分块流式识别失败 [ID: {stream_id}]: {e}")
+                error_chunk = {'type': 'error', 'message': '流式识别失败，请稍后重试'}
+                yield encode_sse(error_chunk)
+            finally:
+                close_stream(stream_id)
+                monitor.update_service_stats(
+                    'asr', success=success, response_time=time.time() - start_time,
+                    error_type=None if success else "exception"
+                )
+
+        return app.response_class(
+            stream_with_context(generate_stream_events()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    @app.route('/api/asr/cache/clear', methods=['POST'])
+    def clear_asr_cache():
+        """清理ASR结果缓存"""
+        try:
+            count = asr_result_cache.clear()
+            return jsonify({
+                'success': True,
+                'message': f'已清理 {count} 项ASR缓存',
+                'cache': asr_result_cache.get_stats()
+            })
+        except Exception as e:
+            logger.error(f"❌ 清理ASR缓存失败: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/asr/stream/status', methods=['GET'])
+    def asr_stream_status():
+        """流式识别会话状态"""
+        try:
+            return jsonify({
+                'active_streams': len(asr_stream_sessions),
+                'max_streams': ASR_STREAM_CONFIG['max_sessions'],
+                'config': ASR_STREAM_CONFIG
+            })
+        except Exception as e:
+            logger.error(f"❌ 流式识别状态查询失败: {e}")
+            return jsonify({'error': str(e)}), 500
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+异步路由模块（ASGI/Starlette） - 流式聊天、TTS和故事接口
+
+与Flask路由共用 ai_service / tts_service / story_service 中的业务逻辑：
+- DeepSeek流式请求使用aiohttp，每个流只占用一个协程，不占用线程
+- TTS直接await edge-tts协程，不再为每个请求创建线程和事件循环
+- 同步数据库调用放入独立的有界线程池执行，只在查询期间占用线程
+"""
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from starlette.requests import Request
+from starlette.responses import JSONResponse as StarletteJSONResponse, Response, StreamingResponse
+from starlette.routing import Route, request_response
+
+from backend.logger_config import logger
+from backend.config import ASGI_CONFIG
+from backend import lifecycle, story_service
+from backend.ai_service import (
+    build_stream_request,
+    deepseek_headers,
+    log_stream_request_error,
+    resolve_chat_session,
+    record_chat_interaction,
+    sse_event,
+    error_event,
+    ChatStreamParser,
+    CHAT_COMPLETIONS_URL
+)
+from backend.tts_service import synthesize_async, tts_empty_audio_response, tts_exception_response
+from backend.prometheus_metrics import UPSTREAM_REQUEST_DURATION
+from backend.json_provider import dumps_bytes, loads as json_loads
+from backend.compression import CompressionMiddleware, route_class
+
+# 同步数据库调用使用的线程池
+db_executor = ThreadPoolExecutor(max_workers=ASGI_CONFIG['db_threads'], thread_name_prefix='asgi-db')
+
+# DeepSeek连接池，在应用启动时创建
+_http_session = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """在数据库线程池中执行同步函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+async def startup():
+    global _http_session
+    _http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=ASGI_CONFIG['upstream_connections']),
+        timeout=aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=ASGI_CONFIG['upstream_connect_timeout'],
+            sock_read=ASGI_CONFIG['upstream_read_timeout']
+        )
+    )
+
+
+async def shutdown():
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+    db_executor.shutdown(wait=False)
+
+
+class JSONResponse(StarletteJSONResponse):
+    """使用与Flask相同的JSON序列化实现"""
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+
+async def _read_json(request: Request):
+    try:
+        return json_loads(await request.body())
+    except ValueError:
+        return None
+
+
+class _InstrumentedEndpoint:
+    """ASGI包装：统计接口耗时（到响应头返回）、进行中请求数，排空期间返回503"""
+
+    def __init__(self, rule: str, handler, monitor):
+        self.rule = rule
+        self.app = request_response(handler)
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if lifecycle.is_draining():
+            response = JSONResponse(
+                {'error': '服务正在关闭，请稍后重试', 'error_code': 'SERVER_DRAINING'},
+                status_code=503, headers={'Retry-After': '5'}
+            )
+            await response(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope['method']
+
+        async def instrumented_send(message):
+            if message['type'] == 'http.response.start':
+                self.monitor.record_endpoint(
+                    method, self.rule, time.perf_counter() - start_time, message['status']
+                )
+            await send(message)
+
+        lifecycle.request_started()
+        try:
+            await self.app(scope, receive, instrumented_send)
+        finally:
+            # 流式响应在最后一块发送完毕后才返回
+            lifecycle.request_finished()
+
+
+async def chat_streaming(request: Request):
+    """AI聊天流式API"""
+    data = await _read_json(request)
+    if not data or 'message' not in data:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+    message = data['message']
+    user_id = data.get('user_id', 'anonymous')
+    conversation_history = data.get('conversation_history', [])
+    is_refresh = data.get('is_refresh', False)
+    if conversation_history and not isinstance(conversation_history, list):
+        logger.error(f"❌ 对话历史格式错误: {type(conversation_history)}")
+        conversation_history = []
+
+    logger.info(f"🤖 收到流式聊天请求(async): {message}")
+    try:
+        session_id, error = await run_blocking(resolve_chat_session, user_id, data.get('session_id', ''))
+    except Exception as e:
+        logger.error(f"❌ 流式聊天API错误: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+    if error:
+        payload, status = error
+        return JSONResponse(payload, status_code=status)
+
+    async def generate_streaming_response():
+        try:
+            try:
+                request_data = build_stream_request(message, conversation_history, is_refresh)
+            except ValueError as e:
+                logger.error(f"❌ {e}")
+                yield error_event(str(e))
+                return
+
+            upstream_start = time.perf_counter()
+            try:
+                response = await _http_session.post(
+                    CHAT_COMPLETIONS_URL, headers=deepseek_headers(), json=request_data
+                )
+            except Exception:
+                UPSTREAM_REQUEST_DURATION.labels(
+                    'deepseek', 'chat_stream_headers', 'error'
+                ).observe(time.perf_counter() - upstream_start)
+                raise
+            UPSTREAM_REQUEST_DURATION.labels(
+                'deepseek', 'chat_stream_headers', response.status
+            ).observe(time.perf_counter() - upstream_start)
+
+            async with response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    log_stream_request_error(response.status, error_text, request_data)
+                    yield error_event(f'DeepSeek API错误: {response.status} - {error_text[:200]}')
+                    return
+
+                parser = ChatStreamParser()
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').rstrip('\r\n')
+                    if not line:
+                        continue
+                    for event in parser.feed(line):
+                        yield sse_event(event)
+                    if parser.done:
+                        break
+
+            UPSTREAM_REQUEST_DURATION.labels(
+                'deepseek', 'chat_stream', response.status
+            ).observe(time.perf_counter() - upstream_start)
+            logger.info(f"✅ 流式响应完成，总长度: {len(parser.full_text)}")
+
+            actual_session_id = await run_blocking(
+                record_chat_interaction, user_id, message, parser.full_text, session_id
+            )
+            yield sse_event(parser.complete_event(actual_session_id))
+
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            logger.error(f"❌ 流式响应生成失败: {error_msg}")
+            yield error_event('流式响应失败，请稍后重试')
+            await run_blocking(
+                record_chat_interaction, user_id, message, '', session_id,
+                success=False, error_message=error_msg
+            )
+
+    return StreamingResponse(
+        generate_streaming_response(),
+        media_type='text/plain',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def text_to_speech(request: Request):
+    """文字转语音API"""
+    try:
+        data = await _read_json(request)
+        if not data or 'text' not in data:
+            logger.error("❌ 缺少text参数")
+            return JSONResponse({'success': False, 'error': 'No text provided'}, status_code=400)
+
+        text = data['text']
+        voice = data.get('voice', 'zh-CN-XiaoxiaoNeural')
+        logger.info(f"🎵 收到TTS请求(async): {text}, 音色: {voice}")
+
+        audio_data = await synthesize_async(text, voice)
+        if audio_data:
+            logger.info(f"🎵 TTS生成成功，音频大小: {len(audio_data)} 字节")
+            return Response(
+                audio_data,
+                media_type='audio/mpeg',
+                headers={'Content-Disposition': 'attachment; filename=speech.mp3'}
+            )
+        logger.error("❌ TTS生成失败：音频数据为空")
+        payload, status = tts_empty_audio_response()
+        return JSONResponse(payload, status_code=status)
+
+    except Exception as e:
+        logger.error(f"❌ TTS API错误: {e}")
+        payload, status = tts_exception_response(str(e))
+        return JSONResponse(payload, status_code=status)
+
+
+def _story_handler(service_func, error_message: str, from_query=None):
+    """把story_service函数包装为异步接口：POST读取JSON，GET用from_query从查询参数取参"""
+    async def handler(request: Request):
+        try:
+            if from_query is not None:
+                args = from_query(request.query_params)
+            else:
+                args = ((await _read_json(request)) or {},)
+            payload, status = await run_blocking(service_func, *args)
+            return JSONResponse(payload, status_code=status)
+        except Exception as e:
+            logger.error(f"❌ {error_message}: {e}")
+            return JSONResponse({'error': str(e)}, status_code=500)
+    return handler
+
+
+def create_async_routes(monitor) -> list:
+    """创建异步路由列表，路径与Flask路由一致"""
+    endpoints = [
+        ('/api/chat_streaming', ['POST'], chat_streaming),
+        ('/api/tts', ['POST'], text_to_speech),
+        ('/api/story/reading/progress', ['POST'],
+         _story_handler(story_service.update_reading_progress, '更新阅读进度失败')),
+        ('/api/story/reading/progress', ['GET'],
+         _story_handler(story_service.get_reading_progress, '获取阅读进度失败',
+                        lambda q: (q.get('user_id'), q.get('story_id')))),
+        ('/api/story/interaction', ['POST'],
+         _story_handler(story_service.log_story_interaction, '记录故事交互失败')),
+        ('/api/story/complete', ['POST'],
+         _story_handler(story_service.complete_story_reading, '完成故事阅读失败')),
+        ('/api/story/statistics', ['GET'],
+         _story_handler(story_service.get_reading_statistics, '获取阅读统计失败',
+                        lambda q: (q.get('user_id'), int(q.get('days', 30))))),
+        ('/api/stories/active', ['GET'],
+         _story_handler(story_service.get_today_story, '获取活跃故事列表失败', lambda q: ())),
+    ]
+    return [
+        Route(
+            path,
+            endpoint=CompressionMiddleware(_InstrumentedEndpoint(path, handler, monitor), route_class(path)),
+            methods=methods
+        )
+        for path, methods, handler in endpoints
+    ]
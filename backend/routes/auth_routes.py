@@ -51,18 +51,15 @@ def register_auth_routes(app):
                     'error': '用户名或密码错误'
                 }), 401
 
-            # 检查同一账号同一app是否已在其他设备登录
-            active_sessions = db_manager.get_active_sessions(
+            # 结束同一账号同一app在其他设备的会话（踢掉其他设备的登录）
+            # 直接按 (user_id, ended_at) 索引更新，其他服务进程创建的会话同样会被结束
+            ended_count = db_manager.end_user_sessions(
                 user['user_id'], app_type
             )
-            if active_sessions:
-                # 结束旧会话（踢掉其他设备的登录）
-                ended_count = db_manager.end_user_sessions(
-                    user['user_id'], app_type
-                )
+            if ended_count:
                 logger.info(
                     f"⚠️ 用户 {username} 在 {app_type} app 已有 "
-                    f"{len(active_sessions)} 个活跃会话，已结束旧会话"
+                    f"{ended_count} 个活跃会话，已结束旧会话"
                 )
                 db_manager.log_system_event(
                     'INFO', 'auth',
@@ -6,6 +6,8 @@ from flask import request, jsonify
 from backend.logger_config import logger
 from backend.config import PUBLIC_IP, PRIVATE_IP
 from backend.service_monitor import ServiceMonitor, AutoRecovery
+from backend.asr_service import get_asr_readiness
+from backend.probe_service import probe_runner
 
 
 def register_health_routes(app, monitor: ServiceMonitor, auto_recovery: AutoRecovery):
@@ -15,7 +17,9 @@ def register_health_routes(app, monitor: ServiceMonitor, auto_recovery: AutoReco
     def health_check():
         """健康检查端点"""
         try:
-            health_status = monitor.check_health()
+            health_status = dict(monitor.check_health())
+            health_status['asr_readiness'] = get_asr_readiness()
+            health_status['probes'] = probe_runner.get_all()
             return jsonify(health_status)
         except Exception as e:
             logger.error(f"❌ 健康检查失败: {e}")
@@ -55,6 +59,7 @@ def register_health_routes(app, monitor: ServiceMonitor, auto_recovery: AutoReco
                 'tts': monitor.get_service_metrics('tts'),
                 'asr': monitor.get_service_metrics('asr'),
                 'chat': monitor.get_service_metrics('chat'),
+                'endpoints': monitor.get_endpoint_metrics(),
                 'system': monitor.system_stats
             }
             return jsonify(metrics)
@@ -4,6 +4,7 @@
 """
 from flask import request, jsonify
 from backend.logger_config import logger
+from backend.pagination import next_cursor, InvalidCursor
 from database_manager import db_manager
 
 
@@ -118,15 +119,20 @@ def register_interaction_routes(app):
 
             limit = int(request.args.get('limit', 50))
             offset = int(request.args.get('offset', 0))
+            cursor = request.args.get('cursor') or None
 
-            interactions = db_manager.get_user_interactions(
-                user_id, limit, offset
-            )
+            try:
+                interactions = db_manager.get_user_interactions(
+                    user_id, limit, offset, cursor=cursor
+                )
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
 
             return jsonify({
                 'success': True,
                 'interactions': interactions,
-                'count': len(interactions)
+                'count': len(interactions),
+                'next_cursor': next_cursor('user_interactions', interactions, limit)
             })
 
         except Exception as e:
@@ -142,16 +148,21 @@ def register_interaction_routes(app):
 
             limit = int(request.args.get('limit', 100))
             offset = int(request.args.get('offset', 0))
+            cursor = request.args.get('cursor') or None
 
-            interactions = db_manager.get_session_interactions(
-                session_id, limit, offset
-            )
+            try:
+                interactions = db_manager.get_session_interactions(
+                    session_id, limit, offset, cursor=cursor
+                )
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
 
             return jsonify({
                 'success': True,
                 'session_id': session_id,
                 'interactions': interactions,
-                'count': len(interactions)
+                'count': len(interactions),
+                'next_cursor': next_cursor('session_interactions', interactions, limit)
             })
 
         except Exception as e:
@@ -169,23 +180,8 @@ def register_interaction_routes(app):
             limit = int(request.args.get('limit', 50))
             offset = int(request.args.get('offset', 0))
 
-            # 获取用户的所有会话
-            sessions = db_manager.get_user_sessions(user_id, limit, offset)
-
-            # 为每个会话获取交互记录数量
-            conversations = []
-            for session in sessions:
-                session_id = session.get('session_id')
-                interactions = db_manager.get_session_interactions(
-                    session_id, limit=1, offset=0
-                )
-                conversations.append({
-                    'session_id': session_id,
-                    'login_time': session.get('login_time'),
-                    'app_type': session.get('app_type'),
-                    'interaction_count': len(interactions),
-                    'last_interaction': interactions[0] if interactions else None
-                })
+            # 一次查询取出本页会话的交互数、首末时间和最后一条消息预览
+            conversations = db_manager.get_user_conversations(user_id, limit, offset)
 
             return jsonify({
                 'success': True,
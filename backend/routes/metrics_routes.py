@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus指标路由模块
+"""
+import gc
+import time
+import psutil
+from flask import Response
+from backend.logger_config import logger
+from backend import asr_service, tts_service
+from backend.asr_cache import asr_result_cache
+from backend.asr_stream_service import asr_stream_sessions
+from backend.progress_buffer import progress_buffer
+from backend.retention import retention_engine
+from backend.prometheus_metrics import REGISTRY, CallbackGauge, OPENMETRICS_CONTENT_TYPE
+from backend.service_monitor import ServiceMonitor
+from database_manager import db_manager
+
+
+def _register_collectors(monitor: ServiceMonitor):
+    """注册抓取时取值的指标"""
+    process = psutil.Process()
+
+    def service_requests():
+        samples = []
+        for service, stats in monitor.service_stats.items():
+            samples.append(((service, 'success'), stats['successful_requests']))
+            samples.append(((service, 'failure'), stats['failed_requests']))
+        return samples
+
+    def process_cpu_seconds():
+        cpu_times = process.cpu_times()
+        return cpu_times.user + cpu_times.system
+
+    def process_open_fds():
+        if hasattr(process, 'num_fds'):
+            return process.num_fds()
+        return process.num_handles()
+
+    def gc_collections():
+        return [((str(generation),), stats['collections'])
+                for generation, stats in enumerate(gc.get_stats())]
+
+    def db_shared_connection_open():
+        connection = db_manager.connection
+        return 1 if connection is not None and connection.open else 0
+
+    collectors = [
+        # 服务级统计
+        ('nexus_service_requests', '各服务请求数', service_requests, ('service', 'outcome'), 'counter'),
+        ('nexus_service_healthy', '服务健康状态（1为健康）',
+         lambda: [((service,), status == 'healthy')
+                  for service, status in monitor.health_status['services'].items()],
+         ('service',), 'gauge'),
+        # TTS缓存
+        ('nexus_tts_cache_entries', 'TTS缓存条目数', lambda: len(tts_service.tts_cache), (), 'gauge'),
+        ('nexus_tts_cache_hits', 'TTS缓存命中次数', lambda: tts_service.tts_cache_stats['hits'], (), 'counter'),
+        ('nexus_tts_cache_misses', 'TTS缓存未命中次数', lambda: tts_service.tts_cache_stats['misses'], (), 'counter'),
+        ('nexus_tts_concurrent_requests', '正在处理的TTS请求数', lambda: tts_service.tts_concurrent_count, (), 'gauge'),
+        # ASR
+        # is_asr_ready()在加载失败/不可用时也为True（可以走模拟模式），这里只看模型本身是否就绪
+        ('nexus_asr_model_ready', 'ASR模型是否已加载并预热完成',
+         lambda: asr_service.dolphin_model_state['state'] == 'ready', (), 'gauge'),
+        ('nexus_asr_model_state', 'ASR模型加载状态（当前状态为1）',
+         lambda: [((state,), asr_service.dolphin_model_state['state'] == state) for state in asr_service.ASR_MODEL_STATES],
+         ('state',), 'gauge'),
+        ('nexus_asr_stream_sessions', '活跃的流式识别会话数', lambda: len(asr_stream_sessions), (), 'gauge'),
+        ('nexus_asr_result_cache_entries', 'ASR结果缓存条目数', lambda: asr_result_cache.get_stats()['size'], (), 'gauge'),
+        ('nexus_asr_result_cache_hits', 'ASR结果缓存命中次数',
+         lambda: [((tier,), asr_result_cache.stats[f'{tier}_hits']) for tier in ('memory', 'raw', 'disk')],
+         ('tier',), 'counter'),
+        ('nexus_asr_result_cache_misses', 'ASR结果缓存未命中次数', lambda: asr_result_cache.stats['misses'], (), 'counter'),
+        # 数据库
+        ('nexus_db_shared_connection_open', '共享数据库连接是否打开', db_shared_connection_open, (), 'gauge'),
+        ('nexus_user_cache_entries', '用户目录缓存条目数', lambda: len(db_manager.user_cache.entries), (), 'gauge'),
+        ('nexus_user_cache_hits', '用户目录缓存命中次数',
+         lambda: [(('positive',), db_manager.user_cache.stats['hits']),
+                  (('negative',), db_manager.user_cache.stats['negative_hits'])],
+         ('kind',), 'counter'),
+        ('nexus_user_cache_misses', '用户目录缓存未命中次数', lambda: db_manager.user_cache.stats['misses'], (), 'counter'),
+        # 阅读进度写缓冲
+        ('nexus_progress_buffer_pending', '等待写库的阅读进度条数', lambda: len(progress_buffer.pending), (), 'gauge'),
+        ('nexus_progress_buffer_updates', '收到的阅读进度更新次数', lambda: progress_buffer.stats['updates'], (), 'counter'),
+        ('nexus_progress_buffer_coalesced', '被合并（未单独写库）的阅读进度更新次数',
+         lambda: progress_buffer.stats['coalesced'], (), 'counter'),
+        ('nexus_progress_buffer_rows_written', '批量写入的阅读进度行数', lambda: progress_buffer.stats['rows_written'], (), 'counter'),
+        ('nexus_progress_buffer_flush_errors', '阅读进度批量写库失败次数', lambda: progress_buffer.stats['flush_errors'], (), 'counter'),
+        ('nexus_progress_buffer_dropped', '数据无效无法写库而丢弃的阅读进度条数', lambda: progress_buffer.stats['dropped'], (), 'counter'),
+        # 会话注册表
+        ('nexus_sessions_active', '本进程内存中的活跃会话数', lambda: len(db_manager.session_registry.sessions), (), 'gauge'),
+        ('nexus_sessions_lookups', '会话查询次数（内存命中/查库）',
+         lambda: [(('hit',), db_manager.session_registry.stats['hits']),
+                  (('miss',), db_manager.session_registry.stats['misses'])],
+         ('result',), 'counter'),
+        ('nexus_sessions_expired', '空闲超时结束的会话数', lambda: db_manager.session_registry.stats['expired'], (), 'counter'),
+        ('nexus_sessions_touch_rows_written', '批量写入的会话活跃时间行数',
+         lambda: db_manager.session_registry.stats['rows_written'], (), 'counter'),
+        # 过期数据清理
+        ('nexus_retention_rows_deleted', '过期数据清理删除的行数', lambda: retention_engine.stats['rows_deleted'], (), 'counter'),
+        ('nexus_retention_rows_archived', '过期数据清理归档的行数', lambda: retention_engine.stats['rows_archived'], (), 'counter'),
+        ('nexus_retention_batches', '过期数据清理执行的批次数', lambda: retention_engine.stats['batches'], (), 'counter'),
+        ('nexus_retention_errors', '过期数据清理失败次数', lambda: retention_engine.stats['errors'], (), 'counter'),
+        ('nexus_retention_rows_per_second', '最近一次清理的删除速度（行/秒）',
+         lambda: retention_engine.stats['rows_per_sec'], (), 'gauge'),
+        # 进程
+        ('process_resident_memory_bytes', '进程常驻内存', lambda: process.memory_info().rss, (), 'gauge'),
+        ('process_virtual_memory_bytes', '进程虚拟内存', lambda: process.memory_info().vms, (), 'gauge'),
+        ('process_cpu_seconds', '进程累计CPU时间', process_cpu_seconds, (), 'counter'),
+        ('process_open_fds', '进程打开的文件描述符（Windows为句柄）数', process_open_fds, (), 'gauge'),
+        ('process_threads', '进程线程数', lambda: process.num_threads(), (), 'gauge'),
+        ('process_start_time_seconds', '进程启动时间戳', lambda: process.create_time(), (), 'gauge'),
+        ('python_gc_collections', 'Python GC各代回收次数', gc_collections, ('generation',), 'counter'),
+    ]
+    for name, documentation, callback, labelnames, metric_type in collectors:
+        CallbackGauge(name, documentation, callback, labelnames, metric_type)
+
+
+def register_metrics_routes(app, monitor: ServiceMonitor):
+    """注册Prometheus指标路由"""
+    _register_collectors(monitor)
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """OpenMetrics格式指标导出"""
+        start_time = time.perf_counter()
+        try:
+            body = REGISTRY.render()
+        except Exception as e:
+            logger.error(f"❌ 导出Prometheus指标失败: {e}")
+            return Response("metrics export failed\n", status=500, content_type='text/plain; charset=utf-8')
+        logger.debug(f"📈 导出指标耗时 {(time.perf_counter() - start_time) * 1000:.2f}ms")
+        return Response(body, content_type=OPENMETRICS_CONTENT_TYPE)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+静态页面路由模块 - 管理后台页面（预压缩版本缓存在内存中）
+"""
+import os
+from flask import request, Response
+from backend.logger_config import logger
+from backend.compression import StaticAsset
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+admin_panel = StaticAsset(os.path.join(PROJECT_ROOT, 'admin_panel.html'), 'text/html; charset=utf-8')
+
+
+def register_static_routes(app):
+    """注册静态页面路由"""
+
+    @app.route('/admin', methods=['GET'])
+    @app.route('/admin_panel.html', methods=['GET'])
+    def serve_admin_panel():
+        """管理后台页面"""
+        try:
+            encoding, body, etag = admin_panel.select(request.headers.get('Accept-Encoding', ''))
+        except OSError as e:
+            logger.error(f"❌ 读取管理后台页面失败: {e}")
+            return Response('admin_panel.html not found', status=404, mimetype='text/plain')
+
+        headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+
+        response = Response(body, content_type=admin_panel.content_type, headers=headers)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response
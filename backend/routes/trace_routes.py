@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+链路追踪路由模块 - 浏览慢请求
+"""
+from flask import request, jsonify
+from backend.logger_config import logger
+from backend.config import TRACING_CONFIG
+from backend.tracing import get_slow_traces, get_slow_trace
+from database_manager import db_manager
+
+
+def register_trace_routes(app):
+    """注册链路追踪相关路由"""
+
+    def verify_admin():
+        """验证管理员身份，失败时返回错误响应"""
+        admin_user_id = request.args.get('admin_user_id')
+        if not admin_user_id:
+            return jsonify({'error': '缺少管理员用户ID'}), 400
+        if not db_manager.user_exists(admin_user_id):
+            return jsonify({'error': '管理员身份验证失败'}), 401
+        return None
+
+    @app.route('/api/admin/traces/slow', methods=['GET'])
+    def admin_list_slow_traces():
+        """管理员查看慢请求列表（按时间倒序）"""
+        try:
+            error_response = verify_admin()
+            if error_response:
+                return error_response
+
+            limit = int(request.args.get('limit', 50))
+            min_ms = float(request.args.get('min_ms', 0))
+            path_prefix = request.args.get('path')
+
+            traces = get_slow_traces(limit, min_ms, path_prefix)
+            return jsonify({
+                'success': True,
+                'data': traces,
+                'threshold_ms': TRACING_CONFIG['slow_threshold_ms'],
+                'capacity': TRACING_CONFIG['ring_size']
+            })
+        except Exception as e:
+            logger.error(f"❌ 获取慢请求列表失败: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/admin/traces/slow/<trace_id>', methods=['GET'])
+    def admin_get_slow_trace(trace_id):
+        """管理员查看单个慢请求的阶段明细"""
+        try:
+            error_response = verify_admin()
+            if error_response:
+                return error_response
+
+            trace = get_slow_trace(trace_id)
+            if trace is None:
+                return jsonify({'error': '追踪记录不存在或已被淘汰'}), 404
+            return jsonify({'success': True, 'data': trace})
+        except Exception as e:
+            logger.error(f"❌ 获取慢请求详情失败: {e}")
+            return jsonify({'error': str(e)}), 500
@@ -8,6 +8,9 @@ from backend.logger_config import logger
 from backend.tts_service import (
     generate_tts_audio,
     check_tts_health,
+    run_synthesis_test,
+    tts_empty_audio_response,
+    tts_exception_response,
     cleanup_tts_cache,
     tts_cache,
     tts_concurrent_count,
@@ -15,6 +18,7 @@ from backend.tts_service import (
 )
 from backend.config import TTS_CONFIG, DOUBAO_BOT_NAME, DOUBAO_TTS_SPEAKER
 from backend.service_monitor import ServiceMonitor
+from backend.probe_service import probe_runner
 
 
 def register_tts_routes(app, monitor: ServiceMonitor):
@@ -54,31 +58,16 @@ def register_tts_routes(app, monitor: ServiceMonitor):
                 )
             else:
                 logger.error("❌ TTS生成失败：音频数据为空")
-                return jsonify({
-                    'success': False,
-                    'error': 'TTS服务暂时不可用，可能是网络连接问题。请检查：\n1. 网络连接是否正常\n2. 是否可以访问Microsoft TTS服务\n3. 防火墙或代理设置',
-                    'error_code': 'TTS_SERVICE_UNAVAILABLE'
-                }), 503  # 使用503表示服务暂时不可用
+                payload, status = tts_empty_audio_response()
+                return jsonify(payload), status
 
         except Exception as e:
             error_msg = str(e)
             logger.error(f"❌ TTS API错误: {error_msg}")
             import traceback
             logger.error(f"❌ TTS API错误详情: {traceback.format_exc()}")
-            
-            # 检查是否是edge-tts相关的错误
-            if "No audio was received" in error_msg or "NoAudioReceived" in error_msg:
-                return jsonify({
-                    'success': False,
-                    'error': 'TTS服务无法获取音频数据，可能是网络连接问题。请稍后重试或联系管理员检查网络设置。',
-                    'error_code': 'TTS_NETWORK_ERROR'
-                }), 503
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': f'TTS服务错误: {error_msg}',
-                    'error_code': 'TTS_ERROR'
-                }), 500
+            payload, status = tts_exception_response(error_msg)
+            return jsonify(payload), status
 
     @app.route('/api/tts/status', methods=['GET'])
     def tts_status():
@@ -90,7 +79,8 @@ def register_tts_routes(app, monitor: ServiceMonitor):
                 'concurrent_limit': TTS_CONFIG['concurrent_limit'],
                 'cache_size': len(tts_cache),
                 'cache_enabled': TTS_CONFIG['cache_enabled'],
-                'health_check': check_tts_health()
+                'health_check': check_tts_health(),
+                'probe': probe_runner.get('tts')
             }
             return jsonify(status)
         except Exception as e:
@@ -114,7 +104,8 @@ def register_tts_routes(app, monitor: ServiceMonitor):
             is_healthy = check_tts_health()
             return jsonify({
                 'healthy': is_healthy,
-                'message': 'TTS服务正常' if is_healthy else 'TTS服务异常'
+                'message': 'TTS服务正常' if is_healthy else 'TTS服务异常',
+                'probe': probe_runner.get('tts')
             })
         except Exception as e:
             logger.error(f"❌ TTS健康检查失败: {e}")
@@ -122,40 +113,47 @@ def register_tts_routes(app, monitor: ServiceMonitor):
 
     @app.route('/api/tts/diagnose', methods=['GET'])
     def tts_diagnose():
-        """TTS服务诊断 - 检查edge-tts服务可用性"""
+        """TTS服务诊断 - 返回端点与音色列表探测结果，synthesize=1时附加实际合成测试（结果有缓存）"""
         try:
-            import asyncio
-            from backend.tts_service import run_async_tts
-            
             diagnosis = {
                 'edge_tts_available': EDGE_TTS_AVAILABLE,
                 'service_status': 'unknown',
+                'probes': {
+                    'endpoint': probe_runner.get('tts'),
+                    'voices': probe_runner.get('tts_voices')
+                },
                 'test_result': None,
                 'error': None
             }
-            
+
             if not EDGE_TTS_AVAILABLE:
                 diagnosis['service_status'] = 'unavailable'
                 diagnosis['error'] = 'edge-tts模块未安装或导入失败'
                 return jsonify(diagnosis), 200
-            
-            # 尝试测试TTS服务
-            try:
-                test_audio = run_async_tts("测试", "zh-CN-XiaoxiaoNeural")
-                if test_audio and len(test_audio) > 0:
+
+            endpoint_probe = diagnosis['probes']['endpoint']
+            if endpoint_probe is None:
+                diagnosis['service_status'] = 'unknown'
+            elif endpoint_probe['healthy']:
+                diagnosis['service_status'] = 'available'
+            else:
+                diagnosis['service_status'] = 'error'
+                diagnosis['error'] = f"无法连接Microsoft TTS服务: {endpoint_probe.get('error')}"
+
+            if request.args.get('synthesize') in ('1', 'true'):
+                synthesis = run_synthesis_test(force=request.args.get('force') in ('1', 'true'))
+                diagnosis['synthesis'] = synthesis
+                if synthesis['success']:
                     diagnosis['service_status'] = 'available'
-                    diagnosis['test_result'] = f'成功生成测试音频 ({len(test_audio)} 字节)'
+                    diagnosis['test_result'] = f"成功生成测试音频 ({synthesis['audio_bytes']} 字节)"
                 else:
                     diagnosis['service_status'] = 'error'
-                    diagnosis['error'] = '测试音频生成失败，返回空数据'
-            except Exception as test_error:
-                diagnosis['service_status'] = 'error'
-                diagnosis['error'] = str(test_error)
-                if "No audio was received" in str(test_error):
-                    diagnosis['error'] += ' - 可能是网络连接问题，无法访问Microsoft TTS服务'
-            
+                    diagnosis['error'] = synthesis.get('error') or '测试音频生成失败，返回空数据'
+                    if "No audio was received" in diagnosis['error']:
+                        diagnosis['error'] += ' - 可能是网络连接问题，无法访问Microsoft TTS服务'
+
             return jsonify(diagnosis), 200
-            
+
         except Exception as e:
             logger.error(f"❌ TTS诊断失败: {e}")
             return jsonify({
@@ -2,16 +2,108 @@
 """
 服务监控模块
 """
+import gc
 import time
 import psutil
 import threading
 import tempfile
 import os
-import requests
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import defaultdict
 from backend.logger_config import logger
-from backend.config import TTS_CONFIG
+from backend.config import TTS_CONFIG, SYSTEM_SAMPLER_CONFIG
+from backend.latency_metrics import LatencyRecorder
+from backend.prometheus_metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
+
+class SystemSampler:
+    """后台系统资源采样器：定时生成新快照并整体替换引用，读取方无需加锁"""
+
+    def __init__(self, interval: float = None, disk_path: str = None):
+        self.interval = interval or SYSTEM_SAMPLER_CONFIG['interval']
+        self.disk_path = disk_path or SYSTEM_SAMPLER_CONFIG['disk_path']
+        self.process = psutil.Process()
+        self.snapshot = {
+            'cpu_percent': 0,
+            'memory_percent': 0,
+            'disk_usage': 0,
+            'last_update': None
+        }
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _process_stats(self) -> dict:
+        """当前进程的资源占用"""
+        with self.process.oneshot():
+            memory_info = self.process.memory_info()
+            stats = {
+                'pid': self.process.pid,
+                'rss_mb': round(memory_info.rss / 1024 / 1024, 1),
+                'vms_mb': round(memory_info.vms / 1024 / 1024, 1),
+                'cpu_percent': self.process.cpu_percent(interval=None),
+                'threads': self.process.num_threads()
+            }
+            # Windows上没有文件描述符，统计句柄数
+            if hasattr(self.process, 'num_fds'):
+                stats['open_fds'] = self.process.num_fds()
+            elif hasattr(self.process, 'num_handles'):
+                stats['open_handles'] = self.process.num_handles()
+        return stats
+
+    @staticmethod
+    def _gc_stats() -> dict:
+        """Python垃圾回收统计"""
+        generations = gc.get_stats()
+        return {
+            'enabled': gc.isenabled(),
+            'counts': list(gc.get_count()),
+            'collections': [generation['collections'] for generation in generations],
+            'collected': sum(generation['collected'] for generation in generations),
+            'uncollectable': sum(generation['uncollectable'] for generation in generations)
+        }
+
+    def sample(self) -> dict:
+        """采集一次并替换快照（cpu_percent为距上次采样的平均值，不阻塞）"""
+        start = time.perf_counter()
+        try:
+            snapshot = {
+                'cpu_percent': psutil.cpu_percent(interval=None),
+                'memory_percent': psutil.virtual_memory().percent,
+                'disk_usage': psutil.disk_usage(self.disk_path).percent,
+                'process': self._process_stats(),
+                'gc': self._gc_stats(),
+                'sample_interval': self.interval,
+                'last_update': datetime.now()
+            }
+            snapshot['sample_duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self.snapshot = snapshot
+            self.sample_count += 1
+        except Exception as e:
+            logger.error(f"❌ 更新系统统计失败: {e}")
+        return self.snapshot
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """启动后台采样线程（重复调用无副作用）"""
+        if self._thread and self._thread.is_alive():
+            return
+        # 首次调用cpu_percent只建立基准，立即采样一次保证快照可用
+        psutil.cpu_percent(interval=None)
+        self.process.cpu_percent(interval=None)
+        self.sample()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
 
 
 class ServiceMonitor:
@@ -27,7 +119,6 @@ class ServiceMonitor:
                 'last_success': None,
                 'last_failure': None,
                 'consecutive_failures': 0,
-                'response_times': deque(maxlen=100),
                 'error_types': defaultdict(int)
             },
             'asr': {
@@ -37,7 +128,6 @@ class ServiceMonitor:
                 'last_success': None,
                 'last_failure': None,
                 'consecutive_failures': 0,
-                'response_times': deque(maxlen=100),
                 'error_types': defaultdict(int)
             },
             'chat': {
@@ -47,16 +137,15 @@ class ServiceMonitor:
                 'last_success': None,
                 'last_failure': None,
                 'consecutive_failures': 0,
-                'response_times': deque(maxlen=100),
                 'error_types': defaultdict(int)
             }
         }
-        self.system_stats = {
-            'cpu_percent': 0,
-            'memory_percent': 0,
-            'disk_usage': 0,
-            'last_update': None
-        }
+        # 延迟直方图：服务级和接口级分别统计
+        self.service_latency = LatencyRecorder()
+        self.endpoint_latency = LatencyRecorder()
+        self.stats_lock = threading.Lock()
+        # 采样线程由服务进程启动（app.start_background_services），构造时不启动
+        self.system_sampler = SystemSampler()
         self.health_status = {
             'overall': 'healthy',
             'services': {
@@ -76,6 +165,14 @@ class ServiceMonitor:
         if service_name not in self.service_stats:
             return
 
+        if response_time is not None:
+            self.service_latency.record(service_name, response_time, success, error_type)
+
+        with self.stats_lock:
+            self._update_counters(service_name, success, error_type)
+
+    def _update_counters(self, service_name, success, error_type):
+        """更新请求计数和健康状态（调用方持有stats_lock）"""
         stats = self.service_stats[service_name]
         stats['total_requests'] += 1
 
@@ -99,23 +196,17 @@ class ServiceMonitor:
                     f"{stats['consecutive_failures']} 次，标记为不健康"
                 )
 
-        if response_time is not None:
-            stats['response_times'].append(response_time)
+    @property
+    def system_stats(self):
+        """最新的系统资源快照（由后台采样线程维护）"""
+        return self.system_sampler.snapshot
 
     def update_system_stats(self):
-        """更新系统统计信息"""
-        try:
-            self.system_stats['cpu_percent'] = psutil.cpu_percent(interval=1)
-            self.system_stats['memory_percent'] = psutil.virtual_memory().percent
-            self.system_stats['disk_usage'] = psutil.disk_usage('/').percent
-            self.system_stats['last_update'] = datetime.now()
-        except Exception as e:
-            logger.error(f"❌ 更新系统统计失败: {e}")
+        """立即采样一次系统统计信息（不阻塞）"""
+        return self.system_sampler.sample()
 
     def check_health(self):
-        """检查服务健康状态"""
-        self.update_system_stats()
-
+        """检查服务健康状态（只读取后台采样快照，不做阻塞采样）"""
         unhealthy_services = []
         for service, status in self.health_status['services'].items():
             if status == 'unhealthy':
@@ -137,8 +228,10 @@ class ServiceMonitor:
         if service_name not in self.service_stats:
             return None
 
-        stats = self.service_stats[service_name]
-        response_times = list(stats['response_times'])
+        with self.stats_lock:
+            stats = dict(self.service_stats[service_name])
+            stats['error_types'] = dict(stats['error_types'])
+        latency = self.service_latency.stats(service_name)
 
         metrics = {
             'total_requests': stats['total_requests'],
@@ -153,13 +246,54 @@ class ServiceMonitor:
                 stats['last_failure'].isoformat() if stats['last_failure'] else None
             ),
             'avg_response_time': (
-                sum(response_times) / len(response_times) if response_times else 0
+                latency['5m']['mean_ms'] / 1000 if latency else 0
             ),
-            'error_types': dict(stats['error_types'])
+            'error_types': dict(stats['error_types']),
+            'latency': latency
         }
 
         return metrics
 
+    def record_endpoint(self, method, rule, response_time, status_code):
+        """记录单个HTTP接口的耗时，5xx计为失败"""
+        error_type = f"http_{status_code}" if status_code >= 400 else None
+        self.endpoint_latency.record(
+            f"{method} {rule}", response_time,
+            success=status_code < 500, error_type=error_type
+        )
+        HTTP_REQUESTS.labels(method, rule, status_code).inc()
+        HTTP_REQUEST_DURATION.labels(method, rule).observe(response_time)
+
+    def get_endpoint_metrics(self):
+        """获取所有接口的延迟分位数、吞吐和错误率"""
+        return {
+            endpoint: self.endpoint_latency.stats(endpoint)
+            for endpoint in self.endpoint_latency.names()
+        }
+
+    def init_app(self, app):
+        """注册请求钩子，按路由模板统计接口耗时（流式响应只统计到响应头返回）"""
+        from flask import request
+
+        @app.before_request
+        def _start_endpoint_timer():
+            request.environ['nexus.start_time'] = time.perf_counter()
+
+        @app.after_request
+        def _record_endpoint_latency(response):
+            # 只解析一次本地代理，减少每个请求的开销
+            current_request = request._get_current_object()
+            start_time = current_request.environ.pop('nexus.start_time', None)
+            if start_time is not None:
+                url_rule = current_request.url_rule
+                self.record_endpoint(
+                    current_request.method,
+                    url_rule.rule if url_rule else 'unmatched',
+                    time.perf_counter() - start_time,
+                    response.status_code
+                )
+            return response
+
     def should_trigger_recovery(self, service_name):
         """判断是否应该触发自动恢复"""
         if not self.auto_recovery_enabled:
@@ -288,20 +422,13 @@ class AutoRecovery:
         time.sleep(2)
 
     def _test_service(self, service_name):
-        """测试服务是否正常"""
+        """测试服务是否正常 - 立即执行一次对应的轻量探测，不再请求本服务的合成接口"""
+        from backend.probe_service import probe_runner
+        probe_name = {'tts': 'tts', 'asr': 'asr', 'chat': 'deepseek'}.get(service_name)
+        if probe_name is None:
+            return True
         try:
-            if service_name == 'tts':
-                # 测试TTS服务 - 增加超时时间
-                test_response = requests.post(
-                    'http://localhost:5000/api/tts',
-                    json={'text': '测试', 'voice': 'zh-CN-XiaoxiaoNeural'},
-                    timeout=30
-                )
-                return test_response.status_code == 200
-            elif service_name == 'asr':
-                return True
-            elif service_name == 'chat':
-                return True
+            return probe_runner.run_now(probe_name)['healthy']
         except Exception as e:
             logger.error(f"❌ 测试服务 {service_name} 失败: {e}")
             return False
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+会话注册表模块 - 活跃会话常驻内存，sessions表只承担持久化
+
+- 创建、登出、顶替登录立即写库；每次交互只更新内存中的last_seen，每 flush_interval 秒批量写库
+- 会话校验（check_session_exists、validate_or_create_session）命中内存时不查库，
+  未命中时（其他进程创建的会话、重启前的会话）查一次库并放入内存
+- 空闲超过 idle_timeout 的会话由时间轮到期检查，从内存移除并在库中标记结束
+- 后台线程未启动时（脚本、测试等）last_seen直接写库
+"""
+import time
+import uuid
+import threading
+from datetime import datetime
+from backend.config import SESSION_REGISTRY_CONFIG
+from backend.logger_config import logger
+
+
+class TimerWheel:
+    """
+    哈希时间轮：按到期时间放入对应的槽，推进时取出到期槽中的键
+    键的到期时间延后（会话有新交互）时不移动，取出后由调用方检查并重新放入；
+    超过一圈的到期时间会提前被取出，同样由调用方重新放入
+    """
+
+    def __init__(self, tick: float, slots: int, now: float = None):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.current = int((time.time() if now is None else now) // tick)
+
+    def schedule(self, key, deadline: float):
+        index = max(int(deadline // self.tick), self.current + 1)
+        self.slots[index % len(self.slots)].add(key)
+
+    def advance(self, now: float) -> list:
+        """推进到now，返回经过的槽中的全部键"""
+        target = int(now // self.tick)
+        due = []
+        steps = min(target - self.current, len(self.slots))
+        for step in range(1, steps + 1):
+            slot = self.slots[(self.current + step) % len(self.slots)]
+            due.extend(slot)
+            slot.clear()
+        self.current = max(self.current, target)
+        return due
+
+
+class SessionRegistry:
+    """内存会话注册表（线程安全）"""
+
+    def __init__(self, store, config: dict = None):
+        """store为DatabaseManager，提供sessions表的读写方法"""
+        self.store = store
+        self.config = config or SESSION_REGISTRY_CONFIG
+        self.sessions = {}             # session_id -> 会话信息
+        self.by_user = {}              # user_id -> {session_id}
+        self.dirty = {}                # session_id -> (user_id, last_seen)，待写库的活跃时间
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wheel = TimerWheel(self.config['wheel_tick'], self.config['wheel_slots'])
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.stats = {
+            'created': 0,
+            'touches': 0,
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'flush_errors': 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def idle_timeout(self) -> float:
+        return self.config['idle_timeout']
+
+    # ---------- 内存索引 ----------
+
+    def _register(self, entry: dict):
+        """放入内存并安排到期检查（调用方持有锁）"""
+        session_id = entry['session_id']
+        self.sessions[session_id] = entry
+        self.by_user.setdefault(entry['user_id'], set()).add(session_id)
+        self.wheel.schedule(session_id, entry['last_seen'] + self.idle_timeout)
+
+    def _unregister(self, session_id: str):
+        """从内存移除（调用方持有锁），时间轮中的键到期时发现已不存在会直接丢弃"""
+        entry = self.sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        user_sessions = self.by_user.get(entry['user_id'])
+        if user_sessions is not None:
+            user_sessions.discard(session_id)
+            if not user_sessions:
+                del self.by_user[entry['user_id']]
+        self.dirty.pop(session_id, None)
+        return entry
+
+    @staticmethod
+    def _entry_from_record(record: dict) -> dict:
+        last_seen = record.get('last_seen_at') or record.get('created_at')
+        return {
+            'session_id': record['session_id'],
+            'user_id': record['user_id'],
+            'app_type': record.get('app_type'),
+            'device_info': record.get('device_info'),
+            'ip_address': record.get('ip_address'),
+            'created_at': record.get('created_at'),
+            'last_seen': last_seen.timestamp() if last_seen else time.time()
+        }
+
+    @staticmethod
+    def _public(entry: dict) -> dict:
+        """与原 get_active_sessions 返回的字段一致"""
+        return {
+            'session_id': entry['session_id'],
+            'app_type': entry['app_type'],
+            'device_info': entry['device_info'],
+            'ip_address': entry['ip_address'],
+            'login_time': entry['created_at'],
+            'last_seen_at': datetime.fromtimestamp(entry['last_seen'])
+        }
+
+    # ---------- 会话操作 ----------
+
+    def create(self, user_id: str, app_type: str = 'unknown', device_info: str = None,
+               ip_address: str = None) -> str:
+        """创建会话并立即写库，写库失败时返回None"""
+        now = time.time()
+        entry = {
+            'session_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'app_type': app_type,
+            'device_info': device_info,
+            'ip_address': ip_address,
+            'created_at': datetime.fromtimestamp(now).replace(microsecond=0),
+            'last_seen': now
+        }
+        try:
+            self.store.insert_session_record(entry)
+        except Exception as e:
+            logger.error(f"❌ 创建会话失败: {e}")
+            return None
+        with self.lock:
+            self._register(entry)
+            self.stats['created'] += 1
+        return entry['session_id']
+
+    def touch(self, session_id: str, user_id: str):
+        """记录一次会话活动（只改内存，由后台线程批量写库）"""
+        if not session_id:
+            return
+        now = time.time()
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                entry['last_seen'] = now
+                user_id = entry['user_id']
+            # 不在内存中的会话（其他进程创建或已结束）只更新库中的活跃时间
+            self.dirty[session_id] = (user_id, now)
+            self.stats['touches'] += 1
+        if not self.running:
+            self.flush()
+
+    def get(self, session_id: str, include_ended: bool = False):
+        """返回会话信息；不在内存中时查库，未结束且未超时的会话放入内存"""
+        if not session_id:
+            return None
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                self.stats['hits'] += 1
+                return dict(entry)
+            self.stats['misses'] += 1
+        record = self.store.find_session_record(session_id)
+        if record is None:
+            return None
+        entry = self._entry_from_record(record)
+        if record.get('ended_at') is None and time.time() - entry['last_seen'] < self.idle_timeout:
+            with self.lock:
+                if session_id not in self.sessions:
+                    self._register(entry)
+            return dict(entry)
+        return dict(entry, ended=True) if include_ended else None
+
+    def exists(self, user_id: str, session_id: str) -> bool:
+        """会话存在且属于该用户（含已结束的历史会话）"""
+        entry = self.get(session_id, include_ended=True)
+        return entry is not None and entry['user_id'] == user_id
+
+    def validate_or_create(self, user_id: str, session_id: str, timeout_minutes: float) -> str:
+        """会话属于该用户且最近timeout_minutes内有活动时继续使用，否则创建新会话"""
+        entry = self.get(session_id)
+        if (entry is not None and entry['user_id'] == user_id
+                and time.time() - entry['last_seen'] <= timeout_minutes * 60):
+            return session_id
+        return self.create(user_id)
+
+    def latest(self, user_id: str):
+        """该用户最近活动的未结束会话"""
+        with self.lock:
+            entries = [self.sessions[sid] for sid in self.by_user.get(user_id, ())]
+            if entries:
+                self.stats['hits'] += 1
+                return dict(max(entries, key=lambda item: item['last_seen']))
+            self.stats['misses'] += 1
+        record = self.store.find_latest_session_record(user_id)
+        if record is None:
+            return None
+        entry = self._entry_from_record(record)
+        if time.time() - entry['last_seen'] >= self.idle_timeout:
+            return None
+        with self.lock:
+            if entry['session_id'] not in self.sessions:
+                self._register(entry)
+        return dict(entry)
+
+    def active(self, user_id: str, app_type: str = None) -> list:
+        """本进程内存中该用户的活跃会话"""
+        with self.lock:
+            entries = [self.sessions[sid] for sid in self.by_user.get(user_id, ())]
+            return [self._public(entry) for entry in entries
+                    if app_type is None or entry['app_type'] == app_type]
+
+    def end(self, session_id: str, reason: str = 'logout') -> bool:
+        """结束会话并立即写库"""
+        with self.lock:
+            self._unregister(session_id)
+        return self.store.end_session_records([session_id], reason) > 0
+
+    def end_user(self, user_id: str, app_type: str = None, reason: str = 'replaced') -> int:
+        """结束用户的全部会话（或指定app类型的会话），返回库中结束的会话数"""
+        with self.lock:
+            for session_id in list(self.by_user.get(user_id, ())):
+                if app_type is None or self.sessions[session_id]['app_type'] == app_type:
+                    self._unregister(session_id)
+        return self.store.end_user_session_records(user_id, app_type, reason)
+
+    # ---------- 写库与到期 ----------
+
+    def flush(self) -> int:
+        """批量写入待写库的活跃时间，返回写入行数"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.dirty = self.dirty, {}
+            if not batch:
+                return 0
+            rows = [{'session_id': session_id, 'user_id': user_id,
+                     'last_seen_at': datetime.fromtimestamp(last_seen).replace(microsecond=0)}
+                    for session_id, (user_id, last_seen) in batch.items()]
+            written = 0
+            batch_size = self.config['batch_size']
+            for offset in range(0, len(rows), batch_size):
+                chunk = rows[offset:offset + batch_size]
+                try:
+                    written += self.store.bulk_touch_sessions(chunk)
+                except Exception as e:
+                    self.stats['flush_errors'] += 1
+                    logger.error(f"❌ 批量写入会话活跃时间失败（{len(chunk)}条，稍后重试）: {e}")
+                    with self.lock:
+                        for row in chunk:
+                            # 期间有新活动的以新数据为准
+                            self.dirty.setdefault(row['session_id'], batch[row['session_id']])
+            with self.lock:
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += written
+            return written
+
+    def expire(self, now: float = None) -> int:
+        """推进时间轮，结束空闲超时的会话，返回结束的会话数"""
+        now = time.time() if now is None else now
+        expired = []
+        with self.lock:
+            for session_id in self.wheel.advance(now):
+                entry = self.sessions.get(session_id)
+                if entry is None:
+                    continue
+                deadline = entry['last_seen'] + self.idle_timeout
+                if deadline > now:
+                    self.wheel.schedule(session_id, deadline)
+                    continue
+                self._unregister(session_id)
+                expired.append(session_id)
+            self.stats['expired'] += len(expired)
+        if not expired:
+            return 0
+        # 库中最近有活动的（其他进程仍在使用）不标记结束
+        idle_before = datetime.fromtimestamp(now - self.idle_timeout)
+        try:
+            self.store.expire_session_records(expired, idle_before)
+        except Exception as e:
+            logger.error(f"❌ 标记空闲会话结束失败: {e}")
+        return len(expired)
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """加载库中未结束且未超时的会话，启动后台线程（每个服务进程各一个）"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        try:
+            since = datetime.fromtimestamp(time.time() - self.idle_timeout)
+            records = self.store.load_session_records(since)
+            with self.lock:
+                for record in records:
+                    if record['session_id'] not in self.sessions:
+                        self._register(self._entry_from_record(record))
+            logger.info(f"📋 已加载活跃会话 {len(records)} 个")
+        except Exception as e:
+            logger.error(f"❌ 加载活跃会话失败: {e}")
+        self._thread = threading.Thread(target=self._run, name='session-registry', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.config['flush_interval']):
+            try:
+                # 先写入活跃时间，到期检查时库中的last_seen_at才是最新的
+                self.flush()
+                self.expire()
+            except Exception as e:
+                logger.error(f"❌ 会话注册表后台线程异常: {e}")
+
+    def stop(self):
+        """停止后台线程并写入剩余的活跃时间（关闭钩子）"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self.sessions)
+            stats['pending'] = len(self.dirty)
+        stats['running'] = self.running
+        return stats
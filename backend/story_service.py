@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+故事服务模块 - 阅读进度、故事交互、完成阅读等业务逻辑（Flask与ASGI路由共用）
+
+各函数返回 (响应数据, HTTP状态码)，由路由层负责序列化。
+"""
+from datetime import datetime
+from backend.logger_config import logger
+from database_manager import db_manager
+from backend.progress_buffer import progress_buffer, normalize_progress
+
+VALID_INTERACTION_TYPES = [
+    'app_open', 'app_close', 'audio_play', 'audio_pause',
+    'audio_stop', 'text_complete', 'audio_complete',
+    'view_details', 'first_scroll', 'complete_button_click',
+    'audio_play_click', 'audio_complete_button_click',
+    'text_complete_button_click'
+]
+
+VALID_COMPLETION_MODES = ['text', 'audio']
+
+# 30天循环的起始日期
+STORY_CYCLE_BASE_DATE = datetime(2025, 1, 1).date()
+
+
+def _get_valid_username(user_id: str):
+    """获取用户的username（禁止使用unknown），返回(username, 错误响应)"""
+    user_info = db_manager.get_user_by_id(user_id)
+    if not user_info:
+        logger.error(f"❌ 无法获取用户信息: user_id={user_id}")
+        return None, ({'error': '用户信息获取失败'}, 500)
+
+    username = user_info.get('username')
+    if not username or username == 'unknown':
+        logger.error(f"❌ 用户名无效: user_id={user_id}, username={username}")
+        return None, ({'error': '用户名无效，请重新登录'}, 500)
+    return username, None
+
+
+def update_reading_progress(data: dict):
+    """更新阅读进度"""
+    user_id = data.get('user_id')
+    story_id = data.get('story_id')
+    story_title = data.get('story_title', '')
+    current_position = data.get('current_position', 0)
+    total_length = data.get('total_length', 100)
+    device_info = data.get('device_info', '')
+
+    if not user_id or not story_id:
+        return {'error': '缺少必要参数'}, 400
+    try:
+        current_position, total_length = normalize_progress(current_position, total_length)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    # 验证用户身份
+    if not db_manager.user_exists(user_id):
+        return {'error': '用户身份验证失败'}, 401
+
+    username, error = _get_valid_username(user_id)
+    if error:
+        return error
+
+    # 写入缓冲，由后台线程合并后批量写库
+    success = progress_buffer.add(
+        user_id=user_id,
+        story_id=story_id,
+        story_title=story_title,
+        current_position=current_position,
+        total_length=total_length,
+        username=username,
+        device_info=device_info
+    )
+    if not success:
+        return {'error': '更新阅读进度失败'}, 500
+
+    # 计算进度百分比
+    progress_percentage = (
+        (current_position / total_length * 100)
+        if total_length > 0 else 0
+    )
+
+    # 获取故事的实际完成状态（经缓存，完成阅读时更新）
+    is_completed = db_manager.get_reading_completion(user_id, story_id)
+
+    return {
+        'success': True,
+        'progress_percentage': round(progress_percentage, 2),
+        'is_completed': is_completed,
+        'message': '阅读进度已更新'
+    }, 200
+
+
+def _merge_pending_progress(progress_list: list, pending: list) -> list:
+    """用尚未写库的最新位置覆盖数据库中的记录"""
+    if not pending:
+        return progress_list
+    by_story = {progress['story_id']: progress for progress in progress_list}
+    for entry in pending:
+        total_length = entry['total_length']
+        last_read_time = datetime.fromtimestamp(entry['timestamp']).replace(microsecond=0).isoformat()
+        progress = by_story.get(entry['story_id'])
+        if progress is None:
+            progress = {
+                'story_id': entry['story_id'],
+                'is_completed': False,
+                'start_time': last_read_time,
+                'completion_time': None
+            }
+            progress_list.append(progress)
+            by_story[entry['story_id']] = progress
+        progress.update({
+            'story_title': entry['story_title'],
+            'current_position': entry['current_position'],
+            'total_length': total_length,
+            'reading_progress': round(entry['current_position'] / total_length * 100, 2) if total_length > 0 else 0.0,
+            'last_read_time': last_read_time
+        })
+    progress_list.sort(key=lambda progress: progress['last_read_time'] or '', reverse=True)
+    return progress_list
+
+
+def get_reading_progress(user_id: str, story_id: str = None):
+    """获取阅读进度"""
+    if not user_id:
+        return {'error': '缺少用户ID'}, 400
+
+    if not db_manager.user_exists(user_id):
+        return {'error': '用户身份验证失败'}, 401
+
+    progress_list = _merge_pending_progress(
+        db_manager.get_reading_progress(user_id, story_id),
+        progress_buffer.get_pending(user_id, story_id)
+    )
+    return {
+        'success': True,
+        'progress': progress_list,
+        'count': len(progress_list)
+    }, 200
+
+
+def log_story_interaction(data: dict):
+    """记录故事交互"""
+    if (not data or 'user_id' not in data or
+            'story_id' not in data or 'interaction_type' not in data):
+        return {'error': '缺少必要参数'}, 400
+
+    user_id = data['user_id']
+    interaction_type = data['interaction_type']
+
+    if not db_manager.user_exists(user_id):
+        return {'error': '用户身份验证失败'}, 401
+
+    if interaction_type not in VALID_INTERACTION_TYPES:
+        return {'error': f'无效的交互类型，必须是: {VALID_INTERACTION_TYPES}'}, 400
+
+    success = db_manager.log_story_interaction(
+        user_id=user_id,
+        story_id=data['story_id'],
+        interaction_type=interaction_type,
+        interaction_data=data.get('interaction_data'),
+        device_info=data.get('device_info', '')
+    )
+    if not success:
+        return {'error': '记录交互失败'}, 500
+
+    return {'success': True, 'message': '交互记录成功'}, 200
+
+
+def complete_story_reading(data: dict):
+    """
+    完成故事阅读
+    重要：只能由用户点击完成按钮触发，不能自动调用
+    """
+    user_id = data.get('user_id')
+    story_id = data.get('story_id')
+    story_title = data.get('story_title', '')
+    completion_mode = data.get('completion_mode')
+    device_info = data.get('device_info', '')
+
+    if not user_id or not story_id or not completion_mode:
+        return {'error': '缺少必要参数'}, 400
+
+    if not db_manager.user_exists(user_id):
+        return {'error': '用户身份验证失败'}, 401
+
+    if completion_mode not in VALID_COMPLETION_MODES:
+        return {'error': f'无效的完成方式，必须是: {VALID_COMPLETION_MODES}'}, 400
+
+    username, error = _get_valid_username(user_id)
+    if error:
+        return error
+
+    # 先写入该故事待写入的进度，完成时按最新位置计算进度
+    progress_buffer.flush_story(user_id, story_id)
+
+    logger.info(
+        f"📖 收到完成阅读请求: user_id={user_id}, story_id={story_id}, "
+        f"completion_mode={completion_mode}, username={username}"
+    )
+    success = db_manager.complete_reading(
+        user_id=user_id,
+        story_id=story_id,
+        story_title=story_title,
+        completion_mode=completion_mode,
+        device_info=device_info,
+        username=username
+    )
+    if not success:
+        logger.error(f"❌ 完成阅读记录失败: user_id={user_id}, story_id={story_id}")
+        return {'error': '标记完成失败'}, 500
+
+    logger.info(f"✅ 完成阅读记录成功: user_id={user_id}, story_id={story_id}")
+    db_manager.log_story_interaction(
+        user_id=user_id,
+        story_id=story_id,
+        interaction_type='text_complete' if completion_mode == 'text' else 'audio_complete',
+        interaction_data={'completion_mode': completion_mode},
+        device_info=device_info
+    )
+    return {
+        'success': True,
+        'message': '故事阅读完成',
+        'completion_mode': completion_mode
+    }, 200
+
+
+def get_reading_statistics(user_id: str, days: int = 30):
+    """获取阅读统计"""
+    if not user_id:
+        return {'error': '缺少用户ID'}, 400
+
+    if not db_manager.user_exists(user_id):
+        return {'error': '用户身份验证失败'}, 401
+
+    statistics = db_manager.get_reading_statistics(user_id, days)
+    return {
+        'success': True,
+        'statistics': statistics,
+        'period_days': days
+    }, 200
+
+
+def get_today_story():
+    """获取今天的故事（30天循环）"""
+    all_stories = db_manager.get_all_stories(include_inactive=False)
+    if not all_stories:
+        return {'success': True, 'stories': [], 'total': 0}, 200
+
+    # 计算今天应该显示哪个故事
+    days_from_base = (datetime.now().date() - STORY_CYCLE_BASE_DATE).days
+    story_index = days_from_base % 30
+
+    sorted_stories = sorted(all_stories, key=lambda x: x.get('story_id', ''))
+    # 不足30个故事时循环使用
+    today_story = sorted_stories[story_index % len(sorted_stories)]
+
+    user_story = {
+        'id': today_story['story_id'],
+        'title': today_story['title'],
+        'content': today_story['content'],
+        'audio_file_path': today_story.get('audio_file_path'),
+        'audio_duration_seconds': today_story.get('audio_duration_seconds', 0)
+    }
+    logger.info(f"📖 返回今天的故事（30天循环，索引{story_index}）: {user_story['title']}")
+
+    return {'success': True, 'stories': [user_story], 'total': 1}, 200
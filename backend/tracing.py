@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+请求链路追踪模块 - 按请求记录数据库、上游HTTP、模型推理等阶段耗时
+
+每个请求在before_request中创建一个Trace并放入上下文变量，代码中用 span()/traced()
+标记阶段；没有活动Trace时（后台线程、脚本）span()直接返回空操作对象，开销可忽略。
+响应返回时写入Server-Timing头，请求（含流式响应）结束后慢请求进入环形缓冲区，
+可选以OTLP JSON格式逐行追加到文件。
+"""
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from contextvars import ContextVar
+from backend.logger_config import logger
+from backend.config import TRACING_CONFIG
+
+_current_trace = ContextVar('nexus_current_trace', default=None)
+
+# 慢请求环形缓冲区
+slow_traces = deque(maxlen=TRACING_CONFIG['ring_size'])
+slow_traces_lock = threading.Lock()
+_otlp_lock = threading.Lock()
+
+
+class Span:
+    """单个阶段"""
+    __slots__ = ('trace', 'name', 'attributes', 'span_id', 'parent_id', 'start', 'end', 'error')
+
+    def __init__(self, trace, name: str, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = None
+        self.start = 0.0
+        self.end = None
+        self.error = None
+
+    @property
+    def category(self) -> str:
+        """阶段类别（名称中第一个点之前的部分），用于Server-Timing汇总"""
+        return self.name.split('.', 1)[0]
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        trace = self.trace
+        self.parent_id = trace.stack[-1].span_id if trace.stack else trace.root_span_id
+        self.start = time.perf_counter()
+        trace.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        trace = self.trace
+        if trace.stack and trace.stack[-1] is self:
+            trace.stack.pop()
+        if len(trace.spans) < TRACING_CONFIG['max_spans']:
+            trace.spans.append(self)
+        else:
+            trace.dropped_spans += 1
+        return False
+
+
+class _NullSpan:
+    """没有活动Trace时使用的空操作span"""
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """一次请求的追踪记录"""
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = os.urandom(16).hex()
+        self.root_span_id = os.urandom(8).hex()
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status_code = None
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.headers_time = None
+        self.end = None
+        self.spans = []
+        self.stack = []
+        self.dropped_spans = 0
+
+    def category_durations(self) -> dict:
+        """按类别汇总耗时，只统计不在同类父阶段中的span，避免嵌套重复计算"""
+        by_id = {item.span_id: item for item in self.spans}
+        totals = {}
+        counts = {}
+        for item in self.spans:
+            parent = by_id.get(item.parent_id)
+            if parent is not None and parent.category == item.category:
+                continue
+            totals[item.category] = totals.get(item.category, 0.0) + item.duration
+            counts[item.category] = counts.get(item.category, 0) + 1
+        return {category: (totals[category], counts[category]) for category in totals}
+
+    def server_timing(self) -> str:
+        """生成Server-Timing响应头"""
+        parts = [
+            f'{category};dur={duration * 1000:.1f};desc="{count}"'
+            for category, (duration, count) in self.category_durations().items()
+        ]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ', '.join(parts)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self, include_spans: bool = True) -> dict:
+        result = {
+            'trace_id': self.trace_id,
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status_code': self.status_code,
+            'start_time': self.start_wall,
+            'duration_ms': round(self.duration * 1000, 2),
+            'headers_ms': round((self.headers_time - self.start) * 1000, 2) if self.headers_time else None,
+            'breakdown_ms': {
+                category: round(duration * 1000, 2)
+                for category, (duration, _) in self.category_durations().items()
+            },
+            'span_count': len(self.spans),
+            'dropped_spans': self.dropped_spans
+        }
+        if include_spans:
+            result['spans'] = [
+                {
+                    'span_id': item.span_id,
+                    'parent_id': item.parent_id,
+                    'name': item.name,
+                    'offset_ms': round((item.start - self.start) * 1000, 2),
+                    'duration_ms': round(item.duration * 1000, 2),
+                    'attributes': item.attributes,
+                    'error': item.error
+                }
+                for item in sorted(self.spans, key=lambda s: s.start)
+            ]
+        return result
+
+
+def span(name: str, **attributes):
+    """标记一个阶段：with span('db.user_exists'): ..."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, name, attributes)
+
+
+def span_for(trace, name: str, **attributes):
+    """在指定Trace上标记阶段，用于请求上下文已结束的流式生成器中"""
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, name, attributes)
+
+
+def traced(name: str = None):
+    """装饰器版本的span，名称默认为函数名"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(cls, category: str, exclude: tuple = ()):
+    """为类的全部公开方法加上span，名称为 <category>.<方法名>"""
+    for attr_name, attr in list(vars(cls).items()):
+        if attr_name.startswith('_') or attr_name in exclude or not callable(attr):
+            continue
+        setattr(cls, attr_name, traced(f"{category}.{attr_name}")(attr))
+    return cls
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def _otlp_record(trace: Trace) -> dict:
+    """转换为OTLP/JSON（ExportTraceServiceRequest）格式"""
+    start_ns = int(trace.start_wall * 1e9)
+
+    def to_ns(perf_time):
+        return start_ns + int((perf_time - trace.start) * 1e9)
+
+    def attributes(values: dict) -> list:
+        return [{'key': key, 'value': {'stringValue': str(value)}} for key, value in values.items()]
+
+    spans = [{
+        'traceId': trace.trace_id,
+        'spanId': trace.root_span_id,
+        'name': f"{trace.method} {trace.route or trace.path}",
+        'kind': 2,  # SERVER
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(to_ns(trace.end or time.perf_counter())),
+        'attributes': attributes({
+            'http.method': trace.method,
+            'http.target': trace.path,
+            'http.route': trace.route or '',
+            'http.status_code': trace.status_code
+        }),
+        'status': {'code': 2 if (trace.status_code or 0) >= 500 else 1}
+    }]
+    for item in trace.spans:
+        record = {
+            'traceId': trace.trace_id,
+            'spanId': item.span_id,
+            'parentSpanId': item.parent_id,
+            'name': item.name,
+            'kind': 3 if item.category == 'upstream' else 1,  # CLIENT / INTERNAL
+            'startTimeUnixNano': str(to_ns(item.start)),
+            'endTimeUnixNano': str(to_ns(item.end or item.start)),
+            'attributes': attributes(item.attributes),
+            'status': {'code': 2, 'message': item.error} if item.error else {'code': 1}
+        }
+        spans.append(record)
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': attributes({'service.name': TRACING_CONFIG['service_name']})},
+            'scopeSpans': [{'scope': {'name': 'backend.tracing'}, 'spans': spans}]
+        }]
+    }
+
+
+def _export_otlp(trace: Trace):
+    path = TRACING_CONFIG['otlp_file']
+    try:
+        line = json.dumps(_otlp_record(trace), ensure_ascii=False)
+        with _otlp_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except Exception as e:
+        logger.warning(f"⚠️ 写入OTLP追踪文件失败: {e}")
+
+
+def finish_trace(trace: Trace):
+    """请求完全结束（流式响应发送完毕）后调用"""
+    if trace.end is not None:
+        return
+    trace.end = time.perf_counter()
+    is_slow = trace.duration * 1000 >= TRACING_CONFIG['slow_threshold_ms']
+    if is_slow:
+        with slow_traces_lock:
+            slow_traces.append(trace)
+    if TRACING_CONFIG['otlp_file'] and (is_slow or TRACING_CONFIG['otlp_export_all']):
+        _export_otlp(trace)
+
+
+def get_slow_traces(limit: int = 50, min_ms: float = 0, path_prefix: str = None) -> list:
+    """按时间倒序列出慢请求摘要"""
+    with slow_traces_lock:
+        traces = list(slow_traces)
+    results = []
+    for trace in reversed(traces):
+        if trace.duration * 1000 < min_ms:
+            continue
+        if path_prefix and not trace.path.startswith(path_prefix):
+            continue
+        results.append(trace.to_dict(include_spans=False))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def get_slow_trace(trace_id: str):
+    with slow_traces_lock:
+        for trace in slow_traces:
+            if trace.trace_id == trace_id:
+                return trace.to_dict()
+    return None
+
+
+def init_app(app):
+    """注册请求钩子"""
+    if not TRACING_CONFIG['enabled']:
+        return
+    from flask import request
+
+    @app.before_request
+    def _start_trace():
+        trace = Trace(request.method, request.path)
+        request.environ['nexus.trace'] = trace
+        request.environ['nexus.trace_token'] = _current_trace.set(trace)
+
+    @app.after_request
+    def _finish_trace_headers(response):
+        current_request = request._get_current_object()
+        trace = current_request.environ.get('nexus.trace')
+        if trace is None:
+            return response
+        url_rule = current_request.url_rule
+        trace.route = url_rule.rule if url_rule else None
+        trace.status_code = response.status_code
+        trace.headers_time = time.perf_counter()
+        if TRACING_CONFIG['server_timing']:
+            response.headers['Server-Timing'] = trace.server_timing()
+        # 流式响应在发送完毕后才关闭，此时统计的是完整耗时
+        response.call_on_close(lambda: finish_trace(trace))
+        return response
+
+    @app.teardown_request
+    def _reset_trace(exc):
+        token = request.environ.pop('nexus.trace_token', None)
+        if token is not None:
+            try:
+                _current_trace.reset(token)
+            except ValueError:
+                # 令牌不属于当前上下文（例如在其他上下文中结束），忽略
+                pass
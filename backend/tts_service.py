@@ -9,7 +9,8 @@ import random
 import tempfile
 import concurrent.futures
 from backend.logger_config import logger
-from backend.config import TTS_CONFIG, DOLPHIN_MODEL_PATH
+from backend.config import TTS_CONFIG, DOLPHIN_MODEL_PATH, PROBE_CONFIG
+from backend.tracing import span
 
 # 导入edge-tts
 try:
@@ -22,8 +23,9 @@ except ImportError as e:
 
 # TTS缓存和并发控制
 tts_cache = {}
+tts_cache_stats = {'hits': 0, 'misses': 0}
 tts_concurrent_count = 0
-tts_last_health_check = 0
+tts_last_synthesis_test = None
 
 
 def cleanup_tts_cache():
@@ -42,22 +44,32 @@ def cleanup_tts_cache():
 
 
 def check_tts_health():
-    """检查TTS服务健康状态"""
-    global tts_last_health_check
-    current_time = time.time()
+    """检查TTS服务健康状态 - 读取后台探测结果，不在请求线程中合成语音"""
+    from backend.probe_service import is_probe_healthy
+    return EDGE_TTS_AVAILABLE and is_probe_healthy('tts')
 
-    # 如果距离上次检查时间太短，跳过
-    if current_time - tts_last_health_check < TTS_CONFIG.get('health_check_interval', 10):
-        return True
 
+def run_synthesis_test(force: bool = False) -> dict:
+    """实际合成一段测试音频，结果在PROBE_CONFIG['synthesis_cache_seconds']内复用"""
+    global tts_last_synthesis_test
+    now = time.time()
+    cached = tts_last_synthesis_test
+    if (not force and cached and
+            now - cached['checked_at'] < PROBE_CONFIG['synthesis_cache_seconds']):
+        return dict(cached, cached=True)
+
+    start_time = time.time()
+    result = {'checked_at': now, 'cached': False}
     try:
-        # 简单的健康检查 - 直接调用TTS函数
-        test_audio = generate_tts_audio("测试", "zh-CN-XiaoxiaoNeural")
-        tts_last_health_check = current_time
-        return len(test_audio) > 100
+        test_audio = run_async_tts("测试", "zh-CN-XiaoxiaoNeural")
+        result['success'] = len(test_audio) > 100
+        result['audio_bytes'] = len(test_audio)
     except Exception as e:
-        logger.warning(f"⚠️ TTS健康检查失败: {e}")
-        return False
+        result['success'] = False
+        result['error'] = str(e)
+    result['duration'] = time.time() - start_time
+    tts_last_synthesis_test = result
+    return result
 
 
 async def generate_tts_audio_async(text: str, voice: str = "zh-CN-XiaoxiaoNeural") -> bytes:
@@ -82,7 +94,9 @@ async def generate_tts_audio_async(text: str, voice: str = "zh-CN-XiaoxiaoNeural
         cache_key = f"{text}_{voice}"
         if TTS_CONFIG['cache_enabled'] and cache_key in tts_cache:
             logger.info("🎵 使用缓存音频")
+            tts_cache_stats['hits'] += 1
             return tts_cache[cache_key]
+        tts_cache_stats['misses'] += 1
 
         # 预处理文本
         processed_text = text.strip()
@@ -333,6 +347,30 @@ async def generate_tts_audio_async(text: str, voice: str = "zh-CN-XiaoxiaoNeural
         tts_concurrent_count = max(0, tts_concurrent_count - 1)
 
 
+def tts_empty_audio_response():
+    """音频为空时的错误响应 (payload, status)"""
+    return {
+        'success': False,
+        'error': 'TTS服务暂时不可用，可能是网络连接问题。请检查：\n1. 网络连接是否正常\n2. 是否可以访问Microsoft TTS服务\n3. 防火墙或代理设置',
+        'error_code': 'TTS_SERVICE_UNAVAILABLE'
+    }, 503
+
+
+def tts_exception_response(error_msg: str):
+    """TTS异常时的错误响应 (payload, status)"""
+    if "No audio was received" in error_msg or "NoAudioReceived" in error_msg:
+        return {
+            'success': False,
+            'error': 'TTS服务无法获取音频数据，可能是网络连接问题。请稍后重试或联系管理员检查网络设置。',
+            'error_code': 'TTS_NETWORK_ERROR'
+        }, 503
+    return {
+        'success': False,
+        'error': f'TTS服务错误: {error_msg}',
+        'error_code': 'TTS_ERROR'
+    }, 500
+
+
 def run_async_tts(text: str, voice: str) -> bytes:
     """在线程中运行异步TTS"""
     loop = None
@@ -377,7 +415,8 @@ def generate_tts_audio(text: str, voice: str = "zh-CN-XiaoxiaoNeural") -> bytes:
     """同步包装器 - 调用异步TTS生成"""
     try:
         # 在Flask的同步上下文中，使用线程池运行异步函数
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        with span('upstream.edge_tts', voice=voice, text_length=len(text)), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
             future = executor.submit(run_async_tts, text, voice)
             try:
                 timeout = TTS_CONFIG['timeout_total'] + 10
@@ -391,3 +430,12 @@ def generate_tts_audio(text: str, voice: str = "zh-CN-XiaoxiaoNeural") -> bytes:
         logger.error(f"❌ 同步TTS包装器错误详情: {traceback.format_exc()}")
         return b""
 
+
+async def synthesize_async(text: str, voice: str = "zh-CN-XiaoxiaoNeural") -> bytes:
+    """在已有事件循环中生成TTS音频（ASGI路由使用，不额外创建线程和事件循环）"""
+    timeout = TTS_CONFIG['timeout_total'] + 10
+    try:
+        return await asyncio.wait_for(generate_tts_audio_async(text, voice), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"❌ TTS生成超时（超过 {timeout} 秒）")
+        return b""
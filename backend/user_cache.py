@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+用户目录缓存模块 - 缓存按user_id（兼容username）查到的用户基本信息
+
+- 查到的用户缓存 positive_ttl 秒，查不到的键缓存 negative_ttl 秒（避免不存在的ID反复查库）
+- 同一个键并发未命中时只有一个线程查库，其他线程等待其结果
+- 创建用户、重置密码、启用/禁用用户后由DatabaseManager调用invalidate；多进程部署时其他进程依赖TTL过期
+"""
+import time
+import threading
+from collections import OrderedDict
+from backend.config import USER_CACHE_CONFIG
+
+_MISSING = object()
+
+
+class UserDirectoryCache:
+    """用户基本信息缓存（线程安全）"""
+
+    def __init__(self, loader, config: dict = None):
+        """loader(key) 返回用户字典或None，查库失败时抛出异常（失败结果不缓存）"""
+        self.config = config or USER_CACHE_CONFIG
+        self.loader = loader
+        self.entries = OrderedDict()   # 键 -> (过期时间, 用户字典或None)
+        self.inflight = {}             # 键 -> 正在查库的Event
+        self.lock = threading.Lock()
+        self.generation = 0            # 每次失效加一，查库期间发生失效时丢弃查到的结果
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+    def _get_cached(self, key: str, now: float):
+        """读取未过期的缓存（调用方持有锁），不存在时返回_MISSING"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, user = entry
+        if expires_at <= now:
+            del self.entries[key]
+            return _MISSING
+        self.entries.move_to_end(key)
+        return user
+
+    def _store(self, key: str, user, now: float):
+        """写入缓存并按LRU淘汰（调用方持有锁）"""
+        ttl = self.config['positive_ttl'] if user is not None else self.config['negative_ttl']
+        self.entries[key] = (now + ttl, user)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.config['max_entries']:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get(self, key: str):
+        """返回用户字典的副本，不存在时返回None"""
+        if not key:
+            return None
+        if not self.enabled:
+            user = self.loader(key)
+            return dict(user) if user else None
+
+        while True:
+            with self.lock:
+                user = self._get_cached(key, time.monotonic())
+                if user is not _MISSING:
+                    if user is None:
+                        self.stats['negative_hits'] += 1
+                        return None
+                    self.stats['hits'] += 1
+                    return dict(user)
+                waiter = self.inflight.get(key)
+                if waiter is None:
+                    waiter = threading.Event()
+                    self.inflight[key] = waiter
+                    generation = self.generation
+                    self.stats['misses'] += 1
+                    break
+            # 其他线程正在查同一个键，等待后重新读缓存（对方查库失败时由本线程重新查询）
+            waiter.wait(self.config['load_timeout'])
+
+        try:
+            user = self.loader(key)
+            with self.lock:
+                if generation == self.generation:
+                    self._store(key, user, time.monotonic())
+            return dict(user) if user else None
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            waiter.set()
+
+    def invalidate(self, *keys):
+        """删除指定键以及user_id/username与之相同的缓存（含负缓存）"""
+        targets = {key for key in keys if key}
+        with self.lock:
+            self.generation += 1
+            self.stats['invalidations'] += 1
+            for cache_key in list(self.entries):
+                user = self.entries[cache_key][1]
+                if cache_key in targets or (
+                        user is not None and (user['user_id'] in targets or user['username'] in targets)):
+                    del self.entries[cache_key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self.entries)
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['negative_hits']) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回填每日汇总表（interaction_daily_rollup、reading_daily_rollup）
+
+服务写入交互/阅读进度时会同步累加汇总表，上线前的历史数据需要执行一次本脚本。
+按天回填交互汇总（每天一条语句），取原始数据与已有汇总的较大值，可以重复执行，服务运行中也可以执行。
+interactions中已被过期清理删除的日期不会回填（已有的汇总保留）。
+
+用法:
+    python backfill_rollups.py                              # 回填interactions中全部日期
+    python backfill_rollups.py --since 2025-01-01 [--until 2025-03-31] [--sleep 0.1]
+    python backfill_rollups.py --days 7                     # 只回填最近7天
+"""
+import io
+import sys
+import argparse
+from datetime import date, timedelta
+import pymysql
+from database_config import DATABASE_CONFIG, CREATE_TABLES_SQL
+from backend.rollups import backfill
+
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为YYYY-MM-DD: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填每日汇总表')
+    parser.add_argument('--since', type=parse_date, help='开始日期（含），默认interactions中最早的日期')
+    parser.add_argument('--until', type=parse_date, help='结束日期（含），默认interactions中最晚的日期')
+    parser.add_argument('--days', type=int, help='只回填最近N天（含今天）')
+    parser.add_argument('--sleep', type=float, default=0.0, help='每天之间的间隔（秒），减轻对线上库的压力')
+    args = parser.parse_args()
+
+    since, until = args.since, args.until
+    if args.days:
+        until = date.today()
+        since = until - timedelta(days=args.days - 1)
+
+    config = DATABASE_CONFIG.copy()
+    config.update({
+        'autocommit': True,
+        'charset': 'utf8mb4',
+        'use_unicode': True,
+        'cursorclass': pymysql.cursors.DictCursor
+    })
+    connection = pymysql.connect(**config)
+    try:
+        with connection.cursor() as cursor:
+            for table in ('interaction_daily_rollup', 'reading_daily_rollup'):
+                cursor.execute(CREATE_TABLES_SQL[table])
+
+        def progress(day, rows):
+            print(f"  📅 {day}: {rows} 行")
+
+        print(f"🔄 开始回填: {since or '最早'} ~ {until or '最晚'}")
+        result = backfill(connection, since, until, args.sleep, progress)
+        print(f"✅ 回填完成: {result['days']} 天，交互汇总影响 {result['interaction_rows']} 行，"
+              f"阅读汇总影响 {result['reading_rows']} 行，耗时 {result['seconds']}s")
+        return 0
+    except Exception as e:
+        print(f"❌ 回填失败: {e}")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    # 设置标准输出为UTF-8编码（Windows兼容）
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASR性能基准脚本：用合成的16kHz语音片段测量不同音频时长、不同并发下的识别延迟和资源占用
+
+分别压测 transcribe_with_dolphin（direct）和 /api/transcribe 路由（route，Flask测试客户端），
+输出 p50/p95/p99 延迟、实时率、CPU利用率和峰值内存，结果写入JSON便于不同提交之间对比。
+完全离线运行；没有Dolphin模型权重时使用 --stub 以桩模型测量框架自身开销。
+
+用法:
+    python benchmark_asr.py [--stub] [--lengths 1,5,10] [--concurrency 1,2,4] [--iterations 8]
+                            [--targets direct,route] [--output bench.json] [--baseline old.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import wave
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import psutil
+
+# 设置标准输出编码为UTF-8（Windows兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from backend import asr_service
+from backend.asr_cache import asr_result_cache
+from compare_asr_modes import percentile
+
+SAMPLE_RATE = 16000
+
+
+def generate_clip(seconds: float, seed: int = 0):
+    """生成类语音的合成波形：带音节包络的谐波信号加少量噪声"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SAMPLE_RATE * seconds), dtype=np.float32) / SAMPLE_RATE
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    # 约每秒4个音节的开合包络
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None)
+    waveform = 0.3 * voiced * envelope + 0.005 * rng.standard_normal(t.shape)
+    return waveform.astype(np.float32)
+
+
+def write_wav(path: str, waveform):
+    """写入16kHz单声道PCM16 wav文件"""
+    pcm = (np.clip(waveform, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm.tobytes())
+
+
+class _StubResult:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubDolphinModel:
+    """桩模型：做一次与音频长度成正比的频谱计算，再按设定实时率等待，返回固定格式文本"""
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def __call__(self, waveform, lang_sym="zh", region_sym="CN"):
+        seconds = len(waveform) / SAMPLE_RATE
+        frames = np.lib.stride_tricks.sliding_window_view(waveform, 400)[::160]
+        np.abs(np.fft.rfft(frames * np.hanning(400), axis=1))
+        time.sleep(seconds * self.rtf)
+        return _StubResult(f"<zh><CN><asr><0.00>基准测试模拟结果<{seconds:.2f}>")
+
+
+class StubDolphinModule:
+    """桩Dolphin模块：只提供基准测试用到的load_audio"""
+
+    @staticmethod
+    def load_audio(path: str):
+        with wave.open(path, 'rb') as wav_file:
+            frames = wav_file.readframes(wav_file.getnframes())
+        return np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def setup_model(use_stub: bool, stub_rtf: float) -> str:
+    """准备识别模型，返回模型描述"""
+    if use_stub:
+        asr_service.dolphin = StubDolphinModule()
+        asr_service.DOLPHIN_AVAILABLE = True
+        asr_service.DOLPHIN_MODEL = StubDolphinModel(stub_rtf)
+        asr_service.dolphin_model_state['state'] = 'ready'
+        return f"stub(rtf={stub_rtf})"
+
+    asr_service.start_dolphin_model_loading(background=False)
+    if asr_service.DOLPHIN_MODEL is None:
+        raise RuntimeError("Dolphin模型不可用（缺少dolphin模块或模型权重），可使用 --stub 运行")
+    applied = asr_service.dolphin_optimization_status['applied']
+    return f"dolphin-small({', '.join(applied) or 'fp32'})"
+
+
+def create_test_client():
+    """只注册ASR路由的最小应用，避免依赖数据库"""
+    from flask import Flask
+    from backend.service_monitor import ServiceMonitor
+    from backend.routes import asr_routes
+
+    app = Flask(__name__)
+    asr_routes.register_asr_routes(app, ServiceMonitor())
+    return app.test_client()
+
+
+class ResourceSampler:
+    """后台采样进程CPU时间和峰值RSS"""
+
+    def __init__(self, interval: float = 0.05):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_rss = self.process.memory_info().rss
+        self._cpu_start = self.process.cpu_times()
+        self._wall_start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        cpu_end = self.process.cpu_times()
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = ((cpu_end.user - self._cpu_start.user) +
+                            (cpu_end.system - self._cpu_start.system))
+        return False
+
+
+def run_case(target: str, clip_path: str, waveform, concurrency: int,
+             iterations: int, client=None) -> dict:
+    """以指定并发执行iterations次识别，返回统计结果"""
+    audio_seconds = len(waveform) / SAMPLE_RATE
+    with open(clip_path, 'rb') as f:
+        audio_bytes = f.read()
+
+    def one_request(_):
+        start = time.perf_counter()
+        if target == 'direct':
+            text = asr_service.transcribe_with_dolphin(clip_path)
+            ok = bool(text) and text not in ("语音识别失败", "音频文件无法加载，请检查文件格式")
+        else:
+            response = client.post(
+                '/api/transcribe',
+                data={'audio': (io.BytesIO(audio_bytes), 'bench.wav')},
+                content_type='multipart/form-data'
+            )
+            ok = response.status_code == 200
+        return time.perf_counter() - start, ok
+
+    with ResourceSampler() as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one_request, range(iterations)))
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    cpu_count = psutil.cpu_count() or 1
+    return {
+        'target': target,
+        'audio_seconds': audio_seconds,
+        'concurrency': concurrency,
+        'iterations': iterations,
+        'errors': errors,
+        'latency': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies)
+        },
+        # 单请求实时率：平均处理耗时 / 音频时长
+        'real_time_factor': (sum(latencies) / len(latencies)) / audio_seconds,
+        'throughput_audio_seconds_per_second': audio_seconds * iterations / sampler.wall_seconds,
+        'wall_seconds': sampler.wall_seconds,
+        'cpu_percent': sampler.cpu_seconds / sampler.wall_seconds / cpu_count * 100,
+        'peak_rss_mb': sampler.peak_rss / 1024 / 1024
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare_with_baseline(results: list, baseline_file: str):
+    """与之前的基准结果对比p95延迟"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {
+        (r['target'], r['audio_seconds'], r['concurrency']): r
+        for r in baseline.get('results', [])
+    }
+    print(f"\n📊 与基线对比（{baseline.get('meta', {}).get('git_commit') or baseline_file}）:")
+    for result in results:
+        old = previous.get((result['target'], result['audio_seconds'], result['concurrency']))
+        if not old:
+            continue
+        ratio = result['latency']['p95'] / max(old['latency']['p95'], 1e-9)
+        marker = '⚠️' if ratio > 1.1 else '✅'
+        print(
+            f"  {marker} {result['target']:<6} {result['audio_seconds']:>5.1f}s x{result['concurrency']:<2} "
+            f"p95 {old['latency']['p95'] * 1000:.1f}ms -> {result['latency']['p95'] * 1000:.1f}ms ({ratio:.2f}x)"
+        )
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ASR延迟/吞吐基准测试')
+    parser.add_argument('--stub', action='store_true', help='使用桩模型（无需Dolphin模型权重）')
+    parser.add_argument('--stub-rtf', type=float, default=0.05, help='桩模型模拟的实时率')
+    parser.add_argument('--lengths', default='1,5,10,20', help='音频时长列表（秒）')
+    parser.add_argument('--concurrency', default='1,2,4', help='并发数列表')
+    parser.add_argument('--iterations', type=int, default=8, help='每组测试的请求数')
+    parser.add_argument('--targets', default='direct,route', help='压测对象: direct,route')
+    parser.add_argument('--with-cache', action='store_true', help='保留ASR结果缓存（默认关闭以测量真实推理）')
+    parser.add_argument('--output', help='结果JSON输出路径')
+    parser.add_argument('--baseline', help='用于对比的历史结果JSON')
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        asr_result_cache.config = dict(asr_result_cache.config, enabled=False)
+
+    model_description = setup_model(args.stub, args.stub_rtf)
+    print(f"🎤 模型: {model_description}")
+
+    targets = parse_list(args.targets, str)
+    client = create_test_client() if 'route' in targets else None
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for seconds in parse_list(args.lengths, float):
+            waveform = generate_clip(seconds, seed=int(seconds * 10))
+            clip_path = os.path.join(temp_dir, f"clip_{seconds:g}s.wav")
+            write_wav(clip_path, waveform)
+
+            # 每种时长先预热一次，不计入结果
+            asr_service.transcribe_with_dolphin(clip_path)
+
+            for target in targets:
+                for concurrency in parse_list(args.concurrency, int):
+                    result = run_case(target, clip_path, waveform, concurrency,
+                                      args.iterations, client)
+                    results.append(result)
+                    print(
+                        f"  {target:<6} {seconds:>5.1f}s x{concurrency:<2} "
+                        f"p50={result['latency']['p50'] * 1000:.1f}ms "
+                        f"p95={result['latency']['p95'] * 1000:.1f}ms "
+                        f"p99={result['latency']['p99'] * 1000:.1f}ms "
+                        f"RTF={result['real_time_factor']:.3f} "
+                        f"CPU={result['cpu_percent']:.0f}% "
+                        f"RSS={result['peak_rss_mb']:.0f}MB"
+                        + (f" ❌错误{result['errors']}" if result['errors'] else "")
+                    )
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': get_git_commit(),
+            'model': model_description,
+            'cache_enabled': args.with_cache,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': psutil.cpu_count()
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 结果已写入: {args.output}")
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
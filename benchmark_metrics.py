@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标埋点开销自测脚本：验证每个请求的监控开销保持在微秒级
+
+测量三项：
+1. Prometheus计数器+直方图的单次记录耗时（单线程与多线程）
+2. ServiceMonitor.record_endpoint（滑动窗口直方图+Prometheus指标）的单次耗时
+3. 请求钩子（before_request + after_request，含记录）的单次耗时，作为单请求开销判定依据
+4. Flask空接口在注册/不注册监控钩子时的单请求耗时差（受调度抖动影响较大，仅供参考）
+
+用法:
+    python benchmark_metrics.py [--iterations 200000] [--threads 8] [--max-overhead-us 20]
+"""
+import sys
+import time
+import argparse
+import threading
+
+# 设置标准输出编码为UTF-8（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from backend.prometheus_metrics import REGISTRY, HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
+
+def time_per_call(func, iterations: int, threads: int = 1) -> float:
+    """返回每次调用的平均耗时（微秒），多线程时为总耗时/总调用数"""
+    per_thread = iterations // threads
+
+    def worker():
+        for i in range(per_thread):
+            func(i)
+
+    # 单线程时在当前线程运行（保留请求上下文）
+    if threads == 1:
+        start = time.perf_counter()
+        worker()
+        return (time.perf_counter() - start) / per_thread * 1e6
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def bench_prometheus(iterations: int, threads: int) -> dict:
+    routes = [f"/api/bench/{n}" for n in range(8)]
+
+    def record(i):
+        route = routes[i & 7]
+        HTTP_REQUESTS.labels('GET', route, 200).inc()
+        HTTP_REQUEST_DURATION.labels('GET', route).observe(0.012)
+
+    return {
+        'single_thread_us': time_per_call(record, iterations),
+        f'{threads}_threads_us': time_per_call(record, iterations, threads)
+    }
+
+
+def bench_monitor(iterations: int, threads: int) -> dict:
+    from backend.service_monitor import ServiceMonitor
+    monitor = ServiceMonitor()
+    routes = [f"/api/bench/{n}" for n in range(8)]
+
+    def record(i):
+        monitor.record_endpoint('GET', routes[i & 7], 0.012, 200)
+
+    return {
+        'single_thread_us': time_per_call(record, iterations),
+        f'{threads}_threads_us': time_per_call(record, iterations, threads)
+    }
+
+
+def bench_hooks(iterations: int) -> float:
+    """在请求上下文中直接调用监控钩子，返回每个请求的钩子耗时（微秒）"""
+    from flask import Flask, request
+    from backend.service_monitor import ServiceMonitor
+
+    app = Flask(__name__)
+
+    @app.route('/api/bench/<int:item_id>')
+    def bench(item_id):
+        return 'ok'
+
+    ServiceMonitor().init_app(app)
+    before_hook = app.before_request_funcs[None][0]
+    after_hook = app.after_request_funcs[None][0]
+    response = app.response_class('ok')
+
+    with app.test_request_context('/api/bench/1'):
+        request.url_rule = app.url_map.bind('localhost').match('/api/bench/1', return_rule=True)[0]
+
+        def one_request(_):
+            before_hook()
+            after_hook(response)
+
+        return time_per_call(one_request, iterations)
+
+
+def bench_flask(iterations: int) -> dict:
+    from flask import Flask
+    from backend.service_monitor import ServiceMonitor
+
+    def build_app(instrumented: bool):
+        app = Flask(__name__)
+
+        @app.route('/api/bench/<int:item_id>')
+        def bench(item_id):
+            return 'ok'
+
+        if instrumented:
+            ServiceMonitor().init_app(app)
+        return app.test_client()
+
+    clients = {'plain': build_app(False), 'instrumented': build_app(True)}
+    results = {'plain_us': float('inf'), 'instrumented_us': float('inf')}
+    # 交替运行多轮取最小值，降低调度抖动的影响
+    for _ in range(3):
+        for label, client in clients.items():
+            elapsed = time_per_call(lambda i: client.get(f'/api/bench/{i & 7}'), iterations)
+            results[f'{label}_us'] = min(results[f'{label}_us'], elapsed)
+    results['overhead_us'] = results['instrumented_us'] - results['plain_us']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='指标埋点开销自测')
+    parser.add_argument('--iterations', type=int, default=200000, help='埋点调用次数')
+    parser.add_argument('--requests', type=int, default=5000, help='Flask请求次数')
+    parser.add_argument('--threads', type=int, default=8, help='多线程测试的线程数')
+    parser.add_argument('--max-overhead-us', type=float, default=20.0,
+                        help='单请求埋点开销上限（微秒），超过则返回非零退出码')
+    args = parser.parse_args()
+
+    prometheus = bench_prometheus(args.iterations, args.threads)
+    print(f"📈 Prometheus计数器+直方图: {', '.join(f'{k}={v:.2f}' for k, v in prometheus.items())}")
+
+    monitor = bench_monitor(args.iterations, args.threads)
+    print(f"📊 record_endpoint: {', '.join(f'{k}={v:.2f}' for k, v in monitor.items())}")
+
+    hooks_us = bench_hooks(args.iterations // 4)
+    print(f"🪝 请求钩子: {hooks_us:.2f}us/请求")
+
+    flask_results = bench_flask(args.requests)
+    print(f"🌐 Flask请求（参考）: {', '.join(f'{k}={v:.2f}' for k, v in flask_results.items())}")
+
+    start = time.perf_counter()
+    body = REGISTRY.render()
+    print(f"📝 渲染/metrics: {(time.perf_counter() - start) * 1000:.2f}ms, {len(body)} 字节")
+
+    overhead = hooks_us
+    if overhead > args.max_overhead_us:
+        print(f"❌ 单请求埋点开销 {overhead:.2f}us 超过上限 {args.max_overhead_us}us")
+        return 1
+    print(f"✅ 单请求埋点开销 {overhead:.2f}us，在上限 {args.max_overhead_us}us 以内")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务模式压测脚本：对比开发服务器（python app.py）与生产服务（python serve.py）
+
+依次以子进程启动两种模式，在不同并发下对指定接口持续发送GET请求，
+输出吞吐（rps）、p50/p99延迟、错误数，以及收到关闭信号后进程退出的耗时（优雅关闭）。
+需要数据库等依赖可正常导入；接口默认选择不访问上游服务的轻量接口。
+
+用法:
+    python benchmark_server.py [--modes dev,prod] [--paths /api/health,/api/tts/status]
+                               [--concurrency 1,8,32] [--duration 10] [--output server_bench.json]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from datetime import datetime
+
+# 设置标准输出编码为UTF-8（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from compare_asr_modes import percentile
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+MODE_COMMANDS = {
+    'dev': ['app.py'],
+    'prod': ['serve.py']
+}
+
+
+def start_server(mode: str, port: int, extra_args: list) -> subprocess.Popen:
+    env = dict(os.environ, SERVER_PORT=str(port), PYTHONIOENCODING='utf-8')
+    command = [sys.executable] + MODE_COMMANDS[mode]
+    if mode == 'prod':
+        command += extra_args
+    kwargs = {}
+    if sys.platform == 'win32':
+        # 独立进程组，便于发送CTRL_BREAK_EVENT触发优雅关闭
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    return subprocess.Popen(command, cwd=PROJECT_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop_server(process: subprocess.Popen, timeout: float = 60) -> float:
+    """发送关闭信号，返回进程退出耗时（秒），超时则强制结束并返回None"""
+    start = time.perf_counter()
+    if sys.platform == 'win32':
+        process.send_signal(signal.CTRL_BREAK_EVENT)
+    else:
+        process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=timeout)
+        return time.perf_counter() - start
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        return None
+
+
+def run_load(base_url: str, paths: list, concurrency: int, duration: float) -> dict:
+    """concurrency个线程持续请求duration秒"""
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(worker_index: int):
+        local_latencies = []
+        local_errors = {}
+        index = worker_index
+        while time.perf_counter() < stop_at:
+            path = paths[index % len(paths)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"{base_url}{path}", timeout=30) as response:
+                    response.read()
+                local_latencies.append(time.perf_counter() - start)
+            except urllib.error.HTTPError as e:
+                local_errors[str(e.code)] = local_errors.get(str(e.code), 0) + 1
+            except Exception as e:
+                local_errors[type(e).__name__] = local_errors.get(type(e).__name__, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for key, count in local_errors.items():
+                errors[key] = errors.get(key, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='开发服务器与生产服务压测对比')
+    parser.add_argument('--modes', default='dev,prod', help='压测的模式，逗号分隔（dev/prod）')
+    parser.add_argument('--paths', default='/api/health,/api/tts/status,/api/asr/status',
+                        help='请求的接口，逗号分隔，按顺序轮流请求')
+    parser.add_argument('--concurrency', default='1,8,32', help='并发数列表')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别的压测时长（秒）')
+    parser.add_argument('--port', type=int, default=5055, help='压测使用的端口')
+    parser.add_argument('--startup-timeout', type=float, default=120, help='等待服务就绪的最长时间（秒）')
+    parser.add_argument('--serve-args', default='', help='传给serve.py的额外参数，如 "--threads 64"')
+    parser.add_argument('--output', help='结果写入JSON文件')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'paths': paths,
+        'duration': args.duration,
+        'results': {}
+    }
+
+    for mode in modes:
+        print(f"🚀 启动 {mode} 模式...")
+        process = start_server(mode, args.port, args.serve_args.split())
+        if not wait_until_ready(base_url, process, args.startup_timeout):
+            print(f"❌ {mode} 模式未能在 {args.startup_timeout:.0f}s 内就绪")
+            if process.poll() is None:
+                stop_server(process, timeout=10)
+            return 1
+
+        mode_results = []
+        try:
+            for concurrency in levels:
+                result = run_load(base_url, paths, concurrency, args.duration)
+                mode_results.append(result)
+                print(
+                    f"   并发 {concurrency:>3}: {result['rps']:>8.1f} rps, "
+                    f"p50 {result['p50_ms']:.2f}ms, p99 {result['p99_ms']:.2f}ms, "
+                    f"错误 {sum(result['errors'].values())}"
+                )
+        finally:
+            shutdown_seconds = stop_server(process)
+        shutdown_text = f"{shutdown_seconds:.1f}s" if shutdown_seconds is not None else '超时，已强制结束'
+        print(f"   ⏹️ 关闭耗时: {shutdown_text}")
+        report['results'][mode] = {'levels': mode_results, 'shutdown_seconds': shutdown_seconds}
+
+    if len(report['results']) == 2:
+        print("\n📊 对比（prod相对dev）:")
+        for dev_result, prod_result in zip(report['results']['dev']['levels'],
+                                           report['results']['prod']['levels']):
+            ratio = prod_result['rps'] / dev_result['rps'] if dev_result['rps'] else 0
+            print(
+                f"   并发 {dev_result['concurrency']:>3}: 吞吐 x{ratio:.2f}, "
+                f"p99 {dev_result['p99_ms']:.2f}ms → {prod_result['p99_ms']:.2f}ms"
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+interactions热点查询的执行计划检查：对每条查询执行EXPLAIN，出现全表扫描、没有用到预期的索引、
+或者不允许的filesort时返回非0退出码，可以放在CI或部署前执行
+
+默认在MySQL/MariaDB上新建临时库（nexus_plan_check），按CREATE_TABLES_SQL建表并写入模拟数据、
+ANALYZE后检查，结束时删除临时库；--use-existing 则只读地检查配置中的数据库（验证迁移结果）。
+检查的SQL从backend/queries.py导入，与database_manager.py实际执行的查询是同一份。
+
+本地起一个MySQL容器即可运行：
+    docker run -d --name nexus-mysql -e MYSQL_ROOT_PASSWORD=root -p 3306:3306 mysql:8.0
+
+用法:
+    python check_query_plans.py [--host 127.0.0.1] [--port 3306] [--user root] [--password root]
+                                [--database nexus_plan_check] [--users 200] [--rows-per-user 100] [--keep]
+    python check_query_plans.py --use-existing
+"""
+import io
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+import pymysql
+from database_config import DATABASE_CONFIG, CREATE_TABLES_SQL
+from backend.rollups import backfill
+from backend.config import CONVERSATION_CACHE_CONFIG
+from backend.queries import (DAILY_INTERACTIONS_SQL, USER_CONVERSATIONS_SQL, user_interactions_query,
+                             session_interactions_query, interaction_stats_queries)
+
+# 模拟数据使用的用户ID前缀
+USER_PREFIX = 'plan_user_'
+
+# (名称, 对应方法, 构造 (SQL, 参数) 的函数, {检查的表: (可接受的索引, 是否允许filesort)})
+# SQL取自backend/queries.py，与database_manager.py执行的是同一份；EXPLAIN中表名为别名时按别名检查
+HOT_QUERIES = [
+    (
+        '用户交互记录（第一页）', 'get_user_interactions',
+        lambda s: user_interactions_query(s['user_id'], 50, 0),
+        {'interactions': (('idx_user_time',), False)}
+    ),
+    (
+        '用户交互记录（游标翻页）', 'get_user_interactions',
+        lambda s: user_interactions_query(s['user_id'], 50, 0, [s['middle_time'], s['middle_id']]),
+        {'interactions': (('idx_user_time',), False)}
+    ),
+    (
+        '会话交互记录', 'get_session_interactions',
+        lambda s: session_interactions_query(s['session_id'], 100, 0),
+        {'interactions': (('idx_session_time',), False)}
+    ),
+    (
+        '会话交互记录（游标翻页）', 'get_session_interactions',
+        lambda s: session_interactions_query(s['session_id'], 100, 0, [s['middle_time'], s['middle_id']]),
+        {'interactions': (('idx_session_time',), False)}
+    ),
+    (
+        '当天交互汇总', '_update_daily_interaction_progress',
+        lambda s: (DAILY_INTERACTIONS_SQL, (s['user_id'], s['day'], s['day'] + timedelta(days=1))),
+        {'interactions': (('idx_user_time',), False)}
+    ),
+    (
+        '用户交互统计（按类型）', 'get_interaction_stats',
+        lambda s: _stats_query(s, 0),
+        {'interaction_daily_rollup': (('PRIMARY',), True)}
+    ),
+    (
+        '用户交互统计（总计）', 'get_interaction_stats',
+        lambda s: _stats_query(s, 1),
+        {'interaction_daily_rollup': (('PRIMARY',), True)}
+    ),
+    (
+        '对话列表', 'get_user_conversations',
+        lambda s: (USER_CONVERSATIONS_SQL, (CONVERSATION_CACHE_CONFIG['preview_length'],
+                                            CONVERSATION_CACHE_CONFIG['preview_length'], s['user_id'], 50, 0)),
+        # 内层按会话分组（按last_id排序需要filesort），外层按主键取最后一条交互
+        {'interactions': (('idx_user_session_time',), True), 'i': (('PRIMARY',), False)}
+    ),
+]
+
+
+def _stats_query(values, index: int):
+    by_type_sql, total_sql, params = interaction_stats_queries(values['user_id'], 30)
+    return (by_type_sql, total_sql)[index], params
+
+
+def connect(args, database=None):
+    config = DATABASE_CONFIG.copy()
+    for key in ('host', 'port', 'user', 'password'):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    config.pop('database', None)
+    if database:
+        config['database'] = database
+    config.update({
+        'autocommit': True,
+        'charset': 'utf8mb4',
+        'use_unicode': True,
+        'cursorclass': pymysql.cursors.DictCursor
+    })
+    return pymysql.connect(**config)
+
+
+def seed(connection, users: int, rows_per_user: int):
+    """建表并写入模拟数据：每个用户10个会话，交互时间分布在最近60天，并回填每日汇总"""
+    now = datetime.now().replace(microsecond=0)
+    types = ['text', 'voice_home', 'voice_call', 'tts_play']
+    with connection.cursor() as cursor:
+        for sql in CREATE_TABLES_SQL.values():
+            cursor.execute(sql)
+        cursor.executemany(
+            "INSERT INTO users (user_id, username, password_hash) VALUES (%s, %s, %s)",
+            [(f"{USER_PREFIX}{i}", f"plan{i}", 'x') for i in range(users)]
+        )
+        rows = []
+        for i in range(users):
+            user_id = f"{USER_PREFIX}{i}"
+            for j in range(rows_per_user):
+                timestamp = now - timedelta(minutes=random.randint(0, 60 * 24 * 60))
+                rows.append((user_id, f"plan{i}", random.choice(types), 'content', 'response', timestamp,
+                             f"plan-session-{i}-{j % 10}", random.randint(1, 60), 1))
+                if len(rows) >= 1000:
+                    _insert_interactions(cursor, rows)
+                    rows = []
+        if rows:
+            _insert_interactions(cursor, rows)
+    backfill(connection)
+    with connection.cursor() as cursor:
+        for table in ('users', 'interactions', 'interaction_daily_rollup'):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+
+
+def _insert_interactions(cursor, rows):
+    cursor.executemany("""
+    INSERT INTO interactions
+        (user_id, username, interaction_type, content, response, timestamp, session_id, duration_seconds, success)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, rows)
+
+
+def sample_values(connection) -> dict:
+    """取交互最多的用户及其会话作为查询参数"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        SELECT user_id, COUNT(*) AS count FROM interactions
+        GROUP BY user_id ORDER BY count DESC LIMIT 1
+        """)
+        top = cursor.fetchone()
+        if not top:
+            raise RuntimeError('interactions表为空，无法检查执行计划（去掉--use-existing使用模拟数据）')
+        cursor.execute("""
+        SELECT id, timestamp, session_id FROM interactions
+        WHERE user_id = %s AND session_id IS NOT NULL
+        ORDER BY timestamp DESC, id DESC LIMIT %s, 1
+        """, (top['user_id'], top['count'] // 2))
+        middle = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) AS count FROM interactions")
+        total = cursor.fetchone()['count']
+    return {
+        'user_id': top['user_id'],
+        'session_id': middle['session_id'],
+        'middle_time': middle['timestamp'],
+        'middle_id': middle['id'],
+        'day': middle['timestamp'].replace(hour=0, minute=0, second=0),
+        'total': total
+    }
+
+
+def check_query(cursor, sql, params, checks: dict) -> list:
+    """返回该查询的问题列表，为空表示通过；checks为 {表名或别名: (可接受的索引, 是否允许filesort)}"""
+    cursor.execute("EXPLAIN " + sql, params)
+    plan = cursor.fetchall()
+    problems = []
+    for table, (keys, allow_filesort) in checks.items():
+        rows = [row for row in plan if row['table'] == table]
+        if not rows:
+            problems.append(f"执行计划中没有表 {table}")
+            continue
+        for row in rows:
+            extra = row.get('Extra') or ''
+            if row['type'] == 'ALL':
+                problems.append(f'{table} 全表扫描(type=ALL)')
+            elif row['type'] == 'index':
+                problems.append(f'{table} 全索引扫描(type=index)')
+            if row['key'] not in keys:
+                problems.append(f"{table} 使用的索引为 {row['key']}，预期 {'/'.join(keys)}")
+            if not allow_filesort and 'Using filesort' in extra:
+                problems.append(f'{table} 出现filesort')
+    return problems
+
+
+def print_plan(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    for row in cursor.fetchall():
+        print(f"      table={row['table']} type={row['type']} key={row['key']} "
+              f"rows={row['rows']} extra={row.get('Extra') or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='interactions热点查询执行计划检查')
+    parser.add_argument('--host', help='默认使用database_config中的配置')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--database', default='nexus_plan_check', help='临时库名（检查结束后删除）')
+    parser.add_argument('--users', type=int, default=200, help='模拟用户数')
+    parser.add_argument('--rows-per-user', type=int, default=100, help='每个用户的模拟交互数')
+    parser.add_argument('--keep', action='store_true', help='保留临时库')
+    parser.add_argument('--use-existing', action='store_true', help='只读检查database_config中的数据库，不写入模拟数据')
+    args = parser.parse_args()
+
+    if args.use_existing:
+        database = DATABASE_CONFIG['database']
+    else:
+        database = args.database
+        if database == DATABASE_CONFIG['database']:
+            print(f"❌ 临时库不能与业务库同名: {database}")
+            return 2
+
+    created = False
+    try:
+        if not args.use_existing:
+            server = connect(args)
+            with server.cursor() as cursor:
+                cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+                cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            server.close()
+            created = True
+            connection = connect(args, database)
+            start_time = time.time()
+            seed(connection, args.users, args.rows_per_user)
+            print(f"📦 已写入模拟数据: 用户 {args.users} 个，交互 {args.users * args.rows_per_user} 条，"
+                  f"耗时 {time.time() - start_time:.1f}s")
+        else:
+            connection = connect(args, database)
+
+        values = sample_values(connection)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT VERSION() AS version")
+            print(f"🗄️ 数据库: {database}（{cursor.fetchone()['version']}），interactions {values['total']} 行")
+        if values['total'] < 1000:
+            print("⚠️ 数据量太少时优化器可能直接选择全表扫描，检查结果仅供参考")
+
+        failures = 0
+        with connection.cursor() as cursor:
+            for name, method, build_query, checks in HOT_QUERIES:
+                sql, params = build_query(values)
+                problems = check_query(cursor, sql, params, checks)
+                if problems:
+                    failures += 1
+                    print(f"❌ {name}（{method}）: {'；'.join(problems)}")
+                    print_plan(cursor, sql, params)
+                else:
+                    print(f"✅ {name}（{method}）")
+        connection.close()
+
+        if failures:
+            print(f"\n❌ {failures}/{len(HOT_QUERIES)} 条查询的执行计划不符合预期")
+            return 1
+        print(f"\n✅ 全部 {len(HOT_QUERIES)} 条查询都走了预期的索引")
+        return 0
+    except Exception as e:
+        print(f"❌ 检查失败: {e}")
+        return 2
+    finally:
+        if created and not args.keep:
+            try:
+                server = connect(args)
+                with server.cursor() as cursor:
+                    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+                server.close()
+            except Exception as e:
+                print(f"⚠️ 删除临时库失败: {e}")
+
+
+if __name__ == '__main__':
+    # 设置标准输出为UTF-8编码（Windows兼容）
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
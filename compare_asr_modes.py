@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dolphin推理模式对比脚本：在固定本地语料上比较fp32基线与优化模式的准确率和延迟
+
+语料目录（默认 asr_corpus/）放置16kHz wav文件，可选 transcripts.json 提供参考文本：
+    {"clip_001.wav": "今天天气怎么样", ...}
+没有参考文本时以基线模式的输出作为参考，只衡量优化模式相对基线的偏差。
+
+用法:
+    python compare_asr_modes.py [--corpus asr_corpus] [--max-cer-delta 0.01] [--output result.json]
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import unicodedata
+
+# 设置标准输出编码为UTF-8（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from backend.config import ASR_CORPUS_DIR, DOLPHIN_OPTIMIZE_CONFIG
+from backend import asr_service
+
+
+def normalize_text(text: str) -> str:
+    """去除标点和空白，便于按字计算错误率"""
+    return "".join(
+        ch for ch in (text or "")
+        if not unicodedata.category(ch).startswith(('P', 'Z', 'C'))
+    )
+
+
+def edit_distance(ref: str, hyp: str) -> int:
+    """字符级编辑距离"""
+    previous = list(range(len(hyp) + 1))
+    for i, ref_char in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_char in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != hyp_char)
+            )
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(references: list, hypotheses: list) -> float:
+    """字错误率（中文场景下的WER）"""
+    errors = 0
+    total = 0
+    for ref, hyp in zip(references, hypotheses):
+        ref, hyp = normalize_text(ref), normalize_text(hyp)
+        errors += edit_distance(ref, hyp)
+        total += len(ref)
+    return errors / max(total, 1)
+
+
+def percentile(values: list, pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_corpus(corpus_dir: str):
+    """加载语料：返回[(文件名, 波形)]和参考文本字典"""
+    if not os.path.isdir(corpus_dir):
+        raise FileNotFoundError(f"语料目录不存在: {corpus_dir}")
+
+    clips = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.lower().endswith('.wav'):
+            waveform = asr_service.load_waveform(os.path.join(corpus_dir, name))
+            clips.append((name, waveform))
+
+    references = {}
+    transcripts_file = os.path.join(corpus_dir, 'transcripts.json')
+    if os.path.exists(transcripts_file):
+        with open(transcripts_file, 'r', encoding='utf-8') as f:
+            references = json.load(f)
+    return clips, references
+
+
+def run_mode(model, clips: list, inference_mode: bool, sample_rate: int = 16000) -> dict:
+    """在全部语料上运行一次模型，第一条语料先预热一次不计时"""
+    if clips:
+        asr_service.transcribe_waveform(clips[0][1], model=model, inference_mode=inference_mode)
+
+    outputs = {}
+    latencies = []
+    audio_seconds = 0.0
+    for name, waveform in clips:
+        start = time.perf_counter()
+        outputs[name] = asr_service.transcribe_waveform(
+            waveform, model=model, inference_mode=inference_mode
+        )
+        latencies.append(time.perf_counter() - start)
+        audio_seconds += len(waveform) / sample_rate
+
+    total_latency = sum(latencies)
+    return {
+        'outputs': outputs,
+        'latency': {
+            'total': total_latency,
+            'mean': total_latency / max(len(latencies), 1),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'max': max(latencies) if latencies else 0.0
+        },
+        'real_time_factor': total_latency / max(audio_seconds, 1e-9)
+    }
+
+
+def compare(corpus_dir: str, max_cer_delta: float) -> dict:
+    """对比基线与优化模式，返回结果字典"""
+    if not asr_service.import_dolphin():
+        raise RuntimeError("Dolphin模块不可用，无法进行对比")
+
+    clips, references = load_corpus(corpus_dir)
+    if not clips:
+        raise RuntimeError(f"语料目录中没有wav文件: {corpus_dir}")
+    print(f"📂 语料: {len(clips)} 条, 参考文本: {len(references)} 条")
+
+    # 先跑基线：优化模式会修改全局线程配置
+    print("🔄 加载fp32基线模型...")
+    baseline_model, _ = asr_service.load_dolphin_model(optimize=False)
+    baseline = run_mode(baseline_model, clips, inference_mode=False)
+    del baseline_model
+
+    print("🔄 加载优化模型...")
+    optimized_model, applied = asr_service.load_dolphin_model(optimize=True)
+    optimized = run_mode(
+        optimized_model, clips,
+        inference_mode=DOLPHIN_OPTIMIZE_CONFIG['inference_mode']
+    )
+
+    names = [name for name, _ in clips]
+    if references:
+        refs = [references.get(name, baseline['outputs'][name]) for name in names]
+        reference_source = 'transcripts'
+    else:
+        refs = [baseline['outputs'][name] for name in names]
+        reference_source = 'baseline'
+
+    baseline['cer'] = character_error_rate(refs, [baseline['outputs'][n] for n in names])
+    optimized['cer'] = character_error_rate(refs, [optimized['outputs'][n] for n in names])
+    cer_delta = optimized['cer'] - baseline['cer']
+
+    return {
+        'corpus_dir': corpus_dir,
+        'clip_count': len(clips),
+        'reference_source': reference_source,
+        'optimizations': applied,
+        'options': DOLPHIN_OPTIMIZE_CONFIG,
+        'baseline': baseline,
+        'optimized': optimized,
+        'cer_delta': cer_delta,
+        'speedup': baseline['latency']['total'] / max(optimized['latency']['total'], 1e-9),
+        'max_cer_delta': max_cer_delta,
+        'acceptable': cer_delta <= max_cer_delta
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dolphin推理模式准确率/延迟对比')
+    parser.add_argument('--corpus', default=ASR_CORPUS_DIR, help='语料目录')
+    parser.add_argument('--max-cer-delta', type=float, default=0.01,
+                        help='可接受的字错误率增量（默认0.01，即1个百分点）')
+    parser.add_argument('--output', help='结果JSON输出路径')
+    args = parser.parse_args()
+
+    result = compare(args.corpus, args.max_cer_delta)
+
+    print(f"\n⚡ 生效的优化: {', '.join(result['optimizations']) or '无'}")
+    for mode in ('baseline', 'optimized'):
+        stats = result[mode]
+        print(
+            f"  {mode:<10} CER={stats['cer']:.4f}  "
+            f"mean={stats['latency']['mean'] * 1000:.1f}ms  "
+            f"p95={stats['latency']['p95'] * 1000:.1f}ms  "
+            f"RTF={stats['real_time_factor']:.3f}"
+        )
+    print(f"  CER增量: {result['cer_delta']:+.4f}  加速比: {result['speedup']:.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+        print(f"📝 结果已写入: {args.output}")
+
+    if result['acceptable']:
+        print("✅ 准确率损失在可接受范围内，可设置 DOLPHIN_OPTIMIZED=1 启用优化模式")
+        return 0
+    print("❌ 准确率损失超出阈值，不建议启用优化模式")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
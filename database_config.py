@@ -54,15 +54,35 @@ CREATE_TABLES_SQL = {
         duration_seconds INT NULL COMMENT '交互持续时间（秒）',
         success BOOLEAN DEFAULT TRUE COMMENT '是否成功',
         error_message TEXT NULL COMMENT '错误信息',
-        INDEX idx_user_id (user_id),
+        INDEX idx_user_time (user_id, timestamp),
         INDEX idx_username (username),
         INDEX idx_interaction_type (interaction_type),
         INDEX idx_timestamp (timestamp),
-        INDEX idx_session_id (session_id),
+        INDEX idx_session_time (session_id, timestamp),
+        INDEX idx_user_session_time (user_id, session_id, timestamp),
         FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='交互记录表'
     """,
     
+    'sessions': """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        session_id VARCHAR(255) NOT NULL COMMENT '会话ID',
+        user_id VARCHAR(255) NOT NULL COMMENT '用户ID',
+        app_type VARCHAR(50) NULL COMMENT '应用类型',
+        device_info VARCHAR(500) NULL COMMENT '设备信息',
+        ip_address VARCHAR(50) NULL COMMENT 'IP地址',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+        last_seen_at TIMESTAMP NULL COMMENT '最后活动时间（批量写入，最多延迟几秒）',
+        ended_at TIMESTAMP NULL COMMENT '结束时间',
+        end_reason VARCHAR(20) NULL COMMENT '结束原因：logout/replaced/idle',
+        UNIQUE KEY uk_session_id (session_id),
+        INDEX idx_user_ended (user_id, ended_at),
+        INDEX idx_last_seen (last_seen_at),
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户会话表'
+    """,
+    
     'system_logs': """
     CREATE TABLE IF NOT EXISTS system_logs (
         id INT AUTO_INCREMENT PRIMARY KEY,
@@ -94,7 +114,7 @@ CREATE_TABLES_SQL = {
         INDEX idx_user_id (user_id),
         INDEX idx_username (username),
         INDEX idx_story_id (story_id),
-        INDEX idx_user_story (user_id, story_id),
+        UNIQUE KEY uk_user_story (user_id, story_id),
         INDEX idx_is_completed (is_completed),
         INDEX idx_completion_mode (completion_mode),
         INDEX idx_last_read_time (last_read_time),
@@ -156,7 +176,50 @@ CREATE_TABLES_SQL = {
         FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='AI使用进度表'
     """,
-    
+
+    'interaction_daily_rollup': """
+    CREATE TABLE IF NOT EXISTS interaction_daily_rollup (
+        user_id VARCHAR(255) NOT NULL COMMENT '用户ID',
+        stat_date DATE NOT NULL COMMENT '日期',
+        interaction_type ENUM('text', 'voice_home', 'voice_call', 'tts_play') NOT NULL COMMENT '交互类型',
+        interaction_count INT NOT NULL DEFAULT 0 COMMENT '交互次数',
+        success_count INT NOT NULL DEFAULT 0 COMMENT '成功次数',
+        failure_count INT NOT NULL DEFAULT 0 COMMENT '失败次数',
+        duration_total BIGINT NOT NULL DEFAULT 0 COMMENT '时长合计（秒）',
+        duration_count INT NOT NULL DEFAULT 0 COMMENT '记录了时长的交互次数',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+        PRIMARY KEY (user_id, stat_date, interaction_type),
+        INDEX idx_date_type (stat_date, interaction_type),
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='交互每日汇总表'
+    """,
+
+    'reading_daily_rollup': """
+    CREATE TABLE IF NOT EXISTS reading_daily_rollup (
+        user_id VARCHAR(255) NOT NULL COMMENT '用户ID',
+        stat_date DATE NOT NULL COMMENT '日期',
+        story_id VARCHAR(255) NOT NULL COMMENT '故事ID',
+        progress_updates INT NOT NULL DEFAULT 0 COMMENT '进度写入次数',
+        completions INT NOT NULL DEFAULT 0 COMMENT '完成次数',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+        PRIMARY KEY (user_id, stat_date, story_id),
+        INDEX idx_date (stat_date),
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='阅读每日汇总表'
+    """,
+
+    'retention_state': """
+    CREATE TABLE IF NOT EXISTS retention_state (
+        table_name VARCHAR(64) PRIMARY KEY COMMENT '清理的表',
+        watermark BIGINT NOT NULL DEFAULT 0 COMMENT '已清理到的主键（下次从这里继续）',
+        rows_deleted BIGINT NOT NULL DEFAULT 0 COMMENT '累计删除行数',
+        last_cutoff TIMESTAMP NULL COMMENT '最近一次清理的截止时间',
+        last_status VARCHAR(20) NULL COMMENT '最近一次清理的结果：done/paused/error',
+        last_run_at TIMESTAMP NULL COMMENT '最近一次清理时间',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据清理进度表'
+    """,
+
 }
 
 # 数据库初始化SQL
@@ -9,9 +9,20 @@ import json
 import logging
 import time
 import threading
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional, List, Dict, Any
 from database_config import DATABASE_CONFIG, CREATE_TABLES_SQL, INIT_DATABASE_SQL, DEFAULT_ADMIN
+from db_migrations import run_migrations
+from backend.prometheus_metrics import DB_CONNECTIONS_OPENED, DB_CONNECT_DURATION
+from backend.tracing import instrument_methods
+from backend.user_cache import UserDirectoryCache
+from backend.session_registry import SessionRegistry
+from backend.retention import retention_engine
+from backend.rollups import INTERACTION_ROLLUP_SQL, READING_ROLLUP_SQL, interaction_rollup_params
+from backend.pagination import CountCache, decode_cursor, next_cursor, keyset_condition
+from backend.queries import (DAILY_INTERACTIONS_SQL, USER_CONVERSATIONS_SQL, user_interactions_query,
+                             session_interactions_query, interaction_stats_queries)
+from backend.config import READING_PROGRESS_BUFFER_CONFIG, CONVERSATION_CACHE_CONFIG, ADMIN_BULK_CONFIG
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +38,21 @@ class DatabaseManager:
         # 性能优化：添加查询缓存
         self.query_cache = {}
         self.cache_ttl = 300  # 5分钟缓存
+        # 故事目录缓存：(Excel文件修改时间, 故事列表)，文件更新后自动重新读取
+        self._stories_cache = None
+        # 用户目录缓存：user_exists/get_user_by_id 命中时不查库
+        self.user_cache = UserDirectoryCache(self._load_user)
+        # 阅读完成状态缓存：(user_id, story_id) -> (过期时间, 是否完成)
+        self._completion_cache = {}
+        self._completion_lock = threading.Lock()
+        # 分页列表的总数缓存：(表名, 统计方式) -> 行数
+        self.count_cache = CountCache()
+        # 对话列表缓存：user_id -> (过期时间, {(limit, offset): 会话汇总})，该用户记录新交互时失效
+        self._conversation_cache = {}
+        self._conversation_lock = threading.Lock()
+        self._conversation_generation = 0  # 每次失效加一，查询期间发生失效时不写入缓存
+        # 会话注册表：活跃会话常驻内存，校验会话不查库
+        self.session_registry = SessionRegistry(self)
         # 连接重试配置
         self.max_retries = 3
         self.retry_delay = 1
@@ -90,7 +116,15 @@ class DatabaseManager:
             'init_command': "SET SESSION wait_timeout=28800, interactive_timeout=28800",
             'cursorclass': pymysql.cursors.DictCursor
         })
-        return pymysql.connect(**config)
+        start_time = time.perf_counter()
+        try:
+            connection = pymysql.connect(**config)
+        except Exception:
+            DB_CONNECTIONS_OPENED.labels('error').inc()
+            raise
+        DB_CONNECT_DURATION.observe(time.perf_counter() - start_time)
+        DB_CONNECTIONS_OPENED.labels('success').inc()
+        return connection
     
     def is_connection_healthy(self):
         """检查数据库连接是否健康"""
@@ -141,12 +175,15 @@ class DatabaseManager:
                 
                 self.connection.commit()
                 # 数据库初始化完成，不输出日志
-                
-                # 创建默认管理员用户
-                self.create_default_admin()
-                
-                # 创建默认用户（user01-user10）
-                self.create_default_users()
+
+            # 已有数据库补齐新增的唯一键/索引（已迁移时直接跳过）
+            run_migrations(self.connection)
+
+            # 创建默认管理员用户
+            self.create_default_admin()
+
+            # 创建默认用户（user01-user10）
+            self.create_default_users()
                 
         except Exception as e:
             if temp_connection:
@@ -266,39 +303,34 @@ class DatabaseManager:
                 else:
                     raise
     
+    def _load_user(self, key: str) -> Optional[Dict]:
+        """按user_id查找用户，找不到时按username查找（一次查询，两个分支都走索引）"""
+        def _query():
+            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                sql = """
+                (SELECT user_id, username, created_at, last_login_at, is_active, 0 AS match_rank
+                 FROM users WHERE user_id = %s LIMIT 1)
+                UNION ALL
+                (SELECT user_id, username, created_at, last_login_at, is_active, 1 AS match_rank
+                 FROM users WHERE username = %s LIMIT 1)
+                ORDER BY match_rank
+                LIMIT 1
+                """
+                cursor.execute(sql, (key, key))
+                result = cursor.fetchone()
+            if result:
+                result.pop('match_rank', None)
+            return result
+        return self.execute_with_retry(_query)
+
     def user_exists(self, user_id: str) -> bool:
-        """检查用户是否存在（使用独立连接以避免并发冲突）"""
-        max_retries = 3
-        connection = None
-        for attempt in range(max_retries):
-            try:
-                # 使用独立连接避免并发冲突
-                connection = self._get_fresh_connection()
-                
-                with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 先尝试按user_id查找，如果没找到再按username查找
-                    sql = "SELECT COUNT(*) as count FROM users WHERE user_id = %s OR username = %s"
-                    cursor.execute(sql, (user_id, user_id))
-                    result = cursor.fetchone()
-                    exists = result['count'] > 0 if result else False
-        
-                if connection:
-                    connection.close()
-                return exists
-                    
-            except Exception as e:
-                logger.error(f"❌ 检查用户存在失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if connection:
-                    try:
-                        connection.close()
-                    except:
-                        pass
-                if attempt < max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    return False
-        return False
-    
+        """检查用户是否存在（按user_id或username，结果经用户目录缓存）"""
+        try:
+            return self.user_cache.get(user_id) is not None
+        except Exception as e:
+            logger.error(f"❌ 检查用户存在失败: {e}")
+            return False
+
     def create_user(self, user_id: str, username: str, password: str, email: str = None, is_active: bool = True) -> bool:
         """创建用户"""
         max_retries = 3
@@ -319,6 +351,9 @@ class DatabaseManager:
                     """
                     cursor.execute(sql, (user_id, username, password_hash, is_active))
                     self.connection.commit()
+                    # 清除该ID/用户名的负缓存
+                    self.user_cache.invalidate(user_id, username)
+                    self.count_cache.invalidate(('users', 'exact'))
                     # 用户创建成功，不输出日志
                     return True
                     
@@ -392,7 +427,94 @@ class DatabaseManager:
                 if connection:
                     connection.close()
         return []
-    
+
+    def get_users_with_reading_counts(self, limit: int = 50, offset: int = 0, cursor: str = None,
+                                      total: str = 'exact') -> Optional[Dict]:
+        """
+        分页获取用户列表及每个用户的阅读/完成故事数（管理员功能）
+        先按 (created_at, id) 索引取出本页用户，再只对这些用户汇总阅读进度；传cursor时按游标分页
+        """
+        where, params = '', []
+        if cursor:
+            condition, params = keyset_condition(
+                ['created_at', 'id'], decode_cursor('users', cursor), True, nullable_first=True
+            )
+            where = f"WHERE {condition}"
+            offset = 0
+        max_retries = 3
+        for attempt in range(max_retries):
+            connection = None
+            try:
+                connection = self._get_fresh_connection()
+
+                with connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
+                    sql = f"""
+                    SELECT u.id, u.user_id, u.username, u.created_at,
+                           u.last_login_at, u.is_active,
+                           COUNT(rp.id) as total_stories,
+                           SUM(CASE WHEN rp.is_completed = 1
+                               THEN 1 ELSE 0 END) as completed_stories
+                    FROM (
+                        SELECT id, user_id, username, created_at, last_login_at, is_active
+                        FROM users
+                        {where}
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s OFFSET %s
+                    ) u
+                    LEFT JOIN reading_progress rp ON u.user_id = rp.user_id
+                    GROUP BY u.id, u.user_id, u.username, u.created_at,
+                             u.last_login_at, u.is_active
+                    ORDER BY u.created_at DESC, u.id DESC
+                    """
+                    db_cursor.execute(sql, params + [limit, offset])
+                    users = db_cursor.fetchall()
+                    cursor_token = next_cursor('users', users, limit)
+                    for user in users:
+                        user.pop('id', None)
+
+                    return {
+                        'users': users,
+                        'total_count': self._count_rows(db_cursor, 'users', total),
+                        'total_approximate': total == 'approx',
+                        'limit': limit,
+                        'offset': offset,
+                        'next_cursor': cursor_token
+                    }
+
+            except Exception as e:
+                logger.error(f"❌ 获取用户列表失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(1)
+                else:
+                    return None
+            finally:
+                if connection:
+                    connection.close()
+        return None
+
+    def get_admin_overview(self) -> Optional[Dict]:
+        """管理后台概览：用户数、阅读记录数、已完成数（一次查询）"""
+        connection = None
+        try:
+            connection = self._get_fresh_connection()
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute("""
+                SELECT (SELECT COUNT(*) FROM users) as total_users,
+                       COUNT(*) as total_stories,
+                       COALESCE(SUM(is_completed), 0) as completed_stories
+                FROM reading_progress
+                """)
+                overview = self._int_sums(cursor.fetchone(), ('completed_stories',))
+                total = overview['total_stories']
+                overview['completion_rate'] = round(overview['completed_stories'] / total * 100, 1) if total else 0.0
+                return overview
+        except Exception as e:
+            logger.error(f"❌ 获取管理后台概览失败: {e}")
+            return None
+        finally:
+            if connection:
+                connection.close()
+
     def get_all_reading_progress(self, limit: int = 100) -> List[Dict]:
         """获取所有阅读进度"""
         max_retries = 3
@@ -495,6 +617,8 @@ class DatabaseManager:
                 sql = "UPDATE users SET last_login_at = NOW() WHERE user_id = %s"
                 cursor.execute(sql, (user_id,))
                 connection.commit()
+            # 缓存中的last_login_at已过期
+            self.user_cache.invalidate(user_id)
                 
             if connection:
                 connection.close()
@@ -509,150 +633,20 @@ class DatabaseManager:
     # 移除update_user_logout_time函数 - 不再需要登出时间字段
     
     def create_session(self, user_id: str, app_type: str = 'unknown', device_info: str = None, ip_address: str = None) -> str:
-        """创建用户会话（更新到 users 表）"""
-        connection = None
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 使用独立连接避免并发冲突
-                connection = self._get_fresh_connection()
-                
-                session_id = str(uuid.uuid4())
-                with connection.cursor() as cursor:
-                    # 更新 users 表的会话信息
-                    sql = """
-                    UPDATE users 
-                    SET session_id = %s,
-                        app_type = %s,
-                        device_info = %s,
-                        ip_address = %s,
-                        last_login_at = NOW()
-                    WHERE user_id = %s
-                    """
-                    cursor.execute(sql, (session_id, app_type, device_info, ip_address, user_id))
-                    connection.commit()
-                    
-                if connection:
-                    connection.close()
-                # 会话创建成功，不输出日志
-                return session_id
-                    
-            except Exception as e:
-                # 只记录有意义的错误
-                if str(e) and str(e) != "(0, '')":
-                    logger.error(f"❌ 创建会话失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if connection:
-                    try:
-                        connection.close()
-                    except:
-                        pass
-                if attempt < max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    return None
-        return None
+        """创建用户会话（写入sessions表并登记到内存注册表）"""
+        return self.session_registry.create(user_id, app_type, device_info, ip_address)
     
     def end_user_sessions(self, user_id: str, app_type: str = None) -> int:
-        """结束用户的所有会话（或指定app类型的会话）（带连接健康检查和自动重连）"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 检查连接健康状态
-                if not self.is_connection_healthy():
-                    logger.debug(f"数据库连接不健康，尝试重连 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor() as cursor:
-                    if app_type:
-                        # 清除指定app类型的会话信息
-                        sql = """
-                        UPDATE users 
-                        SET session_id = NULL, app_type = NULL, device_info = NULL, ip_address = NULL
-                        WHERE user_id = %s AND app_type = %s
-                        """
-                        cursor.execute(sql, (user_id, app_type))
-                    else:
-                        # 清除所有会话信息
-                        sql = """
-                        UPDATE users 
-                        SET session_id = NULL, app_type = NULL, device_info = NULL, ip_address = NULL
-                        WHERE user_id = %s
-                        """
-                        cursor.execute(sql, (user_id,))
-                    self.connection.commit()
-                    return cursor.rowcount
-            except (pymysql.Error, ConnectionError, OSError) as e:
-                error_msg = str(e)
-                # 检查是否是连接相关错误
-                if any(keyword in error_msg.lower() for keyword in ['gone away', 'lost connection', 'broken pipe', 'connection aborted', '10053']):
-                    logger.debug(f"数据库连接错误，尝试重连 (尝试 {attempt + 1}/{max_retries}): {error_msg}")
-                    if attempt < max_retries - 1:
-                        try:
-                            self.reconnect()
-                            time.sleep(self.retry_delay * (attempt + 1))
-                            continue
-                        except Exception as reconnect_error:
-                            logger.error(f"重连失败: {reconnect_error}")
-                    else:
-                        logger.error(f"❌ 结束会话失败（连接错误，已重试 {max_retries} 次）: {error_msg}")
-                        return 0
-                else:
-                    # 其他类型的错误，直接返回
-                    if attempt == max_retries - 1:
-                        logger.error(f"❌ 结束会话失败: {error_msg}")
-                    return 0
-            except Exception as e:
-                # 其他未知错误
-                if attempt == max_retries - 1:
-                    logger.error(f"❌ 结束会话失败: {e}")
-                return 0
-        
-        return 0
+        """结束用户的所有会话（或指定app类型的会话），返回结束的会话数"""
+        try:
+            return self.session_registry.end_user(user_id, app_type)
+        except Exception as e:
+            logger.error(f"❌ 结束会话失败: {e}")
+            return 0
     
     def get_active_sessions(self, user_id: str, app_type: str = None) -> List[Dict]:
-        """获取用户的活跃会话（从 users 表获取）"""
-        max_retries = 3
-        connection = None
-        for attempt in range(max_retries):
-            try:
-                # 使用独立连接避免并发冲突
-                connection = self._get_fresh_connection()
-                
-                with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    if app_type:
-                        sql = """
-                        SELECT session_id, app_type, device_info, ip_address, last_login_at as login_time
-                        FROM users
-                        WHERE user_id = %s AND app_type = %s AND session_id IS NOT NULL
-                        """
-                        cursor.execute(sql, (user_id, app_type))
-                    else:
-                        sql = """
-                        SELECT session_id, app_type, device_info, ip_address, last_login_at as login_time
-                        FROM users
-                        WHERE user_id = %s AND session_id IS NOT NULL
-                        """
-                        cursor.execute(sql, (user_id,))
-                    results = cursor.fetchall()
-                    
-                    if connection:
-                        connection.close()
-                    return results
-            except Exception as e:
-                # 只记录有意义的错误（排除空错误）
-                error_msg = str(e)
-                if error_msg and error_msg != "(0, '')":
-                    logger.error(f"❌ 获取活跃会话失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if connection:
-                    try:
-                        connection.close()
-                    except:
-                        pass
-                if attempt < max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    return []
-        return []
+        """获取用户的活跃会话（读取本进程的内存注册表，不查库）"""
+        return self.session_registry.active(user_id, app_type)
     
     def get_or_create_active_session(self, user_id: str, reuse_recent: bool = False, timeout_minutes: int = 30) -> str:
         """
@@ -660,81 +654,23 @@ class DatabaseManager:
         
         Args:
             user_id: 用户ID
-            reuse_recent: 是否复用最近的session（如果距离上次交互时间在timeout_minutes内）
-            timeout_minutes: 如果启用reuse_recent，距离上次交互超过此时间则创建新session
+            reuse_recent: 是否复用最近的session（如果距离上次活动时间在timeout_minutes内）
+            timeout_minutes: 如果启用reuse_recent，距离上次活动超过此时间则创建新session
         
         Returns:
             session_id
         """
         # 如果不需要复用，直接创建新session（每个新对话都是新session）
         if not reuse_recent:
-            # 创建新对话session，不输出日志
             return self.create_session(user_id)
         
-        # 如果需要复用，检查最近的交互时间
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if not self.connection or not self.connection.open:
-                    logger.warning(f"⚠️ 数据库连接已关闭，尝试重新连接 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 查找用户最近一次交互的session和时间
-                    sql = """
-                    SELECT i.session_id, i.timestamp
-                    FROM interactions i
-                    WHERE i.user_id = %s 
-                      AND i.session_id IS NOT NULL 
-                      AND i.session_id != ''
-                    ORDER BY i.timestamp DESC
-                    LIMIT 1
-                    """
-                    cursor.execute(sql, (user_id,))
-                    result = cursor.fetchone()
-                    
-                    if result and result['session_id']:
-                        # 检查距离上次交互的时间
-                        last_timestamp = result['timestamp']
-                        # 如果timestamp是datetime对象，直接使用；如果是字符串，转换为datetime
-                        if isinstance(last_timestamp, str):
-                            try:
-                                last_timestamp = datetime.fromisoformat(last_timestamp.replace('Z', '+00:00'))
-                            except:
-                                # 如果解析失败，创建新session
-                                logger.warning(f"⚠️ 无法解析timestamp，创建新session")
-                                return self.create_session(user_id)
-                        
-                        time_diff = (datetime.now() - last_timestamp).total_seconds() / 60  # 转换为分钟
-                        
-                        if time_diff <= timeout_minutes:
-                            # 在超时时间内，复用最近的session
-                            session_id = result['session_id']
-                            # 复用最近的session，不输出日志
-                            return session_id
-                        else:
-                            # 超过超时时间，创建新session
-                            # 距离上次交互超过超时时间，创建新session，不输出日志
-                            return self.create_session(user_id)
-                    
-                    # 如果没有找到任何交互记录，创建新session
-                    # 未找到历史交互记录，创建新session，不输出日志
-                    return self.create_session(user_id)
-                    
-            except Exception as e:
-                logger.error(f"❌ 获取或创建session失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    try:
-                        self.reconnect()
-                    except:
-                        pass
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    # 如果获取失败，直接创建一个新session
-                    logger.warning(f"⚠️ 获取session失败，创建新session")
-                    return self.create_session(user_id)
-        
-        # 最终失败时创建新session
+        try:
+            session = self.session_registry.latest(user_id)
+        except Exception as e:
+            logger.error(f"❌ 获取最近session失败: {e}")
+            session = None
+        if session and time.time() - session['last_seen'] <= timeout_minutes * 60:
+            return session['session_id']
         return self.create_session(user_id)
     
     def validate_or_create_session(self, user_id: str, session_id: str, timeout_minutes: int = 5) -> str:
@@ -744,161 +680,151 @@ class DatabaseManager:
         Args:
             user_id: 用户ID
             session_id: 要验证的session_id
-            timeout_minutes: 如果session最后一次交互超过此时间，创建新session
+            timeout_minutes: 如果session最后一次活动超过此时间，创建新session
         
         Returns:
             有效的session_id（可能是原来的，也可能是新创建的）
         """
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if not self.connection or not self.connection.open:
-                    logger.warning(f"⚠️ 数据库连接已关闭，尝试重新连接 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 查找该session的最后一次交互时间
-                    sql = """
-                    SELECT timestamp
-                    FROM interactions 
-                    WHERE user_id = %s AND session_id = %s
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                    """
-                    cursor.execute(sql, (user_id, session_id))
-                    result = cursor.fetchone()
-                    
-                    if not result or not result.get('timestamp'):
-                        # session不存在或没有任何交互记录，创建新session
-                        # session不存在或无交互记录，创建新session，不输出日志
-                        return self.create_session(user_id)
-                    
-                    # 检查距离上次交互的时间
-                    last_timestamp = result['timestamp']
-                    if isinstance(last_timestamp, str):
-                        try:
-                            last_timestamp = datetime.fromisoformat(last_timestamp.replace('Z', '+00:00'))
-                        except:
-                            logger.warning(f"⚠️ 无法解析timestamp，创建新session")
-                            return self.create_session(user_id)
-                    
-                    time_diff = (datetime.now() - last_timestamp).total_seconds() / 60  # 转换为分钟
-                    
-                    if time_diff > timeout_minutes:
-                        # 超过超时时间，创建新session（这是新对话）
-                        # session超时，创建新session，不输出日志
-                        return self.create_session(user_id)
-                    else:
-                        # 在超时时间内，使用原session（同一对话的继续）
-                        # session有效，继续使用，不输出日志
-                        return session_id
-                    
-            except Exception as e:
-                logger.error(f"❌ 验证session失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    try:
-                        self.reconnect()
-                    except:
-                        pass
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    # 如果验证失败，创建新session
-                    logger.warning(f"⚠️ 验证session失败，创建新session")
-                    return self.create_session(user_id)
-        
-        # 最终失败时创建新session
-        return self.create_session(user_id)
+        try:
+            return self.session_registry.validate_or_create(user_id, session_id, timeout_minutes)
+        except Exception as e:
+            logger.warning(f"⚠️ 验证session失败，创建新session: {e}")
+            return self.create_session(user_id)
     
     def check_session_exists(self, user_id: str, session_id: str) -> bool:
-        """检查session是否存在且属于该用户"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if not self.connection or not self.connection.open:
-                    logger.warning(f"⚠️ 数据库连接已关闭，尝试重新连接 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 检查session是否存在：在users表中存在，或者在interactions表中有记录
-                    sql = """
-                    SELECT COUNT(*) as count
-                    FROM (
-                        SELECT session_id FROM users WHERE user_id = %s AND session_id = %s
-                        UNION
-                        SELECT DISTINCT session_id FROM interactions WHERE user_id = %s AND session_id = %s
-                    ) as combined
-                    """
-                    cursor.execute(sql, (user_id, session_id, user_id, session_id))
-                    result = cursor.fetchone()
-                    exists = result['count'] > 0 if result else False
-                    # 检查session，不输出日志
-                    return exists
-                    
-            except Exception as e:
-                logger.error(f"❌ 检查session存在失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    try:
-                        self.reconnect()
-                    except:
-                        pass
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    # 如果检查失败，返回False（不存在），这样会创建新session
-                    return False
-        return False
+        """检查session是否存在且属于该用户（内存注册表未命中时查一次sessions表）"""
+        try:
+            return self.session_registry.exists(user_id, session_id)
+        except Exception as e:
+            logger.error(f"❌ 检查session存在失败: {e}")
+            # 如果检查失败，返回False（不存在），这样会创建新session
+            return False
     
     def end_session(self, session_id: str) -> bool:
-        """结束用户会话（带连接健康检查和自动重连）"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 检查连接健康状态
-                if not self.is_connection_healthy():
-                    logger.debug(f"数据库连接不健康，尝试重连 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor() as cursor:
-                    sql = """
-                    UPDATE users 
-                    SET session_id = NULL, app_type = NULL, device_info = NULL, ip_address = NULL
-                    WHERE session_id = %s
-                    """
-                    cursor.execute(sql, (session_id,))
-                    self.connection.commit()
-                    
-                    if cursor.rowcount > 0:
-                        # 会话结束成功，不输出日志
-                        return True
-                    else:
-                        # 会话不存在，不一定是错误，可能是已经结束过了
-                        return False
-            except (pymysql.Error, ConnectionError, OSError) as e:
-                error_msg = str(e)
-                # 检查是否是连接相关错误
-                if any(keyword in error_msg.lower() for keyword in ['gone away', 'lost connection', 'broken pipe', 'connection aborted', '10053']):
-                    logger.debug(f"数据库连接错误，尝试重连 (尝试 {attempt + 1}/{max_retries}): {error_msg}")
-                    if attempt < max_retries - 1:
-                        try:
-                            self.reconnect()
-                            time.sleep(self.retry_delay * (attempt + 1))
-                            continue
-                        except Exception as reconnect_error:
-                            logger.error(f"重连失败: {reconnect_error}")
-                    else:
-                        logger.error(f"❌ 结束会话失败（连接错误，已重试 {max_retries} 次）: {error_msg}")
-                        return False
-                else:
-                    # 其他类型的错误，直接返回
-                    if attempt == max_retries - 1:
-                        logger.error(f"❌ 结束会话失败: {error_msg}")
-                    return False
-            except Exception as e:
-                # 其他未知错误
-                if attempt == max_retries - 1:
-                    logger.error(f"❌ 结束会话失败: {e}")
-                return False
-        
-        return False
+        """结束用户会话"""
+        try:
+            return self.session_registry.end(session_id)
+        except Exception as e:
+            logger.error(f"❌ 结束会话失败: {e}")
+            return False
+
+    # ---------- sessions表读写（供会话注册表调用） ----------
+
+    def insert_session_record(self, session: Dict[str, Any]):
+        def _insert():
+            with self.connection.cursor() as cursor:
+                cursor.execute("""
+                INSERT INTO sessions
+                    (session_id, user_id, app_type, device_info, ip_address, created_at, last_seen_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, (session['session_id'], session['user_id'], session['app_type'], session['device_info'],
+                      session['ip_address'], session['created_at'], session['created_at']))
+            self.connection.commit()
+        self.execute_with_retry(_insert)
+
+    def bulk_touch_sessions(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量写入会话最后活动时间（一条多行语句），返回写入行数
+        库中没有的会话（旧版本创建的）顺带补建；因空闲超时结束的会话有新活动时重新打开
+        """
+        if not rows:
+            return 0
+
+        def _write():
+            with self.connection.cursor() as cursor:
+                # ON DUPLICATE KEY UPDATE 按从左到右的顺序赋值，ended_at必须在end_reason之前判断
+                cursor.executemany("""
+                INSERT INTO sessions (session_id, user_id, created_at, last_seen_at)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    last_seen_at = GREATEST(COALESCE(last_seen_at, VALUES(last_seen_at)), VALUES(last_seen_at)),
+                    ended_at = IF(end_reason = 'idle', NULL, ended_at),
+                    end_reason = IF(end_reason = 'idle', NULL, end_reason)
+                """, [(row['session_id'], row['user_id'], row['last_seen_at'], row['last_seen_at'])
+                      for row in rows])
+            self.connection.commit()
+            return len(rows)
+        return self.execute_with_retry(_write)
+
+    def end_session_records(self, session_ids: List[str], reason: str) -> int:
+        if not session_ids:
+            return 0
+
+        def _end():
+            placeholders = ', '.join(['%s'] * len(session_ids))
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"""
+                UPDATE sessions SET ended_at = NOW(), end_reason = %s
+                WHERE session_id IN ({placeholders}) AND ended_at IS NULL
+                """, [reason] + list(session_ids))
+                ended = cursor.rowcount
+            self.connection.commit()
+            return ended
+        return self.execute_with_retry(_end)
+
+    def end_user_session_records(self, user_id: str, app_type: str, reason: str) -> int:
+        def _end():
+            sql = "UPDATE sessions SET ended_at = NOW(), end_reason = %s WHERE user_id = %s AND ended_at IS NULL"
+            params = [reason, user_id]
+            if app_type:
+                sql += " AND app_type = %s"
+                params.append(app_type)
+            with self.connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                ended = cursor.rowcount
+            self.connection.commit()
+            return ended
+        return self.execute_with_retry(_end)
+
+    def expire_session_records(self, session_ids: List[str], idle_before: datetime) -> int:
+        """空闲会话标记结束（结束时间取最后活动时间），idle_before之后仍有活动的跳过"""
+        if not session_ids:
+            return 0
+
+        def _expire():
+            placeholders = ', '.join(['%s'] * len(session_ids))
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"""
+                UPDATE sessions
+                SET ended_at = COALESCE(last_seen_at, created_at), end_reason = 'idle'
+                WHERE session_id IN ({placeholders}) AND ended_at IS NULL
+                  AND COALESCE(last_seen_at, created_at) < %s
+                """, list(session_ids) + [idle_before])
+                expired = cursor.rowcount
+            self.connection.commit()
+            return expired
+        return self.execute_with_retry(_expire)
+
+    def find_session_record(self, session_id: str) -> Optional[Dict]:
+        def _query():
+            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute("SELECT * FROM sessions WHERE session_id = %s", (session_id,))
+                return cursor.fetchone()
+        return self.execute_with_retry(_query)
+
+    def find_latest_session_record(self, user_id: str) -> Optional[Dict]:
+        """该用户最近活动的未结束会话"""
+        def _query():
+            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute("""
+                SELECT * FROM sessions
+                WHERE user_id = %s AND ended_at IS NULL
+                ORDER BY last_seen_at DESC
+                LIMIT 1
+                """, (user_id,))
+                return cursor.fetchone()
+        return self.execute_with_retry(_query)
+
+    def load_session_records(self, since: datetime) -> List[Dict]:
+        """未结束且since之后有活动的会话（服务启动时加载到内存）"""
+        def _query():
+            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute("""
+                SELECT * FROM sessions
+                WHERE last_seen_at >= %s AND ended_at IS NULL
+                """, (since,))
+                return cursor.fetchall()
+        return self.execute_with_retry(_query)
     
     def log_interaction(self, user_id: str, interaction_type: str, content: str, 
                        response: str = None, session_id: str = None, 
@@ -951,6 +877,8 @@ class DatabaseManager:
                     return False, None
                 
                 with connection.cursor() as cursor:
+                    # 交互记录和当天汇总在同一事务中写入
+                    connection.begin()
                     sql = """
                     INSERT INTO interactions 
                     (user_id, username, interaction_type, content, response, session_id, 
@@ -959,7 +887,12 @@ class DatabaseManager:
                     """
                     cursor.execute(sql, (user_id, username, interaction_type, content, response, 
                                        session_id, duration_seconds, success, error_message))
+                    cursor.execute(INTERACTION_ROLLUP_SQL, interaction_rollup_params(
+                        user_id, interaction_type, success, duration_seconds
+                    ))
                     connection.commit()
+                    self._invalidate_conversations(user_id)
+                    self.session_registry.touch(session_id, user_id)
                     
                     # 异步更新当天的interaction_progress（不阻塞主流程）
                     try:
@@ -996,40 +929,37 @@ class DatabaseManager:
                     return False, None
                     return False, None
     
-    def get_user_interactions(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
-        """获取用户交互记录"""
+    def get_user_interactions(self, user_id: str, limit: int = 50, offset: int = 0,
+                              cursor: str = None) -> List[Dict]:
+        """
+        获取用户交互记录（新的在前）
+        按 (timestamp, id) 倒序，直接走 (user_id, timestamp) 索引；传cursor时按游标分页（忽略offset）
+        """
+        after = decode_cursor('user_interactions', cursor) if cursor else None
+        sql, params = user_interactions_query(user_id, limit, offset, after)
         try:
-            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                sql = """
-                SELECT * FROM interactions 
-                WHERE user_id = %s 
-                ORDER BY timestamp DESC 
-                LIMIT %s OFFSET %s
-                """
-                cursor.execute(sql, (user_id, limit, offset))
-                return cursor.fetchall()
+            with self.connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
+                db_cursor.execute(sql, params)
+                return db_cursor.fetchall()
         except Exception as e:
             logger.error(f"❌ 获取交互记录失败: {e}")
             return []
     
-    def get_session_interactions(self, session_id: str, limit: int = 100, offset: int = 0) -> List[Dict]:
-        """获取指定session下的所有交互记录"""
+    def get_session_interactions(self, session_id: str, limit: int = 100, offset: int = 0,
+                                 cursor: str = None) -> List[Dict]:
+        """获取指定session下的所有交互记录（按时间正序，走 (session_id, timestamp) 索引，传cursor时按游标分页）"""
+        after = decode_cursor('session_interactions', cursor) if cursor else None
+        sql, params = session_interactions_query(session_id, limit, offset, after)
         max_retries = 3
         for attempt in range(max_retries):
             try:
                 if not self.connection or not self.connection.open:
                     logger.warning(f"⚠️ 数据库连接已关闭，尝试重新连接 (尝试 {attempt + 1}/{max_retries})")
-                    self.reconnect()
-                
-                with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    sql = """
-                    SELECT * FROM interactions 
-                    WHERE session_id = %s 
-                    ORDER BY timestamp ASC 
-                    LIMIT %s OFFSET %s
-                    """
-                    cursor.execute(sql, (session_id, limit, offset))
-                    results = cursor.fetchall()
+                    self.reconnect()
+                
+                with self.connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
+                    db_cursor.execute(sql, params)
+                    results = db_cursor.fetchall()
                     # 获取session交互记录成功，不输出日志
                     return results
             except Exception as e:
@@ -1044,43 +974,88 @@ class DatabaseManager:
                     return []
         return []
     
+    def get_user_conversations(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """
+        获取用户的对话列表（按最后一条交互倒序）：每个会话的交互数、首末时间和最后一条消息预览
+        一次查询完成，按会话分组走 (user_id, session_id, timestamp) 索引；结果按用户缓存到其下一次交互
+        """
+        page_key = (limit, offset)
+        generation = self._conversation_generation
+        if CONVERSATION_CACHE_CONFIG['enabled']:
+            with self._conversation_lock:
+                generation = self._conversation_generation
+                entry = self._conversation_cache.get(user_id)
+                if entry is not None and entry[0] > time.monotonic() and page_key in entry[1]:
+                    return [dict(item) for item in entry[1][page_key]]
+
+        def _query():
+            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                preview_length = CONVERSATION_CACHE_CONFIG['preview_length']
+                cursor.execute(USER_CONVERSATIONS_SQL, (preview_length, preview_length, user_id, limit, offset))
+                return cursor.fetchall()
+
+        try:
+            rows = self.execute_with_retry(_query)
+        except Exception as e:
+            logger.error(f"❌ 获取对话列表失败: {e}")
+            return []
+
+        conversations = []
+        for row in rows:
+            conversations.append({
+                'session_id': row['session_id'],
+                'interaction_count': row['interaction_count'],
+                'first_interaction_time': row['first_interaction_time'],
+                'last_interaction_time': row['last_interaction_time'],
+                'last_interaction': {
+                    'id': row['last_interaction_id'],
+                    'interaction_type': row['last_interaction_type'],
+                    'content': row['last_content'],
+                    'response': row['last_response'],
+                    'timestamp': row['last_timestamp']
+                }
+            })
+
+        if CONVERSATION_CACHE_CONFIG['enabled']:
+            with self._conversation_lock:
+                if generation != self._conversation_generation:
+                    return [dict(item) for item in conversations]
+                now = time.monotonic()
+                entry = self._conversation_cache.get(user_id)
+                if entry is None or entry[0] <= now:
+                    entry = (now + CONVERSATION_CACHE_CONFIG['ttl'], {})
+                entry[1][page_key] = conversations
+                self._conversation_cache[user_id] = entry
+                if len(self._conversation_cache) > CONVERSATION_CACHE_CONFIG['max_users']:
+                    # 插入顺序即写入顺序，淘汰最早写入的用户
+                    self._conversation_cache.pop(next(iter(self._conversation_cache)))
+        return [dict(item) for item in conversations]
+
+    def _invalidate_conversations(self, user_id: str = None):
+        """用户产生新交互后清除其对话列表缓存（user_id为None时全部清除）"""
+        with self._conversation_lock:
+            self._conversation_generation += 1
+            if user_id is None:
+                self._conversation_cache.clear()
+            else:
+                self._conversation_cache.pop(user_id, None)
+
     def get_interaction_stats(self, user_id: str = None, days: int = 30) -> Dict:
-        """获取交互统计"""
+        """获取交互统计（读每日汇总表，统计最近days个自然日，含今天）"""
+        connection = None
         try:
-            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                where_clause = "WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)"
-                params = [days]
-                
-                if user_id:
-                    where_clause += " AND user_id = %s"
-                    params.append(user_id)
-                
-                sql = f"""
-                SELECT 
-                    interaction_type,
-                    COUNT(*) as count,
-                    AVG(duration_seconds) as avg_duration,
-                    SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as success_count,
-                    SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failure_count
-                FROM interactions 
-                {where_clause}
-                GROUP BY interaction_type
-                """
-                cursor.execute(sql, params)
-                stats = cursor.fetchall()
+            # 独立连接，管理后台聚合接口可以并行查询
+            connection = self._get_fresh_connection()
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                by_type_sql, total_sql, params = interaction_stats_queries(user_id, days)
+                cursor.execute(by_type_sql, params)
+                stats = [self._int_sums(row, ('count', 'success_count', 'failure_count'))
+                         for row in cursor.fetchall()]
                 
                 # 计算总体统计
-                total_sql = f"""
-                SELECT 
-                    COUNT(*) as total_interactions,
-                    AVG(duration_seconds) as avg_duration,
-                    SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as total_success,
-                    SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as total_failure
-                FROM interactions 
-                {where_clause}
-                """
                 cursor.execute(total_sql, params)
-                total_stats = cursor.fetchone()
+                total_stats = self._int_sums(cursor.fetchone(),
+                                             ('total_interactions', 'total_success', 'total_failure'))
                 
                 return {
                     'by_type': stats,
@@ -1089,6 +1064,17 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"❌ 获取交互统计失败: {e}")
             return {}
+        finally:
+            if connection:
+                connection.close()
+
+    @staticmethod
+    def _int_sums(row: Dict, keys) -> Dict:
+        """SUM()返回Decimal，计数字段转回int"""
+        for key in keys:
+            if row.get(key) is not None:
+                row[key] = int(row[key])
+        return row
     
     def log_system_event(self, log_level: str, service_name: str, message: str):
         """记录系统日志（使用独立连接，静默失败）"""
@@ -1120,62 +1106,77 @@ class DatabaseManager:
                     pass
     
     def get_active_users(self, hours: int = 24) -> List[Dict]:
-        """获取活跃用户"""
+        """获取活跃用户（交互次数读每日汇总表，按窗口覆盖到的自然日统计）"""
+        connection = None
         try:
-            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            # 独立连接，管理后台聚合接口可以并行查询
+            connection = self._get_fresh_connection()
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
                 sql = """
-                SELECT DISTINCT u.user_id, u.username, u.last_login_at, u.last_logout_at,
-                       COUNT(i.id) as interaction_count
+                SELECT u.user_id, u.username, u.last_login_at,
+                       COALESCE(SUM(r.interaction_count), 0) as interaction_count
                 FROM users u
-                LEFT JOIN interactions i ON u.user_id = i.user_id 
-                    AND i.timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)
+                LEFT JOIN interaction_daily_rollup r ON u.user_id = r.user_id 
+                    AND r.stat_date >= DATE(DATE_SUB(NOW(), INTERVAL %s HOUR))
                 WHERE u.last_login_at >= DATE_SUB(NOW(), INTERVAL %s HOUR)
-                GROUP BY u.user_id, u.username, u.last_login_at, u.last_logout_at
+                GROUP BY u.user_id, u.username, u.last_login_at
                 ORDER BY u.last_login_at DESC
                 """
                 cursor.execute(sql, (hours, hours))
-                return cursor.fetchall()
+                return [self._int_sums(row, ('interaction_count',)) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"❌ 获取活跃用户失败: {e}")
             return []
+        finally:
+            if connection:
+                connection.close()
     
     # 移除TTS相关函数 - 不再需要TTS播放计数和时间字段
     
     def get_tts_stats(self, user_id: str = None, days: int = 30) -> Dict:
-        """获取TTS播放统计"""
+        """获取TTS播放统计（读每日汇总表，TTS播放即 tts_play 类型的交互）"""
+        connection = None
         try:
-            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                where_clause = "WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)"
+            # 独立连接，管理后台聚合接口可以并行查询
+            connection = self._get_fresh_connection()
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                where_clause = "WHERE stat_date > CURDATE() - INTERVAL %s DAY"
                 params = [days]
                 
                 if user_id:
-                    where_clause += " AND user_id = %s"
-                    params.append(user_id)
+                    where_clause = "WHERE user_id = %s AND stat_date > CURDATE() - INTERVAL %s DAY"
+                    params = [user_id, days]
                 
                 sql = f"""
                 SELECT 
-                    COUNT(*) as total_interactions,
-                    SUM(tts_play_count) as total_tts_plays,
-                    AVG(tts_play_count) as avg_tts_plays_per_interaction,
-                    MAX(tts_play_count) as max_tts_plays,
-                    COUNT(CASE WHEN tts_play_count > 0 THEN 1 END) as interactions_with_tts,
-                    COUNT(CASE WHEN tts_play_count = 0 THEN 1 END) as interactions_without_tts
-                FROM interactions 
+                    COALESCE(SUM(interaction_count), 0) as total_interactions,
+                    COALESCE(SUM(CASE WHEN interaction_type = 'tts_play' THEN interaction_count END), 0) as total_tts_plays,
+                    COALESCE(MAX(CASE WHEN interaction_type = 'tts_play' THEN interaction_count END), 0) as max_tts_plays
+                FROM interaction_daily_rollup 
                 {where_clause}
                 """
                 cursor.execute(sql, params)
-                result = cursor.fetchone()
-                
-                # 计算TTS播放率
-                if result['total_interactions'] > 0:
-                    result['tts_play_rate'] = result['interactions_with_tts'] / result['total_interactions']
+                result = self._int_sums(cursor.fetchone(),
+                                        ('total_interactions', 'total_tts_plays', 'max_tts_plays'))
+                
+                # 计算TTS播放率（max_tts_plays为单个用户单日的最多播放次数）
+                total = result['total_interactions']
+                result['interactions_with_tts'] = result['total_tts_plays']
+                result['interactions_without_tts'] = total - result['total_tts_plays']
+                if total > 0:
+                    result['avg_tts_plays_per_interaction'] = result['total_tts_plays'] / total
+                    result['tts_play_rate'] = result['total_tts_plays'] / total
                 else:
+                    result['avg_tts_plays_per_interaction'] = 0
                     result['tts_play_rate'] = 0
                 
                 return result
         except Exception as e:
             logger.error(f"❌ 获取TTS统计失败: {e}")
             return {}
+        finally:
+            if connection:
+                connection.close()
     
     def get_most_played_interactions(self, user_id: str = None, limit: int = 10) -> List[Dict]:
         """获取播放次数最多的交互记录"""
@@ -1205,35 +1206,13 @@ class DatabaseManager:
             logger.error(f"❌ 获取最常播放交互失败: {e}")
             return []
     
-    def cleanup_old_data(self, days: int = 90):
-        """清理旧数据"""
+    def cleanup_old_data(self, days: int = None, tables=None):
+        """清理旧数据（按主键分批删除，见 backend/retention.py），返回各表的清理报告"""
         try:
-            with self.connection.cursor() as cursor:
-                # 清理旧的交互记录
-                cursor.execute("""
-                    DELETE FROM interactions 
-                    WHERE timestamp < DATE_SUB(NOW(), INTERVAL %s DAY)
-                """, (days,))
-                
-                # 清理旧的系统日志
-                cursor.execute("""
-                    DELETE FROM system_logs 
-                    WHERE timestamp < DATE_SUB(NOW(), INTERVAL %s DAY)
-                """, (days,))
-                
-                # 清理旧的会话信息（基于最后登录时间）
-                cursor.execute("""
-                    UPDATE users 
-                    SET session_id = NULL, app_type = NULL, device_info = NULL, ip_address = NULL
-                    WHERE last_login_at IS NOT NULL 
-                    AND last_login_at < DATE_SUB(NOW(), INTERVAL %s DAY)
-                    AND session_id IS NOT NULL
-                """, (days,))
-                
-                self.connection.commit()
-                # 清理旧数据完成，不输出日志
+            return retention_engine.run(tables=tables, days=days)
         except Exception as e:
             logger.error(f"❌ 清理旧数据失败: {e}")
+            return None
     
     def query_interactions(self, interaction_type: str = None, user_id: str = None, limit: int = 10):
         """查询交互记录"""
@@ -1338,41 +1317,30 @@ class DatabaseManager:
                             logger.error(f"❌ 用户名无效: user_id={user_id}, username={username}")
                             return False
                     
-                    # 检查是否已存在记录
-                    check_sql = "SELECT id, is_completed FROM reading_progress WHERE user_id = %s AND story_id = %s"
-                    cursor.execute(check_sql, (user_id, story_id))
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        # 更新现有记录（包括story_title，确保标题信息是最新的）
-                        # 保留现有的 current_position 和 total_length，只更新完成状态
-                        update_sql = """
-                        UPDATE reading_progress 
-                        SET story_title = %s, is_completed = TRUE, completion_time = NOW(), 
-                            completion_mode = %s, last_read_time = NOW(),
-                            reading_progress = CASE 
-                                WHEN total_length > 0 THEN (current_position / total_length * 100)
-                                ELSE 100.0
-                            END,
-                            username = %s
-                        WHERE user_id = %s AND story_id = %s
-                        """
-                        cursor.execute(update_sql, (
-                            story_title, completion_mode, username, user_id, story_id
-                        ))
-                    else:
-                        # 创建新记录
-                        insert_sql = """
-                        INSERT INTO reading_progress 
-                        (user_id, username, story_id, story_title, current_position, total_length, 
-                         reading_progress, is_completed, completion_mode, start_time, completion_time)
-                        VALUES (%s, %s, %s, %s, 0, 0, 100.0, TRUE, %s, NOW(), NOW())
-                        """
-                        cursor.execute(insert_sql, (
-                            user_id, username, story_id, story_title, completion_mode
-                        ))
+                    # 一条语句完成插入或更新（唯一键uk_user_story）
+                    # 已有记录保留 current_position 和 total_length，只更新完成状态和标题
+                    upsert_sql = """
+                    INSERT INTO reading_progress 
+                    (user_id, username, story_id, story_title, current_position, total_length, 
+                     reading_progress, is_completed, completion_mode, start_time, completion_time)
+                    VALUES (%s, %s, %s, %s, 0, 0, 100.0, TRUE, %s, NOW(), NOW())
+                    ON DUPLICATE KEY UPDATE
+                        story_title = VALUES(story_title), is_completed = TRUE, completion_time = NOW(),
+                        completion_mode = VALUES(completion_mode), last_read_time = NOW(),
+                        reading_progress = CASE 
+                            WHEN total_length > 0 THEN (current_position / total_length * 100)
+                            ELSE 100.0
+                        END,
+                        username = VALUES(username)
+                    """
+                    connection.begin()
+                    cursor.execute(upsert_sql, (
+                        user_id, username, story_id, story_title, completion_mode
+                    ))
+                    cursor.execute(READING_ROLLUP_SQL, (user_id, date.today(), story_id, 0, 1))
                     
                     connection.commit()
+                    self._set_completion_cache(user_id, story_id, True)
                     logger.info(f"✅ 标记故事完成: user_id={user_id}, story_id={story_id}, completion_mode={completion_mode}")
                     if connection:
                         connection.close()
@@ -1420,43 +1388,24 @@ class DatabaseManager:
                 with connection.cursor() as cursor:
                     # 计算阅读进度百分比
                     reading_progress = (current_position / total_length * 100) if total_length > 0 else 0
-                    # 不自动设置完成状态，只有通过完成阅读API才能设置
-                    is_completed = False
-                    
-                    # 检查是否已存在记录
-                    check_sql = "SELECT id, start_time FROM reading_progress WHERE user_id = %s AND story_id = %s"
-                    cursor.execute(check_sql, (user_id, story_id))
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        # 更新现有记录（包括story_title，确保标题信息是最新的）
-                        update_sql = """
-                        UPDATE reading_progress 
-                        SET story_title = %s, current_position = %s, total_length = %s, reading_progress = %s,
-                            is_completed = %s, last_read_time = NOW(),
-                            completion_time = CASE WHEN %s = 1 THEN NOW() ELSE completion_time END,
-                            completion_mode = CASE WHEN %s = 1 AND %s IS NOT NULL THEN %s ELSE completion_mode END,
-                            username = %s
-                        WHERE user_id = %s AND story_id = %s
-                        """
-                        cursor.execute(update_sql, (
-                            story_title, current_position, total_length, reading_progress, is_completed,
-                            is_completed, is_completed, completion_mode, completion_mode,
-                            username, user_id, story_id
-                        ))
-                    else:
-                        # 创建新记录
-                        insert_sql = """
-                        INSERT INTO reading_progress 
-                        (user_id, username, story_id, story_title, current_position, total_length, 
-                         reading_progress, is_completed, completion_mode, start_time, completion_time)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), 
-                                CASE WHEN %s = 1 THEN NOW() ELSE NULL END)
-                        """
-                        cursor.execute(insert_sql, (
-                            user_id, username, story_id, story_title, current_position, total_length,
-                            reading_progress, is_completed, completion_mode, is_completed
-                        ))
+                    # 一条语句完成插入或更新（唯一键uk_user_story）
+                    # 新记录为未完成；已有记录的完成状态保持不变，只能通过完成阅读API或管理员接口修改
+                    upsert_sql = """
+                    INSERT INTO reading_progress 
+                    (user_id, username, story_id, story_title, current_position, total_length, 
+                     reading_progress, is_completed, start_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE, NOW())
+                    ON DUPLICATE KEY UPDATE
+                        story_title = VALUES(story_title), current_position = VALUES(current_position),
+                        total_length = VALUES(total_length), reading_progress = VALUES(reading_progress),
+                        last_read_time = NOW(), username = VALUES(username)
+                    """
+                    connection.begin()
+                    cursor.execute(upsert_sql, (
+                        user_id, username, story_id, story_title, current_position, total_length,
+                        reading_progress
+                    ))
+                    cursor.execute(READING_ROLLUP_SQL, (user_id, date.today(), story_id, 1, 0))
                     
                     connection.commit()
                     # 更新阅读进度成功，不输出日志
@@ -1543,6 +1492,97 @@ class DatabaseManager:
                     connection.close()
         return []
 
+    def bulk_update_reading_progress(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量写入阅读进度（阅读进度写缓冲使用），一条多行 INSERT ... ON DUPLICATE KEY UPDATE
+        rows中每项包含 user_id, username, story_id, story_title, current_position, total_length, last_read_time
+        已存在的记录只更新位置相关字段，完成状态保持不变
+        """
+        if not rows:
+            return 0
+
+        params = []
+        for row in rows:
+            total_length = row['total_length']
+            reading_progress = (row['current_position'] / total_length * 100) if total_length > 0 else 0
+            params.append((
+                row['user_id'], row['username'], row['story_id'], row['story_title'],
+                row['current_position'], total_length, reading_progress, False,
+                row['last_read_time'], row['last_read_time']
+            ))
+
+        rollup_params = [
+            (row['user_id'], row['last_read_time'].date(), row['story_id'], 1, 0) for row in rows
+        ]
+
+        # 使用独立连接：共享连接上还有未加锁直接提交的方法，显式事务会与其互相提交/回滚
+        # 失败时由调用方（阅读进度写缓冲）放回缓冲稍后重试
+        connection = self._get_fresh_connection()
+        try:
+            with connection.cursor() as cursor:
+                connection.begin()
+                try:
+                    # VALUES中全部为占位符时，executemany会把INSERT合并为一条多行语句
+                    cursor.executemany("""
+                    INSERT INTO reading_progress
+                    (user_id, username, story_id, story_title, current_position, total_length,
+                     reading_progress, is_completed, start_time, last_read_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        story_title = VALUES(story_title), current_position = VALUES(current_position),
+                        total_length = VALUES(total_length), reading_progress = VALUES(reading_progress),
+                        last_read_time = VALUES(last_read_time), username = VALUES(username)
+                    """, params)
+                    cursor.executemany(READING_ROLLUP_SQL, rollup_params)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            return len(rows)
+        finally:
+            connection.close()
+
+    def get_reading_completion(self, user_id: str, story_id: str) -> bool:
+        """获取故事是否已完成（经缓存，完成/管理员修改/删除记录时更新）"""
+        key = (user_id, story_id)
+        now = time.monotonic()
+        with self._completion_lock:
+            cached = self._completion_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        def _query():
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT is_completed FROM reading_progress WHERE user_id = %s AND story_id = %s",
+                    (user_id, story_id)
+                )
+                row = cursor.fetchone()
+            return bool(row and row['is_completed'])
+
+        try:
+            is_completed = self.execute_with_retry(_query)
+        except Exception as e:
+            logger.error(f"❌ 获取完成状态失败: {e}")
+            return False
+        self._set_completion_cache(user_id, story_id, is_completed)
+        return is_completed
+
+    def _set_completion_cache(self, user_id: str, story_id: str, is_completed: bool):
+        expires_at = time.monotonic() + READING_PROGRESS_BUFFER_CONFIG['completion_ttl']
+        with self._completion_lock:
+            self._completion_cache[(user_id, story_id)] = (expires_at, bool(is_completed))
+            # 顺带清理过期条目，避免无限增长
+            if len(self._completion_cache) > 50000:
+                now = time.monotonic()
+                self._completion_cache = {
+                    key: value for key, value in self._completion_cache.items() if value[0] > now
+                }
+
+    def _clear_completion_cache(self):
+        with self._completion_lock:
+            self._completion_cache.clear()
+
     def log_story_interaction(self, user_id: str, story_id: str, interaction_type: str,
                             interaction_data: Dict[str, Any] = None, device_info: str = None) -> bool:
         """记录故事交互（app_version字段已删除）"""
@@ -1598,7 +1638,7 @@ class DatabaseManager:
                 connection = self._get_fresh_connection()
 
                 with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 获取基本统计
+                    # 基本统计取每个故事的当前状态（每个用户至多一行/故事，走uk_user_story）
                     stats_sql = """
                     SELECT 
                         COUNT(DISTINCT story_id) as total_stories,
@@ -1622,13 +1662,14 @@ class DatabaseManager:
                     cursor.execute(recent_sql, (user_id,))
                     recent_stories = cursor.fetchall()
                     
-                    # 获取每日阅读统计（已移除reading_duration_seconds字段）
+                    # 每日阅读统计读每日汇总表（当天读过的故事数、完成次数）
                     daily_sql = """
-                    SELECT DATE(last_read_time) as reading_date, 
-                           COUNT(*) as daily_count
-                    FROM reading_progress 
-                    WHERE user_id = %s AND last_read_time >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY DATE(last_read_time)
+                    SELECT stat_date as reading_date, 
+                           COUNT(*) as daily_count,
+                           SUM(completions) as daily_completions
+                    FROM reading_daily_rollup 
+                    WHERE user_id = %s AND stat_date > CURDATE() - INTERVAL %s DAY
+                    GROUP BY stat_date
                     ORDER BY reading_date DESC
                     """
                     cursor.execute(daily_sql, (user_id, days))
@@ -1659,7 +1700,8 @@ class DatabaseManager:
                     for daily in daily_stats:
                         statistics['daily_reading'].append({
                             'date': daily['reading_date'].isoformat() if daily['reading_date'] else None,
-                            'count': daily['daily_count'] or 0
+                            'count': daily['daily_count'] or 0,
+                            'completions': int(daily['daily_completions'] or 0)
                         })
                     
                     # 获取阅读统计成功，不输出日志
@@ -1676,8 +1718,39 @@ class DatabaseManager:
                     connection.close()
         return {}
 
-    def get_all_users_reading_progress(self, limit=100, offset=0):
-        """获取所有用户的阅读进度（管理员功能）"""
+    def _count_rows(self, cursor, table: str, mode: str = 'exact'):
+        """
+        分页列表的总数：exact为COUNT(*)，approx为information_schema估算值（InnoDB误差可达±40%），none返回None
+        结果缓存 PAGINATION_CONFIG['count_cache_ttl'] 秒
+        """
+        if mode == 'none':
+            return None
+
+        def _load():
+            if mode == 'approx':
+                cursor.execute(
+                    "SELECT TABLE_ROWS AS count FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    (table,)
+                )
+                result = cursor.fetchone()
+                return int(result['count'] or 0) if result else 0
+            cursor.execute(f"SELECT COUNT(*) AS count FROM {table}")
+            return cursor.fetchone()['count']
+        return self.count_cache.get((table, mode), _load)
+
+    def get_all_users_reading_progress(self, limit=100, offset=0, cursor: str = None, total: str = 'exact'):
+        """
+        获取所有用户的阅读进度（管理员功能）
+        按 (last_read_time, id) 倒序；传cursor时按游标分页（忽略offset），每页耗时与翻页深度无关
+        """
+        where, params = '', []
+        if cursor:
+            condition, params = keyset_condition(
+                ['rp.last_read_time', 'rp.id'], decode_cursor('reading_progress', cursor), True, nullable_first=True
+            )
+            where = f"WHERE {condition}"
+            offset = 0
         max_retries = 3
         for attempt in range(max_retries):
             connection = None
@@ -1685,38 +1758,26 @@ class DatabaseManager:
                 # 使用新的连接避免连接状态问题
                 connection = self._get_fresh_connection()
 
-                with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    sql = """
+                with connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
+                    # (user_id, story_id)唯一，直接按last_read_time索引（隐含主键id）扫描，无需去重
+                    sql = f"""
                     SELECT rp.*, u.username 
                     FROM reading_progress rp
                     LEFT JOIN users u ON rp.user_id = u.user_id
-                    WHERE rp.id IN (
-                        SELECT MAX(id) 
-                        FROM reading_progress 
-                        GROUP BY user_id, story_id
-                    )
-                    ORDER BY rp.last_read_time DESC
+                    {where}
+                    ORDER BY rp.last_read_time DESC, rp.id DESC
                     LIMIT %s OFFSET %s
                     """
-                    cursor.execute(sql, (limit, offset))
-                    results = cursor.fetchall()
-                    
-                    # 获取总数（只统计唯一的用户-故事组合）
-                    count_sql = """
-                    SELECT COUNT(*) as count FROM (
-                        SELECT MAX(id) 
-                        FROM reading_progress 
-                        GROUP BY user_id, story_id
-                    ) as unique_records
-                    """
-                    cursor.execute(count_sql)
-                    total_count = cursor.fetchone()['count']
+                    db_cursor.execute(sql, params + [limit, offset])
+                    results = db_cursor.fetchall()
                     
                     return {
                         'progress_list': results,
-                        'total_count': total_count,
+                        'total_count': self._count_rows(db_cursor, 'reading_progress', total),
+                        'total_approximate': total == 'approx',
                         'limit': limit,
-                        'offset': offset
+                        'offset': offset,
+                        'next_cursor': next_cursor('reading_progress', results, limit)
                     }
 
             except Exception as e:
@@ -1746,6 +1807,8 @@ class DatabaseManager:
                     
                     if cursor.rowcount > 0:
                         self.connection.commit()
+                        # 只知道记录ID，清空全部完成状态缓存
+                        self._clear_completion_cache()
                         # 删除阅读记录成功，不输出日志
                         return True
                     else:
@@ -1781,6 +1844,7 @@ class DatabaseManager:
                     
                     if cursor.rowcount > 0:
                         self.connection.commit()
+                        self.user_cache.invalidate(user_id)
                         # 重置用户密码成功，不输出日志
                         return True
                     else:
@@ -1847,37 +1911,32 @@ class DatabaseManager:
                     self.reconnect()
 
                 with self.connection.cursor() as cursor:
-                    # 检查记录是否存在
-                    check_sql = "SELECT id, is_completed FROM reading_progress WHERE user_id = %s AND story_id = %s"
-                    cursor.execute(check_sql, (user_id, story_id))
-                    existing = cursor.fetchone()
-                    
-                    if not existing:
-                        return False, "阅读记录不存在"
-                    
-                    record_id, current_status = existing
-                    
-                    # 更新完成状态
+                    # 按唯一键直接更新完成状态
                     if is_completed:
                         update_sql = """
                         UPDATE reading_progress 
                         SET is_completed = 1, completion_time = NOW(), last_read_time = NOW()
                         WHERE user_id = %s AND story_id = %s
                         """
-                        cursor.execute(update_sql, (user_id, story_id))
-                        
-                        # 管理员操作记录已移除（admin_operations表已删除）
                     else:
                         update_sql = """
                         UPDATE reading_progress 
                         SET is_completed = 0, completion_time = NULL, last_read_time = NOW()
                         WHERE user_id = %s AND story_id = %s
                         """
-                        cursor.execute(update_sql, (user_id, story_id))
-                        
-                        # 管理员操作记录已移除（admin_operations表已删除）
+                    cursor.execute(update_sql, (user_id, story_id))
+                    
+                    if cursor.rowcount == 0:
+                        # 同一秒内重复操作时值未变化，影响行数也为0，再确认一次记录是否存在
+                        cursor.execute(
+                            "SELECT 1 FROM reading_progress WHERE user_id = %s AND story_id = %s",
+                            (user_id, story_id)
+                        )
+                        if not cursor.fetchone():
+                            return False, "阅读记录不存在"
                     
                     self.connection.commit()
+                    self._set_completion_cache(user_id, story_id, is_completed)
                     
                     action = "标记为已完成" if is_completed else "取消完成状态"
                     # 管理员操作成功，不输出日志
@@ -1892,46 +1951,261 @@ class DatabaseManager:
                     return False, str(e)
         return False, "操作失败"
 
-    # log_admin_operation 方法已删除（admin_operations表已删除）
+    def _run_bulk_chunks(self, items: list, chunk_size: int, apply, action: str):
+        """
+        在同一连接上按块执行批量操作，每块一个事务
+        items为 (结果, 参数) 列表；apply(cursor, chunk) 写入每项结果，返回提交后要执行的回调
+        某块出错时回滚该块、该块各项记为error，重新连接后继续下一块
+        """
+        if not items:
+            return
+        connection = None
+        done = 0
+        try:
+            connection = self._get_fresh_connection()
+            for offset in range(0, len(items), chunk_size):
+                chunk = items[offset:offset + chunk_size]
+                try:
+                    connection.begin()
+                    with connection.cursor() as cursor:
+                        after_commit = apply(cursor, chunk)
+                    connection.commit()
+                except Exception as e:
+                    logger.error(f"❌ {action}失败 (第 {offset + 1}-{offset + len(chunk)} 项): {e}")
+                    try:
+                        connection.rollback()
+                    except Exception:
+                        pass
+                    for result, _ in chunk:
+                        result['success'] = False
+                        result.pop('message', None)
+                        result['error'] = str(e)
+                    done = offset + len(chunk)
+                    connection.close()
+                    connection = self._get_fresh_connection()
+                    continue
+                done = offset + len(chunk)
+                if after_commit:
+                    after_commit()
+        except Exception as e:
+            logger.error(f"❌ {action}失败: {e}")
+            for result, _ in items[done:]:
+                result['success'] = False
+                result['error'] = str(e)
+        finally:
+            if connection:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
 
-    def get_user_by_id(self, user_id):
-        """根据用户ID获取用户基本信息"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            connection = None
+    @staticmethod
+    def _apply_reading_operations(cursor, chunk: list):
+        """执行一块管理员阅读进度操作：先写进度（可能新建记录），再按最后一次操作设置完成状态"""
+        progress_items = [item for item in chunk if item[1]['type'] == 'update_progress']
+        completion_items = [item for item in chunk if item[1]['type'] != 'update_progress']
+
+        if progress_items:
+            user_ids = list(dict.fromkeys(operation['user_id'] for _, operation in progress_items))
+            cursor.execute(
+                f"SELECT user_id, username FROM users WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})",
+                user_ids
+            )
+            usernames = {row['user_id']: row['username'] for row in cursor.fetchall()}
+            params, rollup_params = [], []
+            now = datetime.now()
+            today = now.date()
+            for result, operation in progress_items:
+                # 禁止使用unknown作为用户名
+                username = usernames.get(operation['user_id'])
+                if not username or username == 'unknown':
+                    result['message'] = '用户不存在'
+                    continue
+                try:
+                    current_position = int(operation.get('current_position', 0))
+                    total_length = int(operation.get('total_length', 100))
+                except (TypeError, ValueError):
+                    result['message'] = '参数无效'
+                    continue
+                reading_progress = (current_position / total_length * 100) if total_length > 0 else 0
+                params.append((
+                    operation['user_id'], username, operation['story_id'], "管理员批量操作",
+                    current_position, total_length, reading_progress, False, now, now
+                ))
+                rollup_params.append((operation['user_id'], today, operation['story_id'], 1, 0))
+                result['success'] = True
+                result['message'] = f"更新进度为 {operation.get('progress', 0)}%"
+            if params:
+                # 与update_reading_progress相同的upsert；VALUES中全部为占位符时，executemany才会合并为一条多行语句
+                cursor.executemany("""
+                INSERT INTO reading_progress 
+                (user_id, username, story_id, story_title, current_position, total_length, 
+                 reading_progress, is_completed, start_time, last_read_time)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    story_title = VALUES(story_title), current_position = VALUES(current_position),
+                    total_length = VALUES(total_length), reading_progress = VALUES(reading_progress),
+                    last_read_time = VALUES(last_read_time), username = VALUES(username)
+                """, params)
+                cursor.executemany(READING_ROLLUP_SQL, rollup_params)
+
+        if not completion_items:
+            return None
+
+        keys = list(dict.fromkeys((operation['user_id'], operation['story_id'])
+                                  for _, operation in completion_items))
+        cursor.execute(
+            f"SELECT user_id, story_id FROM reading_progress "
+            f"WHERE (user_id, story_id) IN ({', '.join(['(%s, %s)'] * len(keys))})",
+            [value for key in keys for value in key]
+        )
+        existing = {(row['user_id'], row['story_id']) for row in cursor.fetchall()}
+
+        # 同一记录出现多次时以最后一次操作为准
+        final_state = {}
+        for result, operation in completion_items:
+            key = (operation['user_id'], operation['story_id'])
+            if key not in existing:
+                result['message'] = '阅读记录不存在'
+                continue
+            is_completed = operation['type'] == 'mark_completed'
+            final_state[key] = is_completed
+            result['success'] = True
+            result['message'] = '成功标记为已完成' if is_completed else '成功取消完成状态'
+
+        for is_completed, assignments in (
+            (True, "is_completed = 1, completion_time = NOW(), last_read_time = NOW()"),
+            (False, "is_completed = 0, completion_time = NULL, last_read_time = NOW()")
+        ):
+            targets = [key for key, state in final_state.items() if state == is_completed]
+            if targets:
+                cursor.execute(
+                    f"UPDATE reading_progress SET {assignments} "
+                    f"WHERE (user_id, story_id) IN ({', '.join(['(%s, %s)'] * len(targets))})",
+                    [value for key in targets for value in key]
+                )
+        return final_state
+
+    def bulk_admin_reading_operations(self, operations: List[Dict[str, Any]],
+                                      chunk_size: int = None) -> List[Dict[str, Any]]:
+        """
+        管理员批量操作阅读进度，operations每项为 {type, user_id, story_id, progress, current_position, total_length}
+        type为 mark_completed / mark_incomplete / update_progress
+        每块（chunk_size项）一个事务：一次查用户名、一条多行进度upsert、一次查记录是否存在、每种完成状态一条UPDATE
+        返回与operations一一对应的结果 {user_id, story_id, type, success, message}，执行出错的项为error
+        """
+        results, items = [], []
+        for operation in operations:
+            operation = operation if isinstance(operation, dict) else {}
+            result = {
+                'user_id': operation.get('user_id'),
+                'story_id': operation.get('story_id'),
+                'type': operation.get('type'),
+                'success': False
+            }
+            results.append(result)
+            if result['type'] not in ('mark_completed', 'mark_incomplete', 'update_progress'):
+                result['message'] = '未知操作类型'
+            elif not result['user_id'] or not result['story_id']:
+                result['message'] = '缺少必要参数'
+            else:
+                items.append((result, operation))
+
+        def _apply(cursor, chunk):
+            final_state = self._apply_reading_operations(cursor, chunk)
+            if not final_state:
+                return None
+
+            def _update_cache():
+                for (user_id, story_id), is_completed in final_state.items():
+                    self._set_completion_cache(user_id, story_id, is_completed)
+            return _update_cache
+
+        self._run_bulk_chunks(items, chunk_size or ADMIN_BULK_CONFIG['chunk_size'], _apply, '管理员批量操作阅读进度')
+        return results
+
+    def bulk_delete_reading_records(self, record_ids: List[Any], chunk_size: int = None) -> List[Dict[str, Any]]:
+        """
+        批量删除阅读记录，每块（chunk_size条）一个事务：一次锁定并查出存在的记录、一条 DELETE ... WHERE id IN (...)
+        返回与record_ids一一对应的结果 {record_id, success, message}，执行出错的项为error
+        """
+        results, items, first_results = [], [], {}
+        for record_id in record_ids:
+            result = {'record_id': record_id, 'success': False}
+            results.append(result)
             try:
-                # 使用新的连接避免连接状态问题
-                connection = self._get_fresh_connection()
+                record_id = int(record_id)
+            except (TypeError, ValueError):
+                result['message'] = '记录ID无效'
+                continue
+            # 重复的ID只删除一次，结果与第一次出现相同
+            if record_id not in first_results:
+                first_results[record_id] = result
+                items.append((result, record_id))
 
-                with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    sql = """
-                    SELECT user_id, username, created_at, last_login_at, is_active
-                    FROM users 
-                    WHERE user_id = %s
-                    """
-                    cursor.execute(sql, (user_id,))
-                    result = cursor.fetchone()
-                    
-                    if connection:
-                        connection.close()
-                    return result
+        def _apply(cursor, chunk):
+            ids = [record_id for _, record_id in chunk]
+            cursor.execute(
+                f"SELECT id, user_id, story_id FROM reading_progress "
+                f"WHERE id IN ({', '.join(['%s'] * len(ids))}) FOR UPDATE",
+                ids
+            )
+            found = {row['id']: (row['user_id'], row['story_id']) for row in cursor.fetchall()}
+            if found:
+                cursor.execute(
+                    f"DELETE FROM reading_progress WHERE id IN ({', '.join(['%s'] * len(found))})",
+                    list(found)
+                )
+            for result, record_id in chunk:
+                result['success'] = record_id in found
+                result['message'] = '记录删除成功' if record_id in found else '记录不存在'
 
-            except Exception as e:
-                # 只记录有意义的错误
-                if str(e) and str(e) != "(0, '')":
-                    logger.error(f"❌ 获取用户信息失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                else:
-                    return None
-            finally:
-                if connection:
-                    try:
-                        connection.close()
-                    except:
-                        pass
+            def _update_cache():
+                # 记录已删除，完成状态即为未完成
+                for user_id, story_id in found.values():
+                    self._set_completion_cache(user_id, story_id, False)
+            return _update_cache
+
+        self._run_bulk_chunks(items, chunk_size or ADMIN_BULK_CONFIG['chunk_size'], _apply, '批量删除阅读记录')
+        for result in results:
+            if 'message' not in result and 'error' not in result:
+                first = first_results[int(result['record_id'])]
+                result.update({key: value for key, value in first.items() if key != 'record_id'})
+        return results
+
+    # log_admin_operation 方法已删除（admin_operations表已删除）
+
+    def get_user_by_id(self, user_id):
+        """根据用户ID获取用户基本信息（经用户目录缓存）"""
+        try:
+            user = self.user_cache.get(user_id)
+        except Exception as e:
+            # 只记录有意义的错误
+            if str(e) and str(e) != "(0, '')":
+                logger.error(f"❌ 获取用户信息失败: {e}")
+            return None
+        # 缓存键也可能是按username匹配到的用户
+        if user and user['user_id'] == user_id:
+            return user
         return None
 
+    def set_user_active(self, user_id: str, is_active: bool) -> bool:
+        """启用或禁用用户"""
+        def _update():
+            with self.connection.cursor() as cursor:
+                sql = "UPDATE users SET is_active = %s WHERE user_id = %s"
+                cursor.execute(sql, (bool(is_active), user_id))
+                self.connection.commit()
+        try:
+            self.execute_with_retry(_update)
+        except Exception as e:
+            logger.error(f"❌ 更新用户状态失败: {e}")
+            return False
+        finally:
+            self.user_cache.invalidate(user_id)
+        # 状态未变化时rowcount为0，以用户是否存在为准
+        return self.get_user_by_id(user_id) is not None
+
     def get_user_reading_progress_details(self, user_id):
         """获取用户阅读进度详情"""
         max_retries = 3
@@ -1970,7 +2244,7 @@ class DatabaseManager:
         return []
 
     def get_user_reading_summary(self, user_id):
-        """获取用户阅读摘要（管理员查看）"""
+        """获取用户阅读摘要（管理员查看），最近30天的完成次数读每日汇总表"""
         max_retries = 3
         for attempt in range(max_retries):
             connection = None
@@ -1987,7 +2261,7 @@ class DatabaseManager:
                     if not user_info:
                         return None
                     
-                    # 获取阅读统计
+                    # 各故事的当前状态（每个用户至多一行/故事，走uk_user_story）
                     stats_sql = """
                     SELECT 
                         COUNT(*) as total_stories,
@@ -1999,16 +2273,27 @@ class DatabaseManager:
                     """
                     cursor.execute(stats_sql, (user_id,))
                     stats = cursor.fetchone()
+
+                    recent_sql = """
+                    SELECT COUNT(DISTINCT stat_date) as active_days,
+                           COALESCE(SUM(completions), 0) as completions
+                    FROM reading_daily_rollup
+                    WHERE user_id = %s AND stat_date > CURDATE() - INTERVAL 30 DAY
+                    """
+                    cursor.execute(recent_sql, (user_id,))
+                    recent = cursor.fetchone()
                     
                     return {
                         'user_id': user_id,
-                        'username': user_info[0],
-                        'created_at': user_info[1],
-                        'last_login_at': user_info[2],
-                        'total_stories': stats[0] or 0,
-                        'completed_stories': stats[1] or 0,
-                        'avg_progress': float(stats[2]) if stats[2] else 0.0,
-                        'last_reading_time': stats[3]
+                        'username': user_info['username'],
+                        'created_at': user_info['created_at'],
+                        'last_login_at': user_info['last_login_at'],
+                        'total_stories': stats['total_stories'] or 0,
+                        'completed_stories': int(stats['completed_stories'] or 0),
+                        'avg_progress': float(stats['avg_progress']) if stats['avg_progress'] else 0.0,
+                        'last_reading_time': stats['last_reading_time'],
+                        'active_days_30d': recent['active_days'] or 0,
+                        'completions_30d': int(recent['completions'])
                     }
 
             except Exception as e:
@@ -2028,8 +2313,27 @@ class DatabaseManager:
         """
         获取所有故事列表
         注意：stories表已删除，故事数据现在从Excel文件读取（只返回30个故事）
+        解析结果按Excel文件修改时间缓存，返回副本
         """
         import os
+        excel_file = os.path.join(os.path.dirname(__file__), 'Story_v2.xlsx')
+        try:
+            mtime = os.path.getmtime(excel_file)
+        except OSError:
+            mtime = None
+
+        cached = self._stories_cache
+        if cached is not None and mtime is not None and cached[0] == mtime:
+            return [dict(story) for story in cached[1]]
+
+        stories = self._load_stories_from_excel()
+        if stories and mtime is not None:
+            self._stories_cache = (mtime, stories)
+        return [dict(story) for story in stories]
+
+    def _load_stories_from_excel(self) -> List[Dict]:
+        """解析Story_v2.xlsx生成故事列表"""
+        import os
         from openpyxl import load_workbook
         from openpyxl.cell.rich_text import TextBlock, CellRichText
         
@@ -2486,33 +2790,43 @@ class DatabaseManager:
                     connection.close()
         return []
 
-    def get_all_users_interaction_progress(self, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
-        """获取所有用户的AI使用进度（管理员用）"""
+    def get_all_users_interaction_progress(self, limit: int = 100, offset: int = 0, cursor: str = None,
+                                           total: str = 'exact') -> Dict[str, Any]:
+        """
+        获取所有用户的AI使用进度（管理员用）
+        按 (user_id, usage_date) 倒序，与唯一键uk_user_date方向一致，可直接反向扫描索引；传cursor时按游标分页
+        """
+        where, params = '', []
+        if cursor:
+            condition, params = keyset_condition(
+                ['user_id', 'usage_date'], decode_cursor('interaction_progress', cursor), True
+            )
+            where = f"WHERE {condition}"
+            offset = 0
+        empty_result = {'total': 0 if total != 'none' else None, 'limit': limit, 'offset': offset,
+                        'data': [], 'next_cursor': None}
         max_retries = 3
         for attempt in range(max_retries):
             connection = None
             try:
                 connection = self._get_fresh_connection()
                 
-                with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    # 获取总数
-                    count_sql = "SELECT COUNT(*) as total FROM interaction_progress"
-                    cursor.execute(count_sql)
-                    total = cursor.fetchone()['total']
-                    
+                with connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
                     # 获取分页数据
-                    sql = """
+                    sql = f"""
                     SELECT user_id, username, usage_date, total_interactions, text_interactions,
                            voice_interactions, tts_interactions, session_count, unique_session_ids,
                            first_interaction_time, last_interaction_time, time_span_minutes,
                            estimated_usage_time_minutes, explicit_duration_seconds, is_completed_5min,
                            created_at, updated_at
                     FROM interaction_progress 
-                    ORDER BY user_id, usage_date DESC
+                    {where}
+                    ORDER BY user_id DESC, usage_date DESC
                     LIMIT %s OFFSET %s
                     """
-                    cursor.execute(sql, (limit, offset))
-                    results = cursor.fetchall()
+                    db_cursor.execute(sql, params + [limit, offset])
+                    results = db_cursor.fetchall()
+                    row_count = self._count_rows(db_cursor, 'interaction_progress', total)
                     
                     # 处理结果
                     progress_list = []
@@ -2538,13 +2852,13 @@ class DatabaseManager:
                         }
                         progress_list.append(progress)
                     
-                    if connection:
-                        connection.close()
                     return {
-                        'total': total,
+                        'total': row_count,
+                        'total_approximate': total == 'approx',
                         'limit': limit,
                         'offset': offset,
-                        'data': progress_list
+                        'data': progress_list,
+                        'next_cursor': next_cursor('interaction_progress', progress_list, limit)
                     }
                     
             except Exception as e:
@@ -2552,11 +2866,11 @@ class DatabaseManager:
                 if attempt < max_retries - 1:
                     time.sleep(1)
                 else:
-                    return {'total': 0, 'limit': limit, 'offset': offset, 'data': []}
+                    return empty_result
             finally:
                 if connection:
                     connection.close()
-        return {'total': 0, 'limit': limit, 'offset': offset, 'data': []}
+        return empty_result
 
     def _update_daily_interaction_progress(self, user_id: str, username: str):
         """
@@ -2575,20 +2889,7 @@ class DatabaseManager:
                 connection = self._get_fresh_connection()
                 
                 with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                    sql = """
-                    SELECT 
-                        interaction_type,
-                        timestamp,
-                        session_id,
-                        duration_seconds
-                    FROM interactions
-                    WHERE user_id = %s
-                        AND DATE(timestamp) = %s
-                        AND interaction_type IN ('text', 'voice_home', 'voice_call', 'tts_play')
-                        AND success = 1
-                    ORDER BY timestamp ASC
-                    """
-                    cursor.execute(sql, (user_id, today))
+                    cursor.execute(DAILY_INTERACTIONS_SQL, (user_id, today, today + timedelta(days=1)))
                     interactions = cursor.fetchall()
                     
                     if not interactions:
@@ -2733,5 +3034,8 @@ class DatabaseManager:
             # 静默处理，不影响主流程
             logger.debug(f"异步更新interaction_progress异常: {e}")
 
+# 为数据库方法加上链路追踪span（db.<方法名>）
+instrument_methods(DatabaseManager, 'db', exclude=('hash_password', 'verify_password'))
+
 # 全局数据库管理器实例
 db_manager = DatabaseManager()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构迁移 - 对已有数据库补齐 CREATE_TABLES_SQL 之后新增的约束和索引
+
+DatabaseManager 初始化时自动执行（多进程同时启动时用MySQL命名锁串行化，已迁移的步骤直接跳过），
+也可以在部署前手动执行，先用 --dry-run 查看需要处理的数据量。
+
+用法:
+    python db_migrations.py [--dry-run]
+"""
+import io
+import sys
+import time
+import argparse
+import logging
+import pymysql
+from database_config import DATABASE_CONFIG, CREATE_TABLES_SQL
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_NAME = 'nexus_schema_migration'
+MIGRATION_LOCK_TIMEOUT = 300  # 等待其他进程完成迁移的最长时间（秒）
+
+# 同一(user_id, story_id)的重复记录：保留id最大的一条
+_DUPLICATE_GROUPS_SQL = """
+SELECT user_id, story_id, MAX(id) AS keep_id, COUNT(*) AS row_count,
+       MAX(is_completed) AS is_completed, MIN(start_time) AS start_time,
+       MAX(last_read_time) AS last_read_time, MAX(completion_time) AS completion_time,
+       MAX(completion_mode) AS completion_mode
+FROM reading_progress
+GROUP BY user_id, story_id
+HAVING COUNT(*) > 1
+"""
+
+
+def _index_exists(cursor, table: str, index_name: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, index_name)
+    )
+    return cursor.fetchone()['count'] > 0
+
+
+def count_reading_progress_duplicates(cursor) -> dict:
+    """统计重复的用户-故事组合数和多余的行数"""
+    cursor.execute(f"SELECT COUNT(*) AS groups_count, COALESCE(SUM(row_count - 1), 0) AS extra_rows "
+                   f"FROM ({_DUPLICATE_GROUPS_SQL}) AS duplicates")
+    result = cursor.fetchone()
+    return {'groups': int(result['groups_count']), 'extra_rows': int(result['extra_rows'])}
+
+
+def dedupe_reading_progress(connection) -> int:
+    """
+    合并重复的阅读进度记录（一次性），返回删除的行数
+    保留id最大的一条，完成状态取任一条已完成，开始时间取最早，最后阅读/完成时间取最晚
+    """
+    with connection.cursor() as cursor:
+        connection.begin()
+        try:
+            cursor.execute(f"""
+            UPDATE reading_progress rp
+            JOIN ({_DUPLICATE_GROUPS_SQL}) d ON rp.id = d.keep_id
+            SET rp.is_completed = d.is_completed,
+                rp.start_time = d.start_time,
+                rp.last_read_time = d.last_read_time,
+                rp.completion_time = d.completion_time,
+                rp.completion_mode = COALESCE(rp.completion_mode, d.completion_mode)
+            """)
+            cursor.execute(f"""
+            DELETE rp FROM reading_progress rp
+            JOIN ({_DUPLICATE_GROUPS_SQL}) d
+              ON rp.user_id = d.user_id AND rp.story_id = d.story_id AND rp.id <> d.keep_id
+            """)
+            deleted = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return deleted
+
+
+def migrate_reading_progress_unique_key(connection) -> dict:
+    """reading_progress 去重并添加唯一键 uk_user_story(user_id, story_id)"""
+    with connection.cursor() as cursor:
+        if _index_exists(cursor, 'reading_progress', 'uk_user_story'):
+            return {'applied': False, 'deleted': 0}
+
+    start_time = time.time()
+    deleted = dedupe_reading_progress(connection)
+    with connection.cursor() as cursor:
+        # 唯一键可以替代原来的普通联合索引
+        if _index_exists(cursor, 'reading_progress', 'idx_user_story'):
+            cursor.execute(
+                "ALTER TABLE reading_progress "
+                "ADD UNIQUE KEY uk_user_story (user_id, story_id), DROP INDEX idx_user_story"
+            )
+        else:
+            cursor.execute("ALTER TABLE reading_progress ADD UNIQUE KEY uk_user_story (user_id, story_id)")
+    logger.info(f"✅ reading_progress已添加唯一键，合并删除重复记录 {deleted} 条，耗时 {time.time() - start_time:.1f}s")
+    return {'applied': True, 'deleted': deleted}
+
+
+def migrate_sessions_backfill(connection) -> dict:
+    """
+    sessions表为空时从旧数据补齐会话（一次性）：users表中的当前会话视为未结束，
+    interactions中出现过的其他会话按首末交互时间写入，一天前就没有活动的标记为已结束
+    """
+    with connection.cursor() as cursor:
+        # 单独执行本脚本时表可能还没建
+        cursor.execute(CREATE_TABLES_SQL['sessions'])
+        cursor.execute("SELECT 1 FROM sessions LIMIT 1")
+        if cursor.fetchone():
+            return {'applied': False, 'inserted': 0}
+
+    start_time = time.time()
+    with connection.cursor() as cursor:
+        connection.begin()
+        try:
+            cursor.execute("""
+            INSERT IGNORE INTO sessions
+                (session_id, user_id, app_type, device_info, ip_address, created_at, last_seen_at)
+            SELECT session_id, user_id, app_type, device_info, ip_address,
+                   COALESCE(last_login_at, NOW()), COALESCE(last_login_at, NOW())
+            FROM users
+            WHERE session_id IS NOT NULL AND session_id <> ''
+            """)
+            inserted = cursor.rowcount
+            cursor.execute("""
+            INSERT IGNORE INTO sessions (session_id, user_id, created_at, last_seen_at, ended_at, end_reason)
+            SELECT session_id, user_id, MIN(timestamp), MAX(timestamp),
+                   CASE WHEN MAX(timestamp) < NOW() - INTERVAL 1 DAY THEN MAX(timestamp) END,
+                   CASE WHEN MAX(timestamp) < NOW() - INTERVAL 1 DAY THEN 'idle' END
+            FROM interactions
+            WHERE session_id IS NOT NULL AND session_id <> ''
+            GROUP BY user_id, session_id
+            """)
+            inserted += cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    if inserted:
+        logger.info(f"✅ sessions已从旧数据补齐会话 {inserted} 个，耗时 {time.time() - start_time:.1f}s")
+    return {'applied': inserted > 0, 'inserted': inserted}
+
+
+# 新增的普通索引：(表名, 索引名, 索引列, 被替代的旧索引)
+# 旧索引是新索引的最左前缀时可以删除，减少写入开销
+INDEX_MIGRATIONS = [
+    ('interactions', 'idx_user_session_time', 'user_id, session_id, timestamp', None),  # 对话列表按会话汇总
+    ('interactions', 'idx_user_time', 'user_id, timestamp', 'idx_user_id'),  # 按用户取交互记录、按天统计
+    ('interactions', 'idx_session_time', 'session_id, timestamp', 'idx_session_id'),  # 按会话取交互记录
+]
+
+
+def add_index(connection, table: str, index_name: str, columns: str, replaces: str = None) -> dict:
+    """索引不存在时在线添加（INPLACE，不阻塞读写），并删除被替代的旧索引"""
+    with connection.cursor() as cursor:
+        has_index = _index_exists(cursor, table, index_name)
+        drop_old = replaces is not None and _index_exists(cursor, table, replaces)
+        if has_index and not drop_old:
+            return {'applied': False}
+        start_time = time.time()
+        if not has_index:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE")
+        if drop_old:
+            # 新索引建好后再删旧索引，外键始终有可用的索引
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {replaces}, ALGORITHM=INPLACE, LOCK=NONE")
+    dropped = f"，删除旧索引 {replaces}" if drop_old else ''
+    logger.info(f"✅ {table}已添加索引 {index_name}({columns}){dropped}，耗时 {time.time() - start_time:.1f}s")
+    return {'applied': True}
+
+
+def _index_migration(table: str, index_name: str, columns: str, replaces: str = None):
+    def migrate(connection):
+        return add_index(connection, table, index_name, columns, replaces)
+    return migrate
+
+
+# 按顺序执行的迁移步骤
+MIGRATIONS = [
+    ('reading_progress_unique_key', migrate_reading_progress_unique_key),
+    ('sessions_backfill', migrate_sessions_backfill),
+] + [
+    (f"{table}_{index_name}", _index_migration(table, index_name, columns, replaces))
+    for table, index_name, columns, replaces in INDEX_MIGRATIONS
+]
+
+
+def run_migrations(connection) -> dict:
+    """执行全部迁移（持有MySQL命名锁，其他进程等待后会发现已迁移并跳过）"""
+    results = {}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if not cursor.fetchone()['locked']:
+            raise RuntimeError('等待数据库迁移锁超时')
+    try:
+        for name, migration in MIGRATIONS:
+            results[name] = migration(connection)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库结构迁移')
+    parser.add_argument('--dry-run', action='store_true', help='只统计需要处理的数据，不做修改')
+    args = parser.parse_args()
+
+    config = DATABASE_CONFIG.copy()
+    config.update({
+        'autocommit': True,
+        'charset': 'utf8mb4',
+        'use_unicode': True,
+        'cursorclass': pymysql.cursors.DictCursor
+    })
+    connection = pymysql.connect(**config)
+    try:
+        with connection.cursor() as cursor:
+            has_key = _index_exists(cursor, 'reading_progress', 'uk_user_story')
+            duplicates = count_reading_progress_duplicates(cursor)
+        print(f"📋 reading_progress唯一键: {'已存在' if has_key else '未添加'}")
+        print(f"📋 重复的用户-故事组合: {duplicates['groups']} 个，多余记录 {duplicates['extra_rows']} 条")
+        with connection.cursor() as cursor:
+            for table, index_name, columns, _ in INDEX_MIGRATIONS:
+                status = '已存在' if _index_exists(cursor, table, index_name) else '未添加'
+                print(f"📋 {table}索引 {index_name}({columns}): {status}")
+        if args.dry_run:
+            return 0
+
+        results = run_migrations(connection)
+        for name, result in results.items():
+            status = '已执行' if result['applied'] else '无需执行'
+            detail = ''
+            if result.get('deleted'):
+                detail = f"，删除重复记录 {result['deleted']} 条"
+            elif result.get('inserted'):
+                detail = f"，补齐会话 {result['inserted']} 个"
+            print(f"✅ {name}: {status}{detail}")
+        return 0
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    # 设置标准输出为UTF-8编码（Windows兼容）
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
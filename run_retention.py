@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+手动清理过期数据（与服务后台低峰时段的清理相同：按主键分批删除、可中断续跑、可选归档）
+服务正在清理时（拿不到清理锁）直接退出；Ctrl+C 会在当前批次完成后停止，下次从水位继续
+
+用法:
+    python run_retention.py --dry-run                      # 只统计各表过期行数
+    python run_retention.py [--tables interactions,system_logs] [--days 90]
+                            [--batch-size 1000] [--sleep 0.2] [--archive-dir ./retention_archive]
+                            [--max-minutes 60]
+"""
+import io
+import sys
+import time
+import argparse
+import pymysql
+from database_config import DATABASE_CONFIG, CREATE_TABLES_SQL
+from backend.config import RETENTION_CONFIG
+from backend.retention import RetentionEngine
+
+
+def connect():
+    config = DATABASE_CONFIG.copy()
+    config.update({
+        'autocommit': True,
+        'charset': 'utf8mb4',
+        'use_unicode': True,
+        'cursorclass': pymysql.cursors.DictCursor
+    })
+    return pymysql.connect(**config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分批清理过期数据')
+    parser.add_argument('--tables', help=f"逗号分隔，默认全部：{','.join(RETENTION_CONFIG['policies'])}")
+    parser.add_argument('--days', type=int, help='保留天数，默认使用各表配置')
+    parser.add_argument('--batch-size', type=int, default=RETENTION_CONFIG['batch_size'], help='每批删除行数')
+    parser.add_argument('--sleep', type=float, default=RETENTION_CONFIG['sleep_seconds'], help='批次之间的间隔（秒）')
+    parser.add_argument('--archive-dir', default=RETENTION_CONFIG['archive_dir'], help='删除前归档为.jsonl.gz的目录')
+    parser.add_argument('--max-minutes', type=float, help='最长运行时间，超出后暂停')
+    parser.add_argument('--dry-run', action='store_true', help='只统计过期行数，不删除')
+    args = parser.parse_args()
+
+    config = dict(RETENTION_CONFIG, batch_size=args.batch_size, sleep_seconds=args.sleep,
+                  archive_dir=args.archive_dir)
+    tables = args.tables.split(',') if args.tables else None
+    deadline = time.time() + args.max_minutes * 60 if args.max_minutes else None
+
+    connection = connect()
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLES_SQL['retention_state'])
+    connection.close()
+
+    engine = RetentionEngine(connect, config)
+    try:
+        report = engine.run(tables=tables, days=args.days, deadline=deadline,
+                            dry_run=args.dry_run)
+    except KeyboardInterrupt:
+        # 已完成的批次都已保存水位
+        print("\n⏸️ 已中断，下次从水位继续")
+        return 1
+    except Exception as e:
+        print(f"❌ 清理失败: {e}")
+        return 1
+
+    if report is None:
+        print("⏭️ 其他进程正在清理过期数据，稍后再试")
+        return 1
+
+    failed = False
+    for table, item in report.items():
+        if item['status'] == 'dry_run':
+            print(f"📊 {table}: 截止 {item['cutoff']}，过期 {item['expired']} 行")
+        elif item['status'] == 'error':
+            failed = True
+            print(f"❌ {table}: {item['error']}")
+        else:
+            icon = '✅' if item['status'] == 'done' else '⏸️'
+            print(f"{icon} {table}: 删除 {item['deleted']} 行，{item['batches']} 批，"
+                  f"{item['seconds']}s，{item['rows_per_sec']} 行/秒")
+            if item.get('archive_file'):
+                print(f"   📦 归档 {item['archived']} 行: {item['archive_file']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    # 设置标准输出为UTF-8编码（Windows兼容）
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
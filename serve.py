@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NEXUS生产服务启动脚本（替代开发服务器 app.run）
+
+- Windows使用waitress（多线程），Linux优先使用gunicorn（gthread，多进程×多线程）
+- --backend uvicorn 启动ASGI入口（asgi.py）：流式聊天/TTS/故事接口为异步实现，一个进程可承载数千个并发流
+- 进程数、线程数、连接上限、排空时间见 backend/config.py 的 SERVER_CONFIG，可用环境变量或命令行覆盖
+- 启动前预加载故事目录和edge-tts音色列表（gunicorn在fork前的主进程中执行）
+- 收到SIGTERM/SIGINT（Windows为Ctrl+C/Ctrl+Break）后：新请求返回503，
+  等待进行中的请求和SSE流结束（最长drain_seconds），再停止后台线程、执行关闭钩子
+
+用法:
+    python serve.py [--backend auto|waitress|gunicorn|uvicorn] [--workers 1] [--threads 32] [--port 5000]
+"""
+import os
+import sys
+import signal
+import argparse
+import threading
+
+# 设置标准输出编码为UTF-8（Windows兼容）
+if sys.platform == 'win32':
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+
+from backend.config import SERVER_CONFIG
+from backend.logger_config import startup_logger, logger
+
+
+def choose_backend(requested: str) -> str:
+    """auto时：非Windows且安装了gunicorn用gunicorn，否则用waitress"""
+    if requested != 'auto':
+        return requested
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    return 'waitress'
+
+
+def serve_waitress(options: dict) -> int:
+    """waitress单进程多线程服务，主线程负责信号处理和优雅关闭"""
+    try:
+        from waitress.server import create_server
+    except ImportError:
+        startup_logger.error("❌ 未安装waitress，请执行: pip install waitress")
+        return 1
+
+    import app as app_module
+    from backend import lifecycle
+
+    if options['workers'] > 1:
+        logger.warning(f"⚠️ waitress为单进程服务，忽略workers={options['workers']}，请通过threads调整并发")
+    if options['preload']:
+        app_module.preload_shared_state()
+    app_module.start_background_services()
+
+    server = create_server(
+        app_module.app,
+        host=options['host'],
+        port=options['port'],
+        threads=options['threads'],
+        connection_limit=options['connection_limit'],
+        channel_timeout=options['channel_timeout'],
+        ident='nexus'
+    )
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        stop_event.set()
+
+    for signal_name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, signal_name):
+            signal.signal(getattr(signal, signal_name), handle_signal)
+
+    server_thread = threading.Thread(target=server.run, name='waitress-server', daemon=True)
+    server_thread.start()
+    startup_logger.info(
+        f"✅ waitress已启动: http://{options['host']}:{options['port']} "
+        f"(threads={options['threads']}, connection_limit={options['connection_limit']})"
+    )
+
+    # 带超时等待，保证Windows下信号能及时处理
+    while not stop_event.wait(1):
+        if not server_thread.is_alive():
+            logger.error("❌ waitress服务线程意外退出")
+            break
+
+    startup_logger.info("⏹️ 正在关闭服务...")
+    # 排空期间监听端口保持打开，新请求直接返回503
+    lifecycle.graceful_shutdown(options['drain_seconds'])
+    server.close()
+    server.task_dispatcher.shutdown(timeout=5)
+    startup_logger.info("👋 服务已关闭")
+    return 0
+
+
+def serve_gunicorn(options: dict) -> int:
+    """gunicorn多进程服务（仅Linux/macOS）"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        startup_logger.error("❌ 未安装gunicorn，请执行: pip install gunicorn（Windows请使用 --backend waitress）")
+        return 1
+
+    def post_fork(server, worker):
+        # 主进程的数据库连接不能在子进程中复用，丢弃后由首次查询重新连接（不关闭，避免断开主进程连接）
+        from database_manager import db_manager
+        db_manager.connection = None
+        import app as app_module
+        app_module.start_background_services()
+
+    def worker_exit(server, worker):
+        # gunicorn已在graceful_timeout内等待进行中的请求结束，这里只执行关闭钩子
+        from backend import lifecycle
+        lifecycle.run_shutdown_hooks()
+
+    class NexusApplication(BaseApplication):
+        def __init__(self, settings: dict):
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import app as app_module
+            if options['preload']:
+                app_module.preload_shared_state()
+            return app_module.app
+
+    settings = {
+        'bind': f"{options['host']}:{options['port']}",
+        'workers': options['workers'],
+        'threads': options['threads'],
+        'worker_class': 'gthread',
+        'worker_connections': options['connection_limit'],
+        'timeout': options['request_timeout'],
+        'graceful_timeout': options['drain_seconds'],
+        'keepalive': 5,
+        # 预加载时应用在fork前导入，故事目录等只读数据在各进程间共享
+        'preload_app': options['preload'],
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        'proc_name': 'nexus'
+    }
+    startup_logger.info(
+        f"✅ gunicorn启动: http://{settings['bind']} "
+        f"(workers={options['workers']}, threads={options['threads']})"
+    )
+    NexusApplication(settings).run()
+    return 0
+
+
+def serve_uvicorn(options: dict) -> int:
+    """ASGI服务：预加载、后台任务和关闭钩子在asgi.py的lifespan中执行"""
+    try:
+        import uvicorn
+    except ImportError:
+        startup_logger.error("❌ 未安装uvicorn，请执行: pip install uvicorn starlette a2wsgi")
+        return 1
+    from backend.config import ASGI_CONFIG
+
+    # asgi.py的lifespan按SERVER_CONFIG['preload']决定是否预加载，通过环境变量传给工作进程
+    os.environ['SERVER_PRELOAD'] = '1' if options['preload'] else '0'
+    startup_logger.info(
+        f"✅ uvicorn启动: http://{options['host']}:{options['port']} "
+        f"(workers={options['workers']}, limit_concurrency={ASGI_CONFIG['limit_concurrency']})"
+    )
+    # 收到关闭信号后停止接受新连接，最多等待drain_seconds让进行中的流结束
+    uvicorn.run(
+        'asgi:app',
+        host=options['host'],
+        port=options['port'],
+        workers=options['workers'],
+        limit_concurrency=ASGI_CONFIG['limit_concurrency'],
+        timeout_graceful_shutdown=int(options['drain_seconds']),
+        lifespan='on',
+        log_level='warning'
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NEXUS生产服务')
+    parser.add_argument('--backend', choices=['auto', 'waitress', 'gunicorn', 'uvicorn'],
+                        default=SERVER_CONFIG['backend'], help='服务实现')
+    parser.add_argument('--host', default=SERVER_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=SERVER_CONFIG['port'])
+    parser.add_argument('--workers', type=int, default=SERVER_CONFIG['workers'], help='进程数（gunicorn/uvicorn）')
+    parser.add_argument('--threads', type=int, default=SERVER_CONFIG['threads'], help='每个进程的线程数')
+    parser.add_argument('--drain-seconds', type=float, default=SERVER_CONFIG['drain_seconds'],
+                        help='关闭时等待进行中请求的最长时间')
+    parser.add_argument('--no-preload', action='store_true', help='不预加载故事目录和音色列表')
+    args = parser.parse_args()
+
+    options = dict(SERVER_CONFIG)
+    options.update({
+        'host': args.host,
+        'port': args.port,
+        'workers': max(1, args.workers),
+        'threads': max(1, args.threads),
+        'drain_seconds': args.drain_seconds,
+        'preload': SERVER_CONFIG['preload'] and not args.no_preload
+    })
+
+    backend = choose_backend(args.backend)
+    if backend == 'gunicorn' and sys.platform == 'win32':
+        startup_logger.error("❌ gunicorn不支持Windows，请使用 --backend waitress")
+        return 1
+
+    startup_logger.info(f"🚀 NEXUS后端服务器启动中（{backend}）...")
+    if backend == 'gunicorn':
+        return serve_gunicorn(options)
+    if backend == 'uvicorn':
+        return serve_uvicorn(options)
+    return serve_waitress(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())